@@ -0,0 +1,191 @@
+"""
+Générateur déterministe de pages VitePress réalistes pour les benchmarks.
+
+    uv run python -m benchmarks.corpus --size 1MB --seed 42 > page.md
+
+Une même graine et une même taille produisent toujours la même page :
+frontmatter, titres imbriqués, paragraphes riches en liens, containers,
+blocs de code et longs tableaux, dans des proportions proches d'une vraie
+documentation.
+"""
+
+import argparse
+import random
+import re
+import sys
+
+SIZE_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)\s*(B|KB|MB|GB)?$", re.IGNORECASE)
+SIZE_UNITS = {"B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3}
+
+WORDS = (
+    "documentation configuration composant propriété valeur fichier projet "
+    "serveur client requête réponse paramètre option thème page route "
+    "markdown build déploiement cache module plugin exemple fonction méthode "
+    "type objet tableau chaîne nombre navigation barre latérale recherche "
+    "titre section lien image code bloc ligne utilisateur application"
+).split()
+LANGUAGES = ("ts", "js", "vue", "bash", "json", "yaml", "python", "css")
+CONTAINERS = ("tip", "info", "warning", "danger", "details")
+EXTERNAL_HOSTS = ("vitepress.dev", "vuejs.org", "github.com", "developer.mozilla.org")
+
+
+def parse_size(value: str) -> int:
+    """Taille en octets depuis "512", "1KB", "1.5MB"..."""
+    match = SIZE_PATTERN.match(value.strip())
+    if not match:
+        raise ValueError(f"Taille invalide : {value}")
+    amount, unit = match.groups()
+    return int(float(amount) * SIZE_UNITS[(unit or "B").upper()])
+
+
+def format_size(size: int) -> str:
+    for unit in ("GB", "MB", "KB"):
+        if size >= SIZE_UNITS[unit] and size % SIZE_UNITS[unit] == 0:
+            return f"{size // SIZE_UNITS[unit]}{unit}"
+    return f"{size}B"
+
+
+class PageGenerator:
+    """Produit les blocs d'une page à partir d'un générateur aléatoire seedé"""
+
+    def __init__(self, seed: int):
+        self.random = random.Random(seed)
+        self.heading = 0
+
+    def words(self, low: int, high: int) -> str:
+        return " ".join(self.random.choices(WORDS, k=self.random.randint(low, high)))
+
+    def link(self) -> str:
+        text = self.words(1, 3)
+        kind = self.random.random()
+        if kind < 0.5:
+            # Lien interne sans extension, corrigé par le formatage
+            path = "/".join(self.random.choices(WORDS, k=self.random.randint(1, 3)))
+            anchor = (
+                f"#{self.random.choice(WORDS)}" if self.random.random() < 0.3 else ""
+            )
+            return f"[{text}](./{path}{anchor})"
+        if kind < 0.7:
+            return f"[{text}](./{self.random.choice(WORDS)}.md)"
+        if kind < 0.9:
+            host = self.random.choice(EXTERNAL_HOSTS)
+            return f"[{text}](https://{host}/{self.random.choice(WORDS)})"
+        return f"![{text}](/images/{self.random.choice(WORDS)}.png)"
+
+    def sentence(self) -> str:
+        parts = [self.words(4, 12)]
+        for _ in range(self.random.randint(0, 3)):
+            if self.random.random() < 0.7:
+                parts.append(self.link())
+            else:
+                parts.append(f"`{self.random.choice(WORDS)}()`")
+            parts.append(self.words(2, 8))
+        return " ".join(parts).capitalize() + "."
+
+    def paragraph(self) -> str:
+        return " ".join(self.sentence() for _ in range(self.random.randint(2, 6)))
+
+    def heading_block(self) -> str:
+        self.heading += 1
+        level = self.random.choice((2, 2, 3, 3, 4))
+        return f"{'#' * level} {self.words(2, 5).capitalize()} {self.heading}"
+
+    def code_block(self) -> str:
+        language = self.random.choice(LANGUAGES)
+        lines = []
+        for index in range(self.random.randint(3, 25)):
+            indent = "  " * self.random.randint(0, 3)
+            name = self.random.choice(WORDS)
+            lines.append(f"{indent}const {name}_{index} = '{self.words(1, 4)}'")
+        fence = "````" if self.random.random() < 0.05 else "```"
+        return f"{fence}{language}\n" + "\n".join(lines) + f"\n{fence}"
+
+    def container(self) -> str:
+        kind = self.random.choice(CONTAINERS)
+        # Une partie des containers n'a pas de titre, complété par le formatage
+        title = (
+            f" {self.words(1, 3).capitalize()}" if self.random.random() < 0.5 else ""
+        )
+        body = [self.paragraph()]
+        if self.random.random() < 0.3:
+            body.append(self.code_block())
+        return f"::: {kind}{title}\n" + "\n\n".join(body) + "\n:::"
+
+    def table(self) -> str:
+        columns = self.random.randint(3, 6)
+        header = [self.words(1, 2).capitalize() for _ in range(columns)]
+        rows = [
+            "| " + " | ".join(header) + " |",
+            "|" + "|".join(" --- " for _ in range(columns)) + "|",
+        ]
+        for _ in range(self.random.randint(10, 80)):
+            cells = []
+            for _ in range(columns):
+                if self.random.random() < 0.2:
+                    cells.append(self.link())
+                elif self.random.random() < 0.2:
+                    cells.append(f"`{self.random.choice(WORDS)}`")
+                else:
+                    cells.append(self.words(1, 5))
+            rows.append("| " + " | ".join(cells) + " |")
+        return "\n".join(rows)
+
+    def bullet_list(self) -> str:
+        return "\n".join(
+            f"- {self.sentence()}" for _ in range(self.random.randint(3, 10))
+        )
+
+    def frontmatter(self) -> str:
+        tags = ", ".join(self.random.sample(WORDS, 3))
+        lines = [
+            "---",
+            f"title: {self.words(2, 5).capitalize()}",
+            f"description: {self.words(8, 16)}",
+            f"tags: [{tags}]",
+        ]
+        if self.random.random() < 0.5:
+            lines.append("outline: deep")
+        return "\n".join(lines + ["---"])
+
+    def block(self) -> str:
+        kind = self.random.random()
+        if kind < 0.15:
+            return self.heading_block()
+        if kind < 0.5:
+            return self.paragraph()
+        if kind < 0.65:
+            return self.code_block()
+        if kind < 0.77:
+            return self.container()
+        if kind < 0.87:
+            return self.bullet_list()
+        return self.table()
+
+
+def generate_page(size: int, seed: int = 0) -> str:
+    """Page VitePress d'environ `size` octets UTF-8 (au moins un bloc)"""
+    generator = PageGenerator(seed)
+    blocks = []
+    # Une page sur deux a déjà son frontmatter, l'autre le reçoit au formatage
+    if generator.random.random() < 0.5:
+        blocks.append(generator.frontmatter())
+    blocks.append(f"# {generator.words(2, 5).capitalize()}")
+    written = sum(len(block.encode("utf-8")) + 2 for block in blocks)
+
+    while written < size:
+        block = generator.block()
+        blocks.append(block)
+        written += len(block.encode("utf-8")) + 2
+    return "\n\n".join(blocks) + "\n"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", default="64KB", help="ex: 1KB, 1MB, 50MB")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    sys.stdout.write(generate_page(parse_size(args.size), args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Serveur local compatible OpenAI pour les tests de charge, sans fournisseur réel.
+
+    uv run python -m benchmarks.fake_openai --port 8100 --latency 0.3 --tokens-per-second 80 --error-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 uv run uvicorn main:app
+
+Implémente GET /v1/models et POST /v1/chat/completions, en streaming (SSE)
+ou non. La réponse renvoie le dernier message utilisateur, ce qui conserve
+les marqueurs de masquage, au débit de tokens configuré après une latence
+initiale avec gigue. Une fraction des requêtes échoue avec le statut choisi
+(503 par défaut, 429 avec Retry-After).
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+TOKEN_PATTERN = re.compile(r"\S+\s*|\s+")
+
+
+@dataclass
+class FakeConfig:
+    latency: float = 0.2
+    jitter: float = 0.1
+    tokens_per_second: float = 100.0
+    error_rate: float = 0.0
+    error_status: int = 503
+    models: tuple[str, ...] = ("gpt-fake",)
+
+
+config = FakeConfig()
+app = FastAPI(title="Fake OpenAI")
+
+
+def _tokens(text: str) -> list[str]:
+    """Découpage approximatif en tokens : un mot et ses espaces"""
+    return TOKEN_PATTERN.findall(text)
+
+
+def _answer(body: dict) -> str:
+    for message in reversed(body.get("messages") or []):
+        if message.get("role") in ("user", "human"):
+            content = message.get("content") or ""
+            return content if isinstance(content, str) else json.dumps(content)
+    return "ok"
+
+
+async def _first_token_delay() -> None:
+    await asyncio.sleep(max(0.0, random.gauss(config.latency, config.jitter)))
+
+
+def _error() -> JSONResponse:
+    headers = {"retry-after": "1"} if config.error_status == 429 else {}
+    return JSONResponse(
+        {
+            "error": {
+                "message": "Injected failure",
+                "type": "server_error",
+                "code": config.error_status,
+            }
+        },
+        status_code=config.error_status,
+        headers=headers,
+    )
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {
+        "object": "list",
+        "data": [
+            {"id": model, "object": "model", "created": 0, "owned_by": "fake"}
+            for model in config.models
+        ],
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if random.random() < config.error_rate:
+        return _error()
+
+    model = body.get("model") or config.models[0]
+    tokens = _tokens(_answer(body))
+    max_tokens = body.get("max_tokens") or body.get("max_completion_tokens")
+    if max_tokens:
+        tokens = tokens[:max_tokens]
+    prompt_tokens = sum(
+        len(_tokens(str(message.get("content") or "")))
+        for message in body.get("messages") or []
+    )
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    interval = 1.0 / config.tokens_per_second if config.tokens_per_second else 0.0
+
+    if not body.get("stream"):
+        await _first_token_delay()
+        await asyncio.sleep(interval * len(tokens))
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(tokens),
+                "total_tokens": prompt_tokens + len(tokens),
+            },
+        }
+
+    def chunk(delta: dict, finish_reason=None) -> str:
+        data = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(data)}\n\n"
+
+    async def events():
+        await _first_token_delay()
+        yield chunk({"role": "assistant", "content": ""})
+        for token in tokens:
+            yield chunk({"content": token})
+            if interval:
+                await asyncio.sleep(interval)
+        yield chunk({}, "stop")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument(
+        "--latency", type=float, default=0.2, help="délai avant le premier token (s)"
+    )
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--models", nargs="+", default=list(FakeConfig.models))
+    args = parser.parse_args()
+
+    config.latency = args.latency
+    config.jitter = args.jitter
+    config.tokens_per_second = args.tokens_per_second
+    config.error_rate = args.error_rate
+    config.error_status = args.error_status
+    config.models = tuple(args.models)
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
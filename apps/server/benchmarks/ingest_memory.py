@@ -0,0 +1,106 @@
+"""
+Pic mémoire du nettoyage VitePress d'un upload, en mémoire et en streaming.
+
+    uv run python -m benchmarks.ingest_memory --sizes 1 8 32
+
+Le chemin streaming (ingestion par blocs, débordement sur disque, nettoyage
+ligne à ligne) doit garder un pic à peu près constant quelle que soit la
+taille du document, contrairement au chemin qui charge tout en mémoire.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import tracemalloc
+from typing import Callable
+
+from starlette.datastructures import UploadFile
+
+from src.services.ingest import ingest_upload, iter_text_chunks
+from src.services.markdown import parse_markdown
+from src.services.vitepress import (
+    clean_vitepress_document,
+    iter_clean_vitepress_markdown,
+)
+
+SECTION = """## Section {index}
+
+Du texte avec un [lien interne](./guide/page{index}) et du `code`.
+
+```python
+def example_{index}():
+    return {index}
+```
+
+::: warning
+Un container VitePress.
+:::
+
+"""
+
+
+def write_document(path: str, size_mb: int) -> None:
+    target = size_mb * 1024 * 1024
+    written = 0
+    index = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# Benchmark\n\n")
+        while written < target:
+            section = SECTION.format(index=index)
+            f.write(section)
+            written += len(section)
+            index += 1
+
+
+def in_memory(path: str) -> int:
+    with open(path, "rb") as f:
+        content = f.read().decode("utf-8")
+    return len(clean_vitepress_document(parse_markdown(content)).text)
+
+
+def streaming(path: str) -> int:
+    # Seule l'ingestion est asynchrone : le fichier est ouvert avant la boucle
+    # et le nettoyage lit le fichier temporaire une fois la boucle terminée
+    with open(path, "rb") as f:
+        upload = asyncio.run(ingest_upload(UploadFile(f, filename="bench.md")))
+    try:
+        lines = iter_clean_vitepress_markdown(upload.iter_lines)
+        return sum(len(chunk) for chunk in iter_text_chunks(lines))
+    finally:
+        upload.close()
+
+
+def measure(path: str, mode: Callable[[str], int]) -> tuple[int, int]:
+    tracemalloc.start()
+    try:
+        output = mode(path)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return output, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    print(f"{'taille':>8} {'en mémoire':>14} {'streaming':>14}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size_mb in args.sizes:
+            path = os.path.join(directory, f"doc-{size_mb}.md")
+            write_document(path, size_mb)
+            expected, memory_peak = measure(path, in_memory)
+            produced, streaming_peak = measure(path, streaming)
+            assert produced == expected, (
+                "les deux chemins doivent produire le même texte"
+            )
+            print(
+                f"{size_mb:>6}MB {memory_peak / 2**20:>12.1f}MB"
+                f" {streaming_peak / 2**20:>12.1f}MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Générateur de charge asynchrone pour les routes /format/doc* et /translate-file.
+
+    uv run python -m benchmarks.fake_openai --port 8100 &
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_MODEL=gpt-fake uv run uvicorn main:app &
+    uv run python -m benchmarks.load_test --rps 5 --duration 60 --scenarios format=2 format-stream translate
+
+Les requêtes partent à cadence fixe (charge ouverte) : une réponse lente ne
+retarde pas les suivantes, comme pour un trafic réel. Les documents viennent
+de benchmarks.corpus ; --distinct limite leur nombre pour mesurer l'effet
+des caches. Le rapport donne par scénario les latences p50/p95/p99, le débit
+de réponses réussies et le taux d'erreur.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from benchmarks.corpus import generate_page, parse_size
+
+
+@dataclass
+class Sample:
+    scenario: str
+    started: float
+    latency: float
+    ok: bool
+    status: int = 0
+    first_byte: Optional[float] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class LoadOptions:
+    model: str
+    source_language: str
+    target_language: str
+    enhance: bool
+
+
+async def _format(client: httpx.AsyncClient, content: str, options: LoadOptions):
+    response = await client.post(
+        "/format/doc/text",
+        json={"content": content, "clean": True, "enhance": options.enhance},
+    )
+    return response.status_code, None
+
+
+async def _format_file(client: httpx.AsyncClient, content: str, options: LoadOptions):
+    response = await client.post(
+        "/format/doc",
+        params={"enhance": options.enhance},
+        files={"file": ("page.md", content.encode("utf-8"), "text/markdown")},
+    )
+    return response.status_code, None
+
+
+async def _format_stream(client: httpx.AsyncClient, content: str, options: LoadOptions):
+    """Lit le flux NDJSON jusqu'au bout : la latence est celle du dernier événement"""
+    started = time.perf_counter()
+    first_byte = None
+    async with client.stream(
+        "POST",
+        "/format/doc/text/stream",
+        json={"content": content, "clean": True, "enhance": options.enhance},
+    ) as response:
+        async for line in response.aiter_lines():
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            if line and json.loads(line).get("status") == "error":
+                return 500, first_byte
+    return response.status_code, first_byte
+
+
+async def _translate(client: httpx.AsyncClient, content: str, options: LoadOptions):
+    response = await client.post(
+        "/translate-file",
+        data={
+            "source_language": options.source_language,
+            "target_language": options.target_language,
+            "model_name": options.model,
+            "chunked": "true",
+        },
+        files={"file": ("page.md", content.encode("utf-8"), "text/markdown")},
+    )
+    return response.status_code, None
+
+
+SCENARIOS: dict[
+    str,
+    Callable[
+        [httpx.AsyncClient, str, LoadOptions],
+        Awaitable[tuple[int, Optional[float]]],
+    ],
+] = {
+    "format": _format,
+    "format-file": _format_file,
+    "format-stream": _format_stream,
+    "translate": _translate,
+}
+
+
+def parse_mix(values: list[str]) -> dict[str, float]:
+    """Scénarios pondérés depuis "format=2 translate" (poids 1 par défaut)"""
+    mix = {}
+    for value in values:
+        name, _, weight = value.partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"Scénario inconnu : {name} ({', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Percentile au rang le plus proche"""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_load(args: argparse.Namespace) -> tuple[list[Sample], int, float]:
+    mix = parse_mix(args.scenarios)
+    total = int(args.rps * args.duration)
+    rng = random.Random(args.seed)
+    size = parse_size(args.size)
+    pages = [
+        generate_page(size, args.seed + index)
+        for index in range(args.distinct or total)
+    ]
+    options = LoadOptions(
+        model=args.model,
+        source_language=args.source_language,
+        target_language=args.target_language,
+        enhance=not args.no_enhance,
+    )
+    plan = rng.choices(list(mix), weights=list(mix.values()), k=total)
+
+    samples: list[Sample] = []
+    dropped = 0
+    in_flight: set[asyncio.Task] = set()
+    limits = httpx.Limits(max_connections=args.max_in_flight)
+
+    async with httpx.AsyncClient(
+        base_url=args.url, timeout=args.timeout, limits=limits
+    ) as client:
+
+        async def send(scenario: str, content: str) -> None:
+            started = time.perf_counter()
+            try:
+                status, first_byte = await SCENARIOS[scenario](client, content, options)
+                error = None if status < 400 else f"HTTP {status}"
+            # Erreurs réseau et flux NDJSON illisible : l'appel est compté en échec
+            except (httpx.HTTPError, ValueError) as e:
+                status, first_byte, error = 0, None, f"{type(e).__name__}: {e}"
+            samples.append(
+                Sample(
+                    scenario,
+                    started,
+                    time.perf_counter() - started,
+                    error is None,
+                    status,
+                    first_byte,
+                    error,
+                )
+            )
+
+        started = time.perf_counter()
+        for index, scenario in enumerate(plan):
+            # Cadence fixe : chaque requête part à son heure prévue
+            delay = started + index / args.rps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= args.max_in_flight:
+                dropped += 1
+                continue
+            task = asyncio.create_task(send(scenario, pages[index % len(pages)]))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        await asyncio.gather(*in_flight)
+        elapsed = time.perf_counter() - started
+
+    return samples, dropped, elapsed
+
+
+def summarize(samples: list[Sample], elapsed: float) -> dict:
+    latencies = [sample.latency for sample in samples if sample.ok]
+    first_bytes = [
+        sample.first_byte for sample in samples if sample.first_byte is not None
+    ]
+    errors = [sample for sample in samples if not sample.ok]
+    summary = {
+        "requests": len(samples),
+        "errors": len(errors),
+        "error_rate": len(errors) / len(samples) if samples else 0.0,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+    }
+    if first_bytes:
+        summary["first_byte_p50"] = percentile(first_bytes, 0.50)
+        summary["first_byte_p95"] = percentile(first_bytes, 0.95)
+    if errors:
+        kinds: dict[str, int] = {}
+        for sample in errors:
+            kinds[sample.error] = kinds.get(sample.error, 0) + 1
+        summary["error_kinds"] = kinds
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rps", type=float, default=2.0)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        default=["format", "translate"],
+        help=f"parmi {', '.join(SCENARIOS)}, avec un poids optionnel : format=3",
+    )
+    parser.add_argument("--size", default="8KB", help="taille des documents envoyés")
+    parser.add_argument(
+        "--distinct",
+        type=int,
+        default=0,
+        help="nombre de documents différents (0 : un par requête, sans cache)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", default="gpt-fake")
+    parser.add_argument("--source-language", default="fr")
+    parser.add_argument("--target-language", default="en")
+    parser.add_argument("--no-enhance", action="store_true")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="rapport JSON à enregistrer")
+    args = parser.parse_args()
+
+    samples, dropped, elapsed = asyncio.run(run_load(args))
+
+    report = {
+        "target_rps": args.rps,
+        "elapsed": elapsed,
+        "dropped": dropped,
+        "overall": summarize(samples, elapsed),
+        "scenarios": {
+            name: summarize(
+                [sample for sample in samples if sample.scenario == name], elapsed
+            )
+            for name in parse_mix(args.scenarios)
+        },
+    }
+
+    print(
+        f"{'scénario':<14} {'requêtes':>9} {'erreurs':>8} {'débit/s':>8}"
+        f" {'p50':>8} {'p95':>8} {'p99':>8}"
+    )
+    for name, summary in [*report["scenarios"].items(), ("total", report["overall"])]:
+        print(
+            f"{name:<14} {summary['requests']:>9} {summary['error_rate']:>7.1%}"
+            f" {summary['throughput_rps']:>8.2f} {summary['p50']:>7.3f}s"
+            f" {summary['p95']:>7.3f}s {summary['p99']:>7.3f}s"
+        )
+    if dropped:
+        print(f"{dropped} requêtes non envoyées : --max-in-flight atteint")
+    for name, summary in report["scenarios"].items():
+        for error, count in summary.get("error_kinds", {}).items():
+            print(f"  {name}: {count} x {error}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Débit et pic mémoire des transformations VitePress sur un corpus généré.
+
+    uv run python -m benchmarks.vitepress_transforms --save
+    uv run python -m benchmarks.vitepress_transforms --compare
+    uv run python -m benchmarks.vitepress_transforms --sizes 1KB 1MB --functions format_vitepress_markdown
+
+Chaque fonction est mesurée sur des pages de 1 KB à 50 MB produites par
+benchmarks.corpus avec une graine fixe : le débit retenu est celui de la
+meilleure répétition, le pic mémoire est mesuré à part avec tracemalloc.
+--save enregistre les résultats comme référence, --compare les compare à
+la référence et termine en erreur si une mesure régresse au-delà de la
+tolérance.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import AsyncIterator, Callable, Iterator
+
+from benchmarks.corpus import format_size, generate_page, parse_size
+from src.services.vitepress import (
+    add_vitepress_utilities,
+    add_vitepress_utilities_streaming,
+    extract_sections,
+    extract_vitepress_metadata,
+    format_vitepress_markdown,
+    format_vitepress_markdown_streaming,
+    iter_clean_vitepress_markdown,
+    process_document_streaming,
+)
+
+DEFAULT_SIZES = ["1KB", "16KB", "256KB", "4MB", "50MB"]
+DEFAULT_BASELINE = os.path.join(
+    os.path.dirname(__file__), "baselines", "vitepress_transforms.json"
+)
+MB = 1024 * 1024
+
+loop = asyncio.new_event_loop()
+
+
+def _drain(events: AsyncIterator[str]) -> int:
+    async def consume() -> int:
+        return sum([len(event) async for event in events])
+
+    return loop.run_until_complete(consume())
+
+
+def _iter_lines(content: str) -> Iterator[str]:
+    """Lignes de `content` comme str.split("\\n"), sans créer la liste entière"""
+    start = 0
+    while (end := content.find("\n", start)) != -1:
+        yield content[start:end]
+        start = end + 1
+    yield content[start:]
+
+
+BENCHMARKS: dict[str, Callable[[str], object]] = {
+    "format_vitepress_markdown": format_vitepress_markdown,
+    "add_vitepress_utilities": add_vitepress_utilities,
+    "extract_sections": extract_sections,
+    "extract_vitepress_metadata": extract_vitepress_metadata,
+    "format_vitepress_markdown_streaming": lambda content: _drain(
+        format_vitepress_markdown_streaming(content)
+    ),
+    "add_vitepress_utilities_streaming": lambda content: _drain(
+        add_vitepress_utilities_streaming(content)
+    ),
+    "iter_clean_vitepress_markdown": lambda content: sum(
+        len(line)
+        for line in iter_clean_vitepress_markdown(lambda: _iter_lines(content))
+    ),
+    "process_document_streaming": lambda content: _drain(
+        process_document_streaming(content, clean=True, enhance=False)
+    ),
+}
+
+
+def time_function(
+    function: Callable[[str], object],
+    content: str,
+    min_time: float,
+    max_repeats: int,
+) -> tuple[float, int]:
+    """Meilleure durée sur des répétitions totalisant au moins `min_time`"""
+    function(content)
+    best = float("inf")
+    total = 0.0
+    repeats = 0
+    while repeats < max_repeats and (repeats == 0 or total < min_time):
+        started = time.perf_counter()
+        function(content)
+        elapsed = time.perf_counter() - started
+        best = min(best, elapsed)
+        total += elapsed
+        repeats += 1
+    return best, repeats
+
+
+def peak_memory(function: Callable[[str], object], content: str) -> int:
+    """Mémoire allouée au pic par la fonction, hors contenu d'entrée"""
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        function(content)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return max(0, peak - baseline)
+
+
+def run(args: argparse.Namespace) -> dict:
+    results = {}
+    print(
+        f"{'fonction':<38} {'taille':>7} {'MB/s':>9} {'pic mémoire':>12} {'répét.':>7}"
+    )
+    for size_label in args.sizes:
+        size = parse_size(size_label)
+        content = generate_page(size, args.seed)
+        actual = len(content.encode("utf-8"))
+        for name in args.functions:
+            function = BENCHMARKS[name]
+            best, repeats = time_function(
+                function, content, args.min_time, args.max_repeats
+            )
+            peak = peak_memory(function, content)
+            key = f"{name}@{format_size(size)}"
+            results[key] = {
+                "bytes": actual,
+                "seconds": best,
+                "mb_per_s": actual / MB / best,
+                "peak_bytes": peak,
+            }
+            print(
+                f"{name:<38} {format_size(size):>7} {actual / MB / best:>9.1f}"
+                f" {peak / MB:>10.2f}MB {repeats:>7}"
+            )
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Affiche les écarts à la référence et renvoie les régressions"""
+    regressions = []
+    print(f"\n{'mesure':<46} {'débit':>9} {'mémoire':>9}")
+    for key, result in results.items():
+        reference = baseline["results"].get(key)
+        if reference is None:
+            print(f"{key:<46} {'(nouveau)':>9}")
+            continue
+
+        speed = result["mb_per_s"] / reference["mb_per_s"] - 1
+        memory = (result["peak_bytes"] + 1) / (reference["peak_bytes"] + 1) - 1
+        flags = []
+        if speed < -tolerance:
+            flags.append("débit")
+        if memory > tolerance and result["peak_bytes"] - reference["peak_bytes"] > MB:
+            flags.append("mémoire")
+        if flags:
+            regressions.append(f"{key} ({', '.join(flags)})")
+        marker = "  RÉGRESSION" if flags else ""
+        print(f"{key:<46} {speed:>+8.1%} {memory:>+8.1%}{marker}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument(
+        "--functions", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS)
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--min-time", type=float, default=0.5)
+    parser.add_argument("--max-repeats", type=int, default=50)
+    parser.add_argument("--save", nargs="?", const=DEFAULT_BASELINE)
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.15,
+        help="écart relatif toléré avant de signaler une régression",
+    )
+    args = parser.parse_args()
+
+    results = run(args)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("seed") != args.seed:
+            print("Attention : la référence a été mesurée avec une autre graine")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} régression(s) : {', '.join(regressions)}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "python": sys.version.split()[0],
+                    "platform": platform.platform(),
+                    "machine": platform.machine(),
+                    "seed": args.seed,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+        print(f"\nRéférence enregistrée dans {args.save}")
+
+    if args.compare and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
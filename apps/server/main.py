@@ -2,11 +2,18 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
-from src.core.logger import setup_logging
-from src.routes import openai, translate, format
+from fastapi.responses import RedirectResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from src.core.logger import RequestIdMiddleware, setup_logging, stop_logging
+from src.routes import openai, translate, format, jobs
 
 from src.core import database
+from src.core.metrics import InFlightMiddleware
+from src.core.tracing import TracedJSONResponse, TracingMiddleware
+from src.services.ingest import UploadLimitMiddleware
+from src.services.jobs import job_manager
+from src.services.registry import llm_registry
+from src.services.translate import TranslateService
 
 setup_logging()
 
@@ -14,7 +21,15 @@ setup_logging()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     database.create_db_and_tables()
+    llm_registry.start()
+    TranslateService().warmup()
+    await job_manager.start()
     yield
+    await job_manager.stop()
+    await llm_registry.aclose()
+    await database.dispose_engines()
+    # Drain the log queue before the process exits
+    stop_logging()
 
 
 app = FastAPI(
@@ -22,6 +37,7 @@ app = FastAPI(
     description="A FastAPI application for document translation and language model interaction.",
     version="0.0.1",
     lifespan=lifespan,
+    default_response_class=TracedJSONResponse,
 )
 
 app.add_middleware(
@@ -32,11 +48,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(UploadLimitMiddleware)
+app.add_middleware(InFlightMiddleware)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(RequestIdMiddleware)
+
 app.include_router(openai.router, prefix="/openai", tags=["OpenAI"])
 app.include_router(translate.router, tags=["Translation"])
 app.include_router(format.router, prefix="/format", tags=["Format"])
+app.include_router(jobs.router, prefix="/jobs", tags=["Jobs"])
 
 
 @app.get("/")
 def read_root():
     return RedirectResponse(url="/docs", status_code=302)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
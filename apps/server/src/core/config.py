@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -6,6 +8,63 @@ class Settings(BaseSettings):
     openai_api_key: str
     openai_base_url: str = None
     openai_model: str = None
+    translate_chunk_tokens: int = 1000
+    translate_concurrency: int = 4
+    translation_memory_enabled: bool = True
+    translation_memory_ttl: Optional[float] = 90 * 24 * 3600
+    translation_memory_max_rows: Optional[int] = 100000
+    masking_enabled: bool = True
+    batch_concurrency: int = 8
+    archive_max_members: int = 10000
+    enhance_concurrency: int = 4
+    enhance_chunk_tokens: int = 1000
+    enhance_context_tokens: int = 100
+    section_cache_size: int = 4096
+    result_cache_entries: int = 1024
+    result_cache_max_bytes: int = 64 * 1024 * 1024
+    result_cache_persistent: bool = True
+    result_cache_ttl: Optional[float] = 30 * 24 * 3600
+    result_cache_max_rows: Optional[int] = 10000
+    max_upload_bytes: int = 100 * 1024 * 1024
+    upload_spool_bytes: int = 1024 * 1024
+    stream_replay_bytes: int = 1024 * 1024
+    job_concurrency: int = 2
+    job_max_attempts: int = 3
+    job_ttl: Optional[float] = 7 * 24 * 3600
+    job_max_rows: Optional[int] = 10000
+    openai_health_ttl: float = 30.0
+    openai_breaker_threshold: int = 5
+    openai_breaker_reset_timeout: float = 30.0
+    openai_max_retries: int = 2
+    openai_backoff_base: float = 0.5
+    openai_backoff_max: float = 8.0
+    openai_hedge_percentile: Optional[float] = 0.95
+    openai_hedge_min_samples: int = 20
+    openai_fallback_models: list[str] = []
+    openai_fallback_base_urls: list[str] = []
+    llm_requests_per_minute: Optional[int] = None
+    llm_tokens_per_minute: Optional[int] = None
+    llm_rate_headroom: float = 0.9
+    llm_default_completion_tokens: int = 1024
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_bulk_chunk_size: int = 500
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cache_size_kb: int = 8 * 1024
+    db_prune_interval: float = 300.0
+    log_level: str = "INFO"
+    log_format: str = "json"
+    log_file: Optional[str] = "server.log"
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backup_count: int = 5
+    log_sample_rate: float = 1.0
+    log_queue_size: int = 10000
+    server_timing_enabled: bool = True
+    profiling_enabled: bool = False
+    profile_token: Optional[str] = None
+    profile_interval_ms: float = 5.0
 
 
 settings = Settings()
@@ -1,18 +1,78 @@
 import os
-from sqlalchemy import create_engine
+import time
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Iterable, Optional
+
+from sqlalchemy import create_engine, delete, event, insert, select, tuple_
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import scoped_session, sessionmaker, declarative_base
 
+from src.core.config import settings
+
 SQLALCHEMY_DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./database.db")
 
-if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
-    engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=connect_args)
-else:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+
+def async_database_url(url: str) -> URL:
+    """Same database through its async driver: aiosqlite or asyncpg"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite")
+    if backend in ("postgres", "postgresql"):
+        return parsed.set(drivername="postgresql+asyncpg")
+    return parsed
+
+
+def _engine_options(url: URL) -> dict:
+    if url.get_backend_name() == "sqlite":
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": True,
+    }
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    WAL lets readers run while a write is in progress, and NORMAL sync is
+    safe in WAL mode while skipping an fsync per commit. Writers wait on
+    the lock for busy_timeout instead of failing with "database is locked".
+    The page cache is per connection: every pooled connection of both the
+    sync and the async engine holds up to sqlite_cache_size_kb.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute(f"PRAGMA cache_size=-{settings.sqlite_cache_size_kb}")
+    cursor.close()
+
+
+def _configure(engine: Engine) -> Engine:
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+_sync_url = make_url(SQLALCHEMY_DATABASE_URL)
+engine = _configure(create_engine(_sync_url, **_engine_options(_sync_url)))
+
+_async_url = async_database_url(SQLALCHEMY_DATABASE_URL)
+async_engine = create_async_engine(_async_url, **_engine_options(_async_url))
+_configure(async_engine.sync_engine)
 
 SessionLocal = sessionmaker(
     autocommit=False, autoflush=False, bind=engine, expire_on_commit=False
 )
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
 Base = declarative_base()
 Session = scoped_session(SessionLocal)
 
@@ -25,8 +85,126 @@ def get_db():
         db.close()
 
 
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _chunks(rows: list[dict], size: int) -> Iterable[list[dict]]:
+    for start in range(0, len(rows), size):
+        yield rows[start : start + size]
+
+
+async def bulk_insert(
+    db: AsyncSession, model, rows: list[dict], chunk_size: Optional[int] = None
+) -> None:
+    """Insert rows as executemany batches, without building ORM objects"""
+    for chunk in _chunks(rows, chunk_size or settings.db_bulk_chunk_size):
+        await db.execute(insert(model), chunk)
+
+
+async def bulk_upsert(
+    db: AsyncSession,
+    model,
+    rows: list[dict],
+    update_columns: Optional[list[str]] = None,
+    chunk_size: Optional[int] = None,
+) -> None:
+    """
+    Insert rows, or update `update_columns` of the rows whose primary key
+    already exists, in one statement per chunk (ON CONFLICT DO UPDATE).
+    """
+    if not rows:
+        return
+    table = model.__table__
+    keys = [column.name for column in table.primary_key.columns]
+    if update_columns is None:
+        update_columns = [name for name in rows[0] if name not in keys]
+
+    dialect = db.bind.dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        # No portable upsert elsewhere: fall back to one merge per row
+        for row in rows:
+            await db.merge(model(**row))
+        return
+
+    for chunk in _chunks(rows, chunk_size or settings.db_bulk_chunk_size):
+        statement = dialect_insert(table).values(chunk)
+        if update_columns:
+            statement = statement.on_conflict_do_update(
+                index_elements=keys,
+                set_={name: statement.excluded[name] for name in update_columns},
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=keys)
+        await db.execute(statement)
+
+
+async def prune_rows(
+    db: AsyncSession,
+    column,
+    max_age: Optional[float] = None,
+    max_rows: Optional[int] = None,
+    where: tuple = (),
+) -> int:
+    """
+    Delete the rows of `column`'s table older than max_age seconds, then the
+    oldest ones past max_rows, among the rows matching `where`.
+    Returns the number of rows deleted.
+    """
+    table = column.table
+    deleted = 0
+    if max_age is not None:
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(
+            seconds=max_age
+        )
+        result = await db.execute(delete(table).where(column < cutoff, *where))
+        deleted += result.rowcount
+    if max_rows is not None:
+        keys = list(table.primary_key.columns)
+        past_limit = (
+            select(*keys).where(*where).order_by(column.desc()).offset(max_rows)
+        )
+        if len(keys) == 1:
+            outdated = keys[0].in_(past_limit)
+        else:
+            outdated = tuple_(*keys).in_(past_limit)
+        result = await db.execute(delete(table).where(outdated))
+        deleted += result.rowcount
+    return deleted
+
+
+class PruneSchedule:
+    """Lets a write trigger pruning at most once per interval"""
+
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = interval
+        self.last = 0.0
+
+    def due(self) -> bool:
+        now = time.monotonic()
+        interval = (
+            self.interval if self.interval is not None else settings.db_prune_interval
+        )
+        if self.last and now - self.last < interval:
+            return False
+        self.last = now
+        return True
+
+
 def create_db_and_tables():
+    import src.models  # noqa: F401
+
     try:
         Base.metadata.create_all(bind=engine)
     except Exception:
         raise
+
+
+async def dispose_engines() -> None:
+    await async_engine.dispose()
+    engine.dispose()
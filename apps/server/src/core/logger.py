@@ -1,9 +1,237 @@
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import queue
+import random
+import sys
+import uuid
+import zlib
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional, Union
 
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-def setup_logging(level: int = logging.INFO):
-    logging.basicConfig(
-        level=level,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s - %(pathname)s:%(lineno)d",
-        handlers=[logging.StreamHandler(), logging.FileHandler("server.log")],
+from src.core.config import settings
+
+TEXT_FORMAT = (
+    "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+    " - %(pathname)s:%(lineno)d"
+)
+REQUEST_ID_HEADER = "X-Request-ID"
+# Loggers that uvicorn gives their own stream handlers
+SERVER_LOGGERS = ("uvicorn", "uvicorn.access")
+MAX_REQUEST_ID_LENGTH = 128
+
+# Attributes of every LogRecord, the others come from `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {
+    "message",
+    "asctime",
+    "request_id",
+}
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "request_id", default=None
+)
+_listener: Optional[QueueListener] = None
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Tags records with the request ID and samples the records below WARNING.
+    It runs in the calling thread, before the record is queued, because the
+    listener thread does not see the request context.
+    """
+
+    def __init__(self, sample_rate: float = 1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request_id = _request_id.get()
+        record.request_id = request_id or "-"
+        if self.sample_rate >= 1.0 or record.levelno >= logging.WARNING:
+            return True
+        # A sampled request keeps all its records, so that its story stays whole
+        if request_id is not None:
+            draw = zlib.crc32(request_id.encode("utf-8")) / 0xFFFFFFFF
+        else:
+            draw = random.random()
+        return draw < self.sample_rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+            "location": f"{record.pathname}:{record.lineno}",
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Drops records when the queue is full instead of blocking the caller"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Merges the arguments and renders the traceback, kept apart from the message"""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _output_handlers() -> list[logging.Handler]:
+    handlers: list[logging.Handler] = [logging.StreamHandler(sys.stderr)]
+    if settings.log_file:
+        handlers.append(
+            RotatingFileHandler(
+                settings.log_file,
+                maxBytes=settings.log_max_bytes,
+                backupCount=settings.log_backup_count,
+                encoding="utf-8",
+            )
+        )
+    formatter = (
+        JsonFormatter()
+        if settings.log_format == "json"
+        else logging.Formatter(TEXT_FORMAT)
+    )
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def setup_logging(level: Optional[Union[int, str]] = None):
+    """
+    Route every record, uvicorn's included, through a queue: the event loop
+    only enqueues, a background thread formats the records and writes them
+    to stderr and to the rotating log file.
+    """
+    global _listener
+    previous = _listener.handlers if _listener is not None else ()
+    stop_logging()
+
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.log_queue_size)
+    queue_handler = BoundedQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter(settings.log_sample_rate))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in previous:
+        handler.close()
+    root.addHandler(queue_handler)
+    root.setLevel(level if level is not None else settings.log_level.upper())
+
+    # Send the server and access logs through the queue as well
+    for name in SERVER_LOGGERS:
+        server_logger = logging.getLogger(name)
+        for handler in server_logger.handlers[:]:
+            server_logger.removeHandler(handler)
+        server_logger.propagate = True
+
+    _listener = QueueListener(
+        log_queue, *_output_handlers(), respect_handler_level=True
     )
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """
+    Write the records still queued and stop the listener thread. The output
+    handlers then replace the queue on the root logger, so that the records
+    logged during shutdown and at exit are written instead of lost.
+    """
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, BoundedQueueHandler):
+            root.removeHandler(handler)
+            for handler_filter in handler.filters:
+                for output in _listener.handlers:
+                    output.addFilter(handler_filter)
+    for output in _listener.handlers:
+        root.addHandler(output)
+    _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def _request_id_from(scope: Scope) -> str:
+    for name, value in scope.get("headers", []):
+        if name == b"x-request-id":
+            request_id = value.decode("latin-1").strip()
+            if (
+                0 < len(request_id) <= MAX_REQUEST_ID_LENGTH
+                and request_id.isprintable()
+            ):
+                return request_id
+    return uuid.uuid4().hex
+
+
+class RequestIdMiddleware:
+    """
+    Gives each request an ID, taken from its X-Request-ID header or
+    generated, that tags its log records and is returned in the response.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _request_id_from(scope)
+        token = _request_id.set(request_id)
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = request_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _request_id.reset(token)
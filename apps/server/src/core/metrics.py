@@ -0,0 +1,140 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.core.tracing import record_span
+
+# Local stages take milliseconds, LLM calls up to several minutes
+STAGE_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+STAGE_SECONDS = Histogram(
+    "pipeline_stage_duration_seconds",
+    "Duration of one pipeline stage (clean, utilities, split, enhance, translate) for one document",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_duration_seconds",
+    "Duration of one upstream LLM call, until the last token for streamed calls",
+    ["model", "outcome"],
+    buckets=LLM_BUCKETS,
+)
+LLM_FIRST_TOKEN_SECONDS = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time between sending a streamed LLM call and receiving its first token",
+    ["model"],
+    buckets=LLM_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "llm_tokens",
+    "Tokens sent to and generated by the LLM, estimated when the provider reports no usage",
+    ["model", "direction"],
+)
+LLM_IN_FLIGHT = Gauge(
+    "llm_requests_in_flight", "LLM calls waiting for their response", ["model"]
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests being handled, streamed bodies included"
+)
+QUEUE_DEPTH = Gauge(
+    "queue_depth",
+    "Work waiting in a queue: background jobs or LLM calls held by the rate scheduler",
+    ["queue"],
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups",
+    "Cache lookups by result, the hit ratio being rate(hit) / rate(hit + miss)",
+    ["cache", "result"],
+)
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Context manager or decorator observing the duration of a stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Stage histogram, and span of the current request"""
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    record_span(stage, seconds)
+
+
+def record_cache_lookup(cache: str, hits: int, misses: int = 0) -> None:
+    if hits:
+        CACHE_LOOKUPS.labels(cache, "hit").inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(cache, "miss").inc(misses)
+
+
+def record_tokens(model: str, input_tokens: int, output_tokens: int) -> None:
+    LLM_TOKENS.labels(model, "input").inc(input_tokens)
+    LLM_TOKENS.labels(model, "output").inc(output_tokens)
+
+
+class LLMCallTimer:
+    """Latency, time to first token and in-flight count of one LLM call"""
+
+    def __init__(self, model: Optional[str]):
+        self.model = model or "unknown"
+        self.started = time.perf_counter()
+        self.first_token: Optional[float] = None
+        self.finished = False
+        LLM_IN_FLIGHT.labels(self.model).inc()
+
+    def token(self) -> None:
+        if self.first_token is None:
+            self.first_token = time.perf_counter() - self.started
+            LLM_FIRST_TOKEN_SECONDS.labels(self.model).observe(self.first_token)
+            record_span("first_token", self.first_token)
+
+    def finish(self, outcome: str) -> None:
+        if self.finished:
+            return
+        self.finished = True
+        duration = time.perf_counter() - self.started
+        LLM_IN_FLIGHT.labels(self.model).dec()
+        LLM_REQUEST_SECONDS.labels(self.model, outcome).observe(duration)
+        record_span("completion", duration)
+
+
+class InFlightMiddleware:
+    """
+    Counts the HTTP requests in flight. Written as a plain ASGI middleware so
+    that a streamed response counts until its last chunk is sent.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with HTTP_IN_FLIGHT.track_inprogress():
+            await self.app(scope, receive, send)
@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+from src.core.config import settings
+
+T = TypeVar("T")
+
+
+def flight_key(*parts: object) -> str:
+    """Hash of the content and parameters identifying a computation"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one in-flight computation.
+    The computation runs in its own task: a caller that goes away does not
+    cancel it for the others.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # The exception is delivered to the callers, if any are left
+        if not task.cancelled():
+            task.exception()
+
+
+class Broadcast:
+    """
+    Events of one stream, replayed to any number of subscribers: a subscriber
+    joining partway through first receives the events already produced.
+    Once the history outgrows `replay_bytes`, the events every subscriber has
+    read are dropped and the stream can no longer be joined from its start.
+    When the last subscriber leaves, the producer is cancelled, unless the
+    broadcast is detached: its result is kept by the producer itself.
+    """
+
+    def __init__(
+        self,
+        source: AsyncIterator[str],
+        detached: bool = False,
+        replay_bytes: Optional[int] = None,
+    ):
+        self.events: list[str] = []
+        # Position in the stream of events[0]
+        self.start = 0
+        self.size = 0
+        self.done = False
+        self.abandoned = False
+        self.error: Optional[BaseException] = None
+        self.detached = detached
+        self.replay_bytes = (
+            settings.stream_replay_bytes if replay_bytes is None else replay_bytes
+        )
+        self._cursors: dict[object, int] = {}
+        self._updated = asyncio.Event()
+        self.task = asyncio.create_task(self._produce(source))
+        self.task.add_done_callback(self._finished)
+
+    @property
+    def joinable(self) -> bool:
+        """A new subscriber would still receive the whole stream"""
+        return self.start == 0 and not self.abandoned
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._cursors)
+
+    async def _produce(self, source: AsyncIterator[str]) -> None:
+        async with aclosing(source):
+            async for event in source:
+                self.events.append(event)
+                self.size += len(event)
+                self._trim()
+                self._notify()
+
+    def _finished(self, task: asyncio.Task) -> None:
+        # The producer's exception is raised again to every subscriber
+        if not task.cancelled():
+            self.error = task.exception()
+        self.done = True
+        self._notify()
+
+    def _notify(self) -> None:
+        updated, self._updated = self._updated, asyncio.Event()
+        updated.set()
+
+    def _trim(self) -> None:
+        """Drop the events read by every subscriber once over replay_bytes"""
+        if self.size <= self.replay_bytes:
+            return
+        end = self.start + len(self.events)
+        read = min(self._cursors.values(), default=end) - self.start
+        # Shifting the list only once half of it can go keeps trimming linear
+        if not read or read * 2 < len(self.events):
+            return
+        self.size -= sum(map(len, self.events[:read]))
+        del self.events[:read]
+        self.start += read
+
+    def subscribe(self) -> AsyncIterator[str]:
+        # Counted right away, before the response starts reading the stream
+        cursor = object()
+        self._cursors[cursor] = self.start
+        return self._follow(cursor)
+
+    async def _follow(self, cursor: object) -> AsyncIterator[str]:
+        try:
+            while True:
+                index = self._cursors[cursor]
+                if index < self.start + len(self.events):
+                    self._cursors[cursor] = index + 1
+                    yield self.events[index - self.start]
+                    continue
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                self._trim()
+                await self._updated.wait()
+        finally:
+            del self._cursors[cursor]
+            if not self._cursors and not self.done and not self.detached:
+                # Nobody is left to read the stream: stop producing it
+                self.abandoned = True
+                self.task.cancel()
+            else:
+                self._trim()
+
+
+class StreamFlight:
+    """
+    Concurrent streams with the same key share one in-flight producer,
+    whose events are broadcast to every subscriber. With detached=True a
+    producer runs to the end even once every subscriber has left.
+    """
+
+    def __init__(self, detached: bool = False):
+        self._streams: dict[str, Broadcast] = {}
+        self.detached = detached
+        self.coalesced = 0
+
+    def subscribe(
+        self, key: str, factory: Callable[[], AsyncIterator[str]]
+    ) -> AsyncIterator[str]:
+        broadcast = self._streams.get(key)
+        if broadcast is None or not broadcast.joinable:
+            broadcast = Broadcast(factory(), self.detached)
+            self._streams[key] = broadcast
+            broadcast.task.add_done_callback(lambda _: self._forget(key, broadcast))
+        else:
+            self.coalesced += 1
+        return broadcast.subscribe()
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def _forget(self, key: str, broadcast: Broadcast) -> None:
+        if self._streams.get(key) is broadcast:
+            del self._streams[key]
@@ -0,0 +1,280 @@
+import contextvars
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from urllib.parse import parse_qs
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.config import settings
+
+PROFILE_TOKEN_HEADER = b"x-profile-token"
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread at a fixed interval from a daemon thread.
+    The event loop thread is shared by every request: its samples also
+    include the work of the requests running concurrently.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.self_counts: Counter[str] = Counter()
+        self.total_counts: Counter[str] = Counter()
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            functions = []
+            while frame is not None:
+                code = frame.f_code
+                functions.append(
+                    f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}"
+                    f"({code.co_name})"
+                )
+                frame = frame.f_back
+            with self._lock:
+                self.samples += 1
+                self.self_counts[functions[0]] += 1
+                self.total_counts.update(set(functions))
+
+    def summary(self, limit: int = 20) -> dict:
+        """Functions seen most often on top of the stack and anywhere in it"""
+        with self._lock:
+            samples = self.samples
+            self_counts = self.self_counts.most_common(limit)
+            total_counts = self.total_counts.most_common(limit)
+
+        def rows(counts: list[tuple[str, int]]) -> list[dict]:
+            return [
+                {
+                    "function": function,
+                    "samples": count,
+                    "percent": round(100 * count / samples, 1),
+                }
+                for function, count in counts
+            ]
+
+        return {
+            "interval_ms": self.interval * 1000,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "samples": samples,
+            "self": rows(self_counts),
+            "total": rows(total_counts),
+        }
+
+
+class Trace:
+    """
+    Spans recorded while handling one request, aggregated by name: a stage
+    run several times (one completion per chunk) is reported once with its
+    total duration and its count. Spans of concurrent tasks may overlap.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: dict[str, list] = {}
+        self.profiler: Optional[SamplingProfiler] = None
+
+    def record(self, name: str, seconds: float) -> None:
+        span = self.spans.setdefault(name, [0.0, 0])
+        span[0] += seconds
+        span[1] += 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        entries = []
+        for name, (seconds, count) in self.spans.items():
+            entry = f"{name};dur={seconds * 1000:.3f}"
+            if count > 1:
+                entry += f';desc="{count}x"'
+            entries.append(entry)
+        entries.append(f"total;dur={self.elapsed() * 1000:.3f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> dict:
+        return {
+            "total_ms": round(self.elapsed() * 1000, 3),
+            "spans": {
+                name: {"ms": round(seconds * 1000, 3), "count": count}
+                for name, (seconds, count) in self.spans.items()
+            },
+        }
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar(
+    "current_trace", default=None
+)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def record_span(name: str, seconds: float) -> None:
+    """Add a span to the trace of the current request, if any"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(name, seconds)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - started)
+
+
+class TracedJSONResponse(JSONResponse):
+    """JSON response whose serialization is recorded as a span"""
+
+    def render(self, content) -> bytes:
+        with span("serialize"):
+            return super().render(content)
+
+
+def _wants_profile(scope: Scope) -> bool:
+    """
+    Profiling slows the whole event loop down: ?profile=1 is only honoured
+    with an X-Profile-Token header matching the configured profile_token.
+    """
+    if not settings.profiling_enabled or not settings.profile_token:
+        return False
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    if query.get("profile", ["0"])[-1].lower() not in ("1", "true", "yes"):
+        return False
+    for name, value in scope.get("headers", []):
+        if name == PROFILE_TOKEN_HEADER:
+            return hmac.compare_digest(value, settings.profile_token.encode("utf-8"))
+    return False
+
+
+class TracingMiddleware:
+    """
+    Records the spans of each request and reports them in a Server-Timing
+    header. NDJSON streams get a final "timings" event with the spans of the
+    whole stream. With ?profile=1 and the profile token, a sampled CPU
+    profile of the request is added to that event, or to the body of a JSON
+    response.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.server_timing_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        token = _current_trace.set(trace)
+        if _wants_profile(scope):
+            trace.profiler = SamplingProfiler(
+                threading.get_ident(), settings.profile_interval_ms / 1000
+            )
+            trace.profiler.start()
+
+        mode = None
+        start: Optional[Message] = None
+        buffered: list[bytes] = []
+
+        async def send_traced(message: Message) -> None:
+            nonlocal mode, start
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", trace.server_timing())
+                content_type = headers.get("content-type", "")
+                if content_type.startswith("application/x-ndjson"):
+                    if "content-length" not in headers:
+                        mode = "ndjson"
+                elif trace.profiler and content_type.startswith("application/json"):
+                    # Held back until the body is complete and the profile added
+                    mode = "json"
+                    start = message
+                    return
+                await send(message)
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            more_body = message.get("more_body", False)
+            if mode == "ndjson" and not more_body:
+                if message.get("body"):
+                    await send({**message, "more_body": True})
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": _timings_event(trace).encode("utf-8"),
+                        "more_body": False,
+                    }
+                )
+                return
+
+            if mode == "json":
+                buffered.append(message.get("body", b""))
+                if more_body:
+                    return
+                body = _with_profile(b"".join(buffered), trace)
+                MutableHeaders(scope=start)["content-length"] = str(len(body))
+                await send(start)
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_traced)
+        finally:
+            if trace.profiler is not None:
+                trace.profiler.stop()
+            _current_trace.reset(token)
+
+
+def _timings_event(trace: Trace) -> str:
+    event = {"status": "timings", **trace.to_dict()}
+    if trace.profiler is not None:
+        event["profile"] = trace.profiler.summary()
+    return json.dumps(event) + "\n"
+
+
+def _with_profile(body: bytes, trace: Trace) -> bytes:
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    if not isinstance(data, dict):
+        return body
+    data["profile"] = trace.profiler.summary()
+    data["timings"] = trace.to_dict()
+    return json.dumps(data).encode("utf-8")
@@ -0,0 +1,5 @@
+from src.models.format_result import FormatResultEntry
+from src.models.job import Job
+from src.models.translation_memory import TranslationMemoryEntry
+
+__all__ = ["FormatResultEntry", "Job", "TranslationMemoryEntry"]
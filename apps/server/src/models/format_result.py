@@ -0,0 +1,12 @@
+from sqlalchemy import Column, DateTime, String, Text, func
+
+from src.core.database import Base
+
+
+class FormatResultEntry(Base):
+    __tablename__ = "format_results"
+
+    key = Column(String(64), primary_key=True)
+    etag = Column(String(80), nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
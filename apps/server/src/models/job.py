@@ -0,0 +1,20 @@
+from sqlalchemy import Column, DateTime, Float, Integer, String, Text, func
+
+from src.core.database import Base
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(String(32), primary_key=True)
+    kind = Column(String(32), nullable=False)
+    status = Column(String(16), nullable=False, index=True)
+    progress = Column(Float, nullable=False, default=0.0)
+    message = Column(Text, nullable=True)
+    params = Column(Text, nullable=False)
+    content = Column(Text, nullable=False)
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
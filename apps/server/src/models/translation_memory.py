@@ -0,0 +1,16 @@
+from sqlalchemy import Column, DateTime, String, Text, func
+
+from src.core.database import Base
+
+
+class TranslationMemoryEntry(Base):
+    __tablename__ = "translation_memory"
+
+    key = Column(String(64), primary_key=True)
+    source_language = Column(String(64), nullable=False)
+    target_language = Column(String(64), nullable=False)
+    model_name = Column(String(128), nullable=False)
+    prompt_version = Column(String(16), nullable=False)
+    source_text = Column(Text, nullable=False)
+    translated_text = Column(Text, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
@@ -1,21 +1,190 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Response
+from typing import Optional
+
+from fastapi import APIRouter, UploadFile, File, Header, HTTPException, Response
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 
+from src.core.singleflight import SingleFlight, StreamFlight
 from src.schemas.format import DocumentRequest, DocumentResponse
 from src.services.openai import OpenAIService
-from src.core.config import settings
+from src.services.incremental import process_document_incremental
+from src.services.ingest import (
+    IngestedUpload,
+    UploadTooLargeError,
+    ingest_upload,
+    iter_text_chunks,
+)
+from src.services.markdown import parse_markdown
+from src.services.scheduler import PRIORITY_INTERACTIVE, llm_priority
+from src.services.result_cache import (
+    FormatResult,
+    etag_matches,
+    make_etag,
+    make_key_etag,
+    result_cache,
+    result_key,
+    result_key_from_digest,
+)
 from src.services.vitepress import (
-    enhance_content_with_ai,
-    extract_sections,
-    format_vitepress_markdown,
-    add_vitepress_utilities,
+    StageOutput,
+    document_result,
+    iter_clean_vitepress_markdown,
+    process_document,
     process_document_streaming,
+    replay_document_streaming,
 )
 
 router = APIRouter()
 
 openai_service = OpenAIService()
 
+STREAMING_HEADERS = {"Cache-Control": "no-cache", "Connection": "keep-alive"}
+
+format_flight = SingleFlight()
+# Un flux abandonné par ses clients va à son terme : son résultat est mis en cache
+format_streams = StreamFlight(detached=True)
+
+
+async def _format_with_cache(
+    content: str, clean: bool, enhance: bool, key: Optional[str] = None
+) -> FormatResult:
+    """Renvoie le résultat en cache, ou formate le document et le met en cache"""
+    key = key or result_key(content, clean, enhance)
+    cached = await result_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Les requêtes identiques simultanées partagent un seul traitement
+    return await format_flight.do(
+        key, lambda: _format_and_cache(content, clean, enhance, key)
+    )
+
+
+async def _format_and_cache(
+    content: str, clean: bool, enhance: bool, key: str
+) -> FormatResult:
+    document, complete = await process_document(content, clean, enhance)
+    text = document.text
+    result = FormatResult(
+        key=key, etag=make_etag(key, text), content=text, document=document
+    )
+
+    # Ne pas mettre en cache un document dont l'amélioration AI a échoué
+    if complete:
+        await result_cache.set(result)
+    return result
+
+
+async def _format_upload(
+    upload: IngestedUpload, clean: bool, enhance: bool, key: str
+) -> FormatResult:
+    """
+    Résultat en cache, ou formatage de l'upload. Sans AI, un upload débordé
+    sur disque est nettoyé ligne à ligne depuis le fichier temporaire : seul
+    le résultat est chargé en mémoire, jamais le document d'origine.
+    """
+    cached = await result_cache.get(key)
+    if cached is not None:
+        return cached
+    if enhance or not upload.spilled:
+        content = upload.read_text()
+        return await format_flight.do(
+            key, lambda: _format_and_cache(content, clean, enhance, key)
+        )
+    # Pas de singleflight ici : la tâche partagée survivrait à l'appelant,
+    # qui ferme le fichier temporaire ; le nettoyage seul reste peu coûteux
+    return await _clean_upload_and_cache(upload, clean, key)
+
+
+async def _clean_upload_and_cache(
+    upload: IngestedUpload, clean: bool, key: str
+) -> FormatResult:
+    lines = (
+        iter_clean_vitepress_markdown(upload.iter_lines)
+        if clean
+        else upload.iter_lines()
+    )
+    # Le fichier temporaire est lu et nettoyé hors de la boucle d'événements
+    text = await run_in_threadpool(lambda: "".join(iter_text_chunks(lines)))
+    result = FormatResult(key=key, etag=make_etag(key, text), content=text)
+    await result_cache.set(result)
+    return result
+
+
+def _replay_result(result: FormatResult, if_none_match: Optional[str]) -> Response:
+    """Rejoue en streaming un résultat déjà calculé"""
+    if etag_matches(if_none_match, result.etag):
+        return _not_modified(result.etag)
+    return StreamingResponse(
+        replay_document_streaming(result.document or parse_markdown(result.content)),
+        media_type="application/x-ndjson",
+        headers={**STREAMING_HEADERS, "ETag": result.etag},
+    )
+
+
+async def _stream_with_cache(
+    content: str,
+    clean: bool,
+    enhance: bool,
+    if_none_match: Optional[str],
+    key: Optional[str] = None,
+) -> Response:
+    """Diffuse le traitement en streaming, ou rejoue le résultat en cache"""
+    key = key or result_key(content, clean, enhance)
+    cached = await result_cache.get(key)
+    if cached is not None:
+        return _replay_result(cached, if_none_match)
+    return _stream(content, clean, enhance, key)
+
+
+def _stream(content: str, clean: bool, enhance: bool, key: str) -> Response:
+    """Diffuse le traitement d'un document absent du cache"""
+
+    # Créer le générateur de streaming, le résultat complet est mis en cache
+    async def generate():
+        stage = StageOutput(None)
+        async for chunk in process_document_streaming(content, clean, enhance, stage):
+            yield chunk
+        if stage.complete:
+            text = stage.content
+            await result_cache.set(
+                FormatResult(key=key, etag=make_etag(key, text), content=text)
+            )
+
+    # Un client qui suit le flux passe avant les traitements de fond
+    llm_priority.set(PRIORITY_INTERACTIVE)
+
+    # Un flux identique déjà en cours est partagé : un abonné arrivé en cours
+    # de route reçoit d'abord les événements déjà produits
+    return StreamingResponse(
+        format_streams.subscribe(key, generate),
+        media_type="application/x-ndjson",
+        headers=STREAMING_HEADERS,
+    )
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+async def _read_markdown_upload(file: UploadFile) -> IngestedUpload:
+    # Vérifier le type de fichier
+    if not file.filename.endswith(".md"):
+        raise HTTPException(
+            status_code=400, detail="Le fichier doit être un fichier markdown (.md)"
+        )
+
+    # Recevoir le contenu par blocs : taille bornée, débordement sur disque
+    try:
+        return await ingest_upload(file)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=400, detail="Le fichier doit être encodé en UTF-8"
+        )
+
 
 @router.post(
     "/doc",
@@ -24,44 +193,31 @@ openai_service = OpenAIService()
     description="Nettoie et améliore la documentation markdown VitePress avec AI",
 )
 async def format_doc(
-    file: UploadFile = File(...), enhance: bool = True, clean: bool = True
+    response: Response,
+    file: UploadFile = File(...),
+    enhance: bool = True,
+    clean: bool = True,
+    if_none_match: Optional[str] = Header(None),
 ):
     try:
-        # Vérifier le type de fichier
-        if not file.filename.endswith(".md"):
-            raise HTTPException(
-                status_code=400, detail="Le fichier doit être un fichier markdown (.md)"
-            )
-
-        # Lire le contenu
-        content = await file.read()
-        content_str = content.decode("utf-8")
-
-        # Formater le contenu VitePress
-        if clean:
-            content_str = format_vitepress_markdown(content_str)
-            content_str = add_vitepress_utilities(content_str)
+        upload = await _read_markdown_upload(file)
+        try:
+            key = result_key_from_digest(upload.digest, clean, enhance)
 
-        # Améliorer avec AI
-        if enhance:
-            content_str = await enhance_content_with_ai(content_str)
+            # Formater le contenu VitePress et l'améliorer avec AI
+            result = await _format_upload(upload, clean, enhance, key)
+        finally:
+            upload.close()
+        if etag_matches(if_none_match, result.etag):
+            return _not_modified(result.etag)
 
-        # Extraire les sections
-        sections = extract_sections(content_str)
+        # Sections, nombre de mots et résumé issus de la même analyse
+        document = result.document or parse_markdown(result.content)
+        response.headers["ETag"] = result.etag
+        return DocumentResponse(**document_result(document))
 
-        # Compter les mots
-        word_count = len(content_str.split())
-
-        # Créer un résumé simple
-        model_name = settings.openai_model or "AI"
-        summary = f"Document formaté avec {model_name}: {len(sections)} sections et {word_count} mots"
-
-        return DocumentResponse(
-            formatted_content=content_str,
-            summary=summary,
-            word_count=word_count,
-            sections=sections,
-        )
+    except HTTPException:
+        raise
 
     except Exception as e:
         raise HTTPException(
@@ -75,34 +231,44 @@ async def format_doc(
     summary="Format Markdown from Text Input with AI",
     description="Formate du contenu markdown fourni directement en texte avec AI",
 )
-async def format_doc_text(request: DocumentRequest):
+async def format_doc_text(
+    request: DocumentRequest,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+):
     try:
-        content = request.content
-
-        # Formater le contenu VitePress
-        if request.clean:
-            content = format_vitepress_markdown(content)
-            content = add_vitepress_utilities(content)
-
-        # Améliorer avec AI
-        if request.enhance:
-            content = await enhance_content_with_ai(content)
+        recomputed_sections = None
+        total_sections = None
 
-        # Extraire les sections
-        sections = extract_sections(content)
-
-        # Compter les mots
-        word_count = len(content.split())
+        # Formater le contenu VitePress et l'améliorer avec AI
+        if request.incremental:
+            # Ne retraiter que les sections modifiées depuis la dernière soumission
+            incremental = await process_document_incremental(
+                request.content, request.clean, request.enhance
+            )
+            document = incremental.document
+            etag = make_etag(
+                result_key(request.content, request.clean, request.enhance),
+                document.text,
+            )
+            recomputed_sections = incremental.recomputed_sections
+            total_sections = incremental.total_sections
+        else:
+            result = await _format_with_cache(
+                request.content, request.clean, request.enhance
+            )
+            document = result.document or parse_markdown(result.content)
+            etag = result.etag
 
-        # Créer un résumé
-        model_name = settings.openai_model or "AI"
-        summary = f"Document formaté avec {model_name}: {len(sections)} sections et {word_count} mots"
+        if etag_matches(if_none_match, etag):
+            return _not_modified(etag)
 
+        # Sections, nombre de mots et résumé issus de la même analyse
+        response.headers["ETag"] = etag
         return DocumentResponse(
-            formatted_content=content,
-            summary=summary,
-            word_count=word_count,
-            sections=sections,
+            **document_result(document),
+            recomputed_sections=recomputed_sections,
+            total_sections=total_sections,
         )
 
     except Exception as e:
@@ -117,29 +283,30 @@ async def format_doc_text(request: DocumentRequest):
     description="Formate la documentation markdown VitePress avec AI et streaming en temps réel",
 )
 async def format_doc_stream(
-    file: UploadFile = File(...), enhance: bool = True, clean: bool = True
+    file: UploadFile = File(...),
+    enhance: bool = True,
+    clean: bool = True,
+    if_none_match: Optional[str] = Header(None),
 ):
     try:
-        # Vérifier le type de fichier
-        if not file.filename.endswith(".md"):
-            raise HTTPException(
-                status_code=400, detail="Le fichier doit être un fichier markdown (.md)"
-            )
-
-        # Lire le contenu
-        content = await file.read()
-        content_str = content.decode("utf-8")
-
-        # Créer le générateur de streaming
-        async def generate():
-            async for chunk in process_document_streaming(content_str, clean, enhance):
-                yield chunk
-
-        return StreamingResponse(
-            generate(),
-            media_type="application/x-ndjson",
-            headers={"Cache-Control": "no-cache", "Connection": "keep-alive"},
-        )
+        upload = await _read_markdown_upload(file)
+        try:
+            key = result_key_from_digest(upload.digest, clean, enhance)
+            cached = await result_cache.get(key)
+            if cached is not None:
+                return _replay_result(cached, if_none_match)
+
+            # Sans AI, un gros document est nettoyé ligne à ligne puis rejoué
+            if not enhance and upload.spilled:
+                result = await _format_upload(upload, clean, enhance, key)
+                return _replay_result(result, if_none_match)
+            content_str = upload.read_text()
+        finally:
+            upload.close()
+        return _stream(content_str, clean, enhance, key)
+
+    except HTTPException:
+        raise
 
     except Exception as e:
         raise HTTPException(
@@ -152,19 +319,12 @@ async def format_doc_stream(
     summary="Format Markdown Text with AI Streaming",
     description="Formate du contenu markdown avec AI et streaming en temps réel",
 )
-async def format_doc_text_stream(request: DocumentRequest):
+async def format_doc_text_stream(
+    request: DocumentRequest, if_none_match: Optional[str] = Header(None)
+):
     try:
-        # Créer le générateur de streaming
-        async def generate():
-            async for chunk in process_document_streaming(
-                request.content, request.clean, request.enhance
-            ):
-                yield chunk
-
-        return StreamingResponse(
-            generate(),
-            media_type="application/x-ndjson",
-            headers={"Cache-Control": "no-cache", "Connection": "keep-alive"},
+        return await _stream_with_cache(
+            request.content, request.clean, request.enhance, if_none_match
         )
 
     except Exception as e:
@@ -179,37 +339,62 @@ async def format_doc_text_stream(request: DocumentRequest):
     description="Formate la documentation VitePress et renvoie uniquement le contenu markdown",
 )
 async def format_doc_markdown(
-    file: UploadFile = File(...), enhance: bool = True, clean: bool = True
+    file: UploadFile = File(...),
+    enhance: bool = True,
+    clean: bool = True,
+    if_none_match: Optional[str] = Header(None),
 ):
     try:
-        # Vérifier le type de fichier
-        if not file.filename.endswith(".md"):
-            raise HTTPException(
-                status_code=400, detail="Le fichier doit être un fichier markdown (.md)"
-            )
-
-        # Lire le contenu
-        content = await file.read()
-        content_str = content.decode("utf-8")
-
-        # Formater le contenu VitePress
-        if clean:
-            content_str = format_vitepress_markdown(content_str)
-            content_str = add_vitepress_utilities(content_str)
-
-        # Améliorer avec AI
-        if enhance:
-            content_str = await enhance_content_with_ai(content_str)
+        upload = await _read_markdown_upload(file)
+        try:
+            disposition = f"inline; filename={file.filename}"
+            key = result_key_from_digest(upload.digest, clean, enhance)
+
+            # Gros document sans AI : nettoyer ligne à ligne depuis le fichier
+            # temporaire, sans jamais charger le document entier en mémoire
+            if not enhance and upload.spilled:
+                # Sans AI, le résultat ne dépend que de la clé : ETag connu d'avance
+                etag = make_key_etag(key)
+                if etag_matches(if_none_match, etag):
+                    return _not_modified(etag)
+
+                lines = (
+                    iter_clean_vitepress_markdown(upload.iter_lines)
+                    if clean
+                    else upload.iter_lines()
+                )
+                response = StreamingResponse(
+                    iter_text_chunks(lines),
+                    media_type="text/plain; charset=utf-8",
+                    headers={"Content-Disposition": disposition, "ETag": etag},
+                    background=BackgroundTask(upload.close),
+                )
+                # La réponse possède désormais l'upload : fermé après l'envoi
+                upload = None
+                return response
+
+            # Formater le contenu VitePress et l'améliorer avec AI
+            result = await _format_upload(upload, clean, enhance, key)
+        finally:
+            # Jusqu'à sa remise à la réponse, l'upload est fermé ici
+            if upload is not None:
+                upload.close()
+        if etag_matches(if_none_match, result.etag):
+            return _not_modified(result.etag)
 
         # Retourner le markdown comme texte brut
         return Response(
-            content=content_str,
+            content=result.content,
             media_type="text/plain; charset=utf-8",
             headers={
-                "Content-Disposition": f"inline; filename={file.filename}",
+                "Content-Disposition": disposition,
+                "ETag": result.etag,
             },
         )
 
+    except HTTPException:
+        raise
+
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Erreur lors du formatage : {str(e)}"
@@ -221,25 +406,24 @@ async def format_doc_markdown(
     summary="Format Markdown Text - Content Only",
     description="Formate du contenu markdown et renvoie uniquement le contenu formaté",
 )
-async def format_doc_text_markdown(request: DocumentRequest):
+async def format_doc_text_markdown(
+    request: DocumentRequest, if_none_match: Optional[str] = Header(None)
+):
     try:
-        content = request.content
-
-        # Formater le contenu VitePress
-        if request.clean:
-            content = format_vitepress_markdown(content)
-            content = add_vitepress_utilities(content)
-
-        # Améliorer avec AI
-        if request.enhance:
-            content = await enhance_content_with_ai(content)
+        # Formater le contenu VitePress et l'améliorer avec AI
+        result = await _format_with_cache(
+            request.content, request.clean, request.enhance
+        )
+        if etag_matches(if_none_match, result.etag):
+            return _not_modified(result.etag)
 
         # Retourner le markdown comme texte brut
         return Response(
-            content=content,
+            content=result.content,
             media_type="text/plain; charset=utf-8",
             headers={
                 "Content-Disposition": "inline; filename=formatted.md",
+                "ETag": result.etag,
             },
         )
 
@@ -247,8 +431,3 @@ async def format_doc_text_markdown(request: DocumentRequest):
         raise HTTPException(
             status_code=500, detail=f"Erreur lors du formatage : {str(e)}"
         )
-
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Erreur lors du formatage : {str(e)}"
-        )
@@ -0,0 +1,96 @@
+import json
+
+from fastapi import APIRouter, HTTPException
+
+from src.models.job import Job
+from src.schemas.format import DocumentRequest
+from src.schemas.jobs import JobResponse, JobResultResponse
+from src.schemas.translate import TranslateRequest
+from src.services.jobs import COMPLETED, FAILED, job_manager
+
+router = APIRouter()
+
+
+def _job_response(job: Job) -> JobResponse:
+    return JobResponse(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        progress=job.progress,
+        message=job.message,
+        error=job.error,
+        attempts=job.attempts,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+    )
+
+
+async def _get_job(job_id: str) -> Job:
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@router.post(
+    "/format",
+    response_model=JobResponse,
+    status_code=202,
+    summary="Queue a Markdown Formatting Job",
+    description="Queues the formatting of a document and returns the job ID right away",
+)
+async def submit_format_job(request: DocumentRequest):
+    job = await job_manager.submit(
+        "format",
+        {"clean": request.clean, "enhance": request.enhance},
+        request.content,
+    )
+    return _job_response(job)
+
+
+@router.post(
+    "/translate",
+    response_model=JobResponse,
+    status_code=202,
+    summary="Queue a Translation Job",
+    description="Queues the translation of a document and returns the job ID right away",
+)
+async def submit_translate_job(request: TranslateRequest):
+    job = await job_manager.submit(
+        "translate",
+        {
+            "source_language": request.source_language,
+            "target_language": request.target_language,
+            "model_name": request.model_name,
+            "chunked": request.chunked,
+        },
+        request.content,
+    )
+    return _job_response(job)
+
+
+@router.get(
+    "/{job_id}",
+    response_model=JobResponse,
+    summary="Get Job Status",
+    description="Returns the status and progress of a job",
+)
+async def get_job(job_id: str):
+    return _job_response(await _get_job(job_id))
+
+
+@router.get(
+    "/{job_id}/result",
+    response_model=JobResultResponse,
+    summary="Get Job Result",
+    description="Returns the result of a completed job",
+)
+async def get_job_result(job_id: str):
+    job = await _get_job(job_id)
+    if job.status == FAILED:
+        raise HTTPException(status_code=409, detail=f"Job failed: {job.error}")
+    if job.status != COMPLETED:
+        raise HTTPException(
+            status_code=409, detail=f"Job is not completed yet ({job.status})"
+        )
+    return JobResultResponse(id=job.id, kind=job.kind, result=json.loads(job.result))
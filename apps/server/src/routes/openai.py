@@ -23,3 +23,13 @@ async def get_openai_health():
 async def get_openai_models():
     service = OpenAIService()
     return await service.get_models()
+
+
+@router.get(
+    "/resilience",
+    summary="Get Chat Completion Resilience Statistics",
+    description="Returns the retry, hedging and fallback policy with the latency percentiles per target and the timing of the latest attempts.",
+)
+async def get_openai_resilience():
+    service = OpenAIService()
+    return service.resilience_stats()
@@ -1,13 +1,50 @@
 import logging
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from src.core.singleflight import SingleFlight, StreamFlight, flight_key
+from src.services.batch import ArchiveError, ArchiveTooLargeError, translate_archive
+from src.services.ingest import UploadTooLargeError, ingest_upload
+from src.services.scheduler import PRIORITY_INTERACTIVE, llm_priority
 from src.services.translate import TranslateService
-from src.schemas.translate import TranslateRequest, TranslateResponse
+from src.schemas.translate import TranslateResponse
 
 router = APIRouter()
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+translate_flight = SingleFlight()
+translate_streams = StreamFlight()
+
+
+async def _read_segments(
+    file: UploadFile,
+    translate_service: TranslateService,
+    chunked: bool,
+    *params: object,
+) -> tuple[list[str], str]:
+    """
+    Receive an upload with a bounded size, validated as UTF-8, and split it
+    into the segments to translate, with the key identifying the translation.
+    A chunked upload is split line by line from its spooled copy, so only
+    the segments are held in memory; unchunked, the model needs it whole.
+    """
+    try:
+        upload = await ingest_upload(file)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+
+    try:
+        logger.info(f"Translating {file.filename} ({upload.size} bytes)")
+        segments = await run_in_threadpool(
+            translate_service.split, upload.iter_lines(), chunked
+        )
+        return segments, flight_key(upload.digest, *params, chunked)
+    finally:
+        upload.close()
+
 
 @router.post("/translate-file", response_model=TranslateResponse)
 async def translate_file(
@@ -15,32 +52,143 @@ async def translate_file(
     source_language: str = Form(...),
     target_language: str = Form(...),
     model_name: str = Form(...),
+    chunked: bool = Form(False),
 ):
     try:
-        content = await file.read()
-        logger.info(f"File content: {content[:100]}")
-        content_str = content.decode("utf-8")
+        translate_service = TranslateService(model_name=model_name)
+        segments, key = await _read_segments(
+            file,
+            translate_service,
+            chunked,
+            source_language,
+            target_language,
+            model_name,
+        )
+
+        # Identical concurrent requests share a single translation
+        result = await translate_flight.do(
+            key,
+            lambda: translate_service.translate_split_document(
+                segments=segments,
+                source_language=source_language,
+                target_language=target_language,
+                model_name=model_name,
+            ),
+        )
 
-        translation_req = TranslateRequest(
-            content=content_str,
+        return TranslateResponse(
+            translated_content=result.content,
             source_language=source_language,
             target_language=target_language,
-            model_name=model_name,
+            model_used=model_name,
+            cache_hits=result.cache_hits,
+            cache_misses=result.cache_misses,
         )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error translating file: {str(e)}")
+
 
-        translate_service = TranslateService(model_name=translation_req.model_name)
-        translated_text = await translate_service.translate_markdown(
-            content=translation_req.content,
-            source_language=translation_req.source_language,
-            target_language=translation_req.target_language,
-            model_name=translation_req.model_name,
+@router.post(
+    "/translate-file/stream",
+    summary="Translate Markdown File with Streaming",
+    description="Streams the translated Markdown as NDJSON deltas while the model generates it",
+)
+async def translate_file_stream(
+    file: UploadFile = File(...),
+    source_language: str = Form(...),
+    target_language: str = Form(...),
+    model_name: str = Form(...),
+    chunked: bool = Form(False),
+):
+    try:
+        translate_service = TranslateService(model_name=model_name)
+        segments, key = await _read_segments(
+            file,
+            translate_service,
+            chunked,
+            source_language,
+            target_language,
+            model_name,
         )
 
-        return TranslateResponse(
-            translated_content=translated_text,
-            source_language=translation_req.source_language,
-            target_language=translation_req.target_language,
-            model_used=translation_req.model_name,
+        # A client following the stream goes before background work
+        llm_priority.set(PRIORITY_INTERACTIVE)
+
+        # Identical concurrent streams share one translation, a subscriber
+        # joining partway through first receives the deltas already produced
+        return StreamingResponse(
+            translate_streams.subscribe(
+                key,
+                lambda: translate_service.translate_segments_streaming(
+                    segments=segments,
+                    source_language=source_language,
+                    target_language=target_language,
+                    model_name=model_name,
+                ),
+            ),
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "Connection": "keep-alive"},
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error translating file: {str(e)}")
+
+
+@router.post(
+    "/translate-batch",
+    summary="Translate an Archive of Markdown Files",
+    description="Translates every .md file of a zip or tar archive into several languages and returns a zip with one directory per language",
+)
+async def translate_batch(
+    file: UploadFile = File(...),
+    source_language: str = Form(...),
+    target_languages: list[str] = Form(...),
+    model_name: str = Form(...),
+):
+    languages = [
+        language.strip()
+        for value in target_languages
+        for language in value.split(",")
+        if language.strip()
+    ]
+    if not languages:
+        raise HTTPException(
+            status_code=400, detail="At least one target language is required"
+        )
+
+    try:
+        upload = await ingest_upload(file, text=False)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    try:
+        result = await translate_archive(
+            upload.open(),
+            source_language=source_language,
+            target_languages=languages,
+            model_name=model_name,
+        )
+    except ArchiveTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error translating archive: {str(e)}"
+        )
+    finally:
+        upload.close()
+
+    return Response(
+        content=result.archive,
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": "attachment; filename=translations.zip",
+            "X-Translated-Files": str(result.files * result.languages),
+            "X-Cache-Hits": str(result.cache_hits),
+            "X-Cache-Misses": str(result.cache_misses),
+        },
+    )
@@ -6,6 +6,7 @@ class DocumentRequest(BaseModel):
     content: str
     enhance: Optional[bool] = True
     clean: Optional[bool] = True
+    incremental: Optional[bool] = False
 
 
 class DocumentResponse(BaseModel):
@@ -13,3 +14,5 @@ class DocumentResponse(BaseModel):
     summary: str
     word_count: int
     sections: list[str]
+    recomputed_sections: Optional[list[int]] = None
+    total_sections: Optional[int] = None
@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    progress: float
+    message: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class JobResultResponse(BaseModel):
+    id: str
+    kind: str
+    result: Any
@@ -6,6 +6,10 @@ class TranslateRequest(BaseModel):
     source_language: str = Field(..., description="Source language")
     target_language: str = Field(..., description="Target language")
     model_name: str = Field(default="gpt-oss", description="Model to use")
+    chunked: bool = Field(
+        default=False,
+        description="Split the document into segments translated concurrently",
+    )
 
 
 class TranslateResponse(BaseModel):
@@ -13,3 +17,5 @@ class TranslateResponse(BaseModel):
     source_language: str
     target_language: str
     model_used: str
+    cache_hits: int = 0
+    cache_misses: int = 0
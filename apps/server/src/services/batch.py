@@ -0,0 +1,189 @@
+import asyncio
+import io
+import posixpath
+import tarfile
+import zipfile
+from dataclasses import dataclass
+from typing import BinaryIO, NoReturn, Optional, Union
+
+from starlette.concurrency import run_in_threadpool
+
+from src.core.config import settings
+from src.services.scheduler import PRIORITY_BACKGROUND, llm_priority
+from src.services.splitter import split_markdown_segments
+from src.services.translate import TranslateService
+
+
+class ArchiveError(ValueError):
+    """Raised when an uploaded archive cannot be read"""
+
+
+class ArchiveTooLargeError(ArchiveError):
+    """Raised when an archive holds too many files or expands past the size limit"""
+
+
+@dataclass
+class BatchResult:
+    archive: bytes
+    files: int
+    languages: int
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+
+def read_markdown_archive(data: Union[bytes, BinaryIO]) -> dict[str, str]:
+    """Read every .md file of a zip or tar archive, keyed by its relative path"""
+    try:
+        return _read_archive(data)
+    except UnicodeDecodeError as e:
+        raise ArchiveError(f"Markdown files must be UTF-8 encoded: {str(e)}")
+    except zipfile.BadZipFile as e:
+        raise ArchiveError(f"Invalid zip archive: {str(e)}")
+
+
+def _read_archive(data: Union[bytes, BinaryIO]) -> dict[str, str]:
+    files: dict[str, str] = {}
+    # A file object (possibly spilled to disk) is read in place, without a copy
+    buffer = io.BytesIO(data) if isinstance(data, bytes) else data
+    # Extracted files share the upload limit, checked before each one is read
+    limits = _ArchiveLimits(settings.archive_max_members, settings.max_upload_bytes)
+
+    if zipfile.is_zipfile(buffer):
+        with zipfile.ZipFile(buffer) as archive:
+            for info in archive.infolist():
+                limits.add_member()
+                if not info.is_dir() and info.filename.endswith(".md"):
+                    path = _safe_path(info.filename)
+                    with archive.open(info) as source:
+                        content = limits.read(source, info.file_size)
+                    files[path] = content.decode("utf-8")
+        return files
+
+    buffer.seek(0)
+    try:
+        with tarfile.open(fileobj=buffer, mode="r:*") as archive:
+            # Members are read as they come, without listing them all first
+            for member in archive:
+                limits.add_member()
+                if member.isfile() and member.name.endswith(".md"):
+                    path = _safe_path(member.name)
+                    content = limits.read(archive.extractfile(member), member.size)
+                    files[path] = content.decode("utf-8")
+    except tarfile.TarError:
+        raise ArchiveError("Unsupported archive format, expected a zip or tar file")
+
+    return files
+
+
+class _ArchiveLimits:
+    """Member count and extracted size budgets of one archive"""
+
+    def __init__(self, max_members: int, max_bytes: int):
+        self.max_members = max_members
+        self.max_bytes = max_bytes
+        self.members = 0
+        self.size = 0
+
+    def add_member(self) -> None:
+        self.members += 1
+        if self.members > self.max_members:
+            raise ArchiveTooLargeError(
+                f"Archive holds more than {self.max_members} entries"
+            )
+
+    def read(self, source: BinaryIO, declared_size: int) -> bytes:
+        """Read a member whose declared size fits the remaining budget"""
+        remaining = self.max_bytes - self.size
+        if declared_size > remaining:
+            self._too_large()
+        # The declared size is not trusted: never read past the budget
+        content = source.read(remaining + 1)
+        if len(content) > remaining:
+            self._too_large()
+        self.size += len(content)
+        return content
+
+    def _too_large(self) -> NoReturn:
+        raise ArchiveTooLargeError(
+            f"Archive expands past the maximum size of {self.max_bytes} bytes"
+        )
+
+
+def write_zip_archive(files: dict[str, str]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for path, content in sorted(files.items()):
+            archive.writestr(path, content)
+    return buffer.getvalue()
+
+
+async def translate_archive(
+    data: Union[bytes, BinaryIO],
+    source_language: str,
+    target_languages: list[str],
+    model_name: Optional[str] = None,
+) -> BatchResult:
+    """
+    Translate every Markdown file of an archive into several languages.
+    Each file is segmented once, then all (file x language x segment) work
+    items share a single bounded pool. The output zip holds one directory
+    per target language mirroring the input layout.
+    """
+    # Decompression, tokenization and compression stay off the event loop
+    files = await run_in_threadpool(read_markdown_archive, data)
+    if not files:
+        raise ArchiveError("The archive does not contain any .md file")
+
+    service = TranslateService(model_name=model_name)
+    model = service.model_name
+    semaphore = asyncio.Semaphore(settings.batch_concurrency)
+    segments = await run_in_threadpool(_split_files, files)
+
+    jobs = [(language, path) for language in target_languages for path in segments]
+
+    # Bulk work gives way to interactive requests in the LLM rate scheduler
+    priority = llm_priority.set(PRIORITY_BACKGROUND)
+    tasks = [
+        asyncio.create_task(
+            service.translate_segments(
+                segments[path], source_language, language, model, semaphore
+            )
+        )
+        for language, path in jobs
+    ]
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        # The archive fails with its first failed document: stop the others
+        for task in tasks:
+            task.cancel()
+        raise
+    finally:
+        llm_priority.reset(priority)
+
+    translated = {
+        posixpath.join(language, path): result.content
+        for (language, path), result in zip(jobs, results, strict=True)
+    }
+
+    return BatchResult(
+        archive=await run_in_threadpool(write_zip_archive, translated),
+        files=len(files),
+        languages=len(target_languages),
+        cache_hits=sum(result.cache_hits for result in results),
+        cache_misses=sum(result.cache_misses for result in results),
+    )
+
+
+def _split_files(files: dict[str, str]) -> dict[str, list[str]]:
+    return {
+        path: split_markdown_segments(content, settings.translate_chunk_tokens)
+        for path, content in files.items()
+    }
+
+
+def _safe_path(name: str) -> str:
+    path = posixpath.normpath(name.replace("\\", "/")).lstrip("/")
+    if path.startswith("..") or path == ".":
+        raise ArchiveError(f"Invalid path in archive: {name}")
+    return path
@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass, field
+
+from src.core.cache import LRUCache
+from src.core.config import settings
+from src.core.metrics import record_cache_lookup
+from src.services.markdown import ParsedDocument, parse_markdown
+from src.services.vitepress import (
+    ENHANCE_PROMPT_VERSION,
+    add_vitepress_utilities_document,
+    format_vitepress_document,
+    request_ai_enhancement,
+)
+
+logger = logging.getLogger(__name__)
+
+section_cache = LRUCache(settings.section_cache_size)
+
+
+@dataclass
+class IncrementalResult:
+    document: ParsedDocument
+    recomputed_sections: list[int] = field(default_factory=list)
+    total_sections: int = 0
+
+
+def section_key(text: str, clean: bool, enhance: bool) -> str:
+    digest = hashlib.sha256()
+    for part in (
+        "clean" if clean else "raw",
+        f"{settings.openai_model}:{ENHANCE_PROMPT_VERSION}" if enhance else "",
+        text,
+    ):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+async def process_document_incremental(
+    content: str, clean: bool = True, enhance: bool = True
+) -> IncrementalResult:
+    """
+    Traite un document section par section (sections délimitées par les titres).
+    Seules les sections dont le hash a changé repassent par le nettoyage et
+    l'amélioration AI, les autres sont servies depuis le cache de sections.
+    Les utilitaires VitePress (frontmatter, table des matières) portent sur le
+    document entier et sont réappliqués à l'assemblage.
+    """
+    document = parse_markdown(content)
+    frontmatter = document.slice(0, document.body_start)
+    if clean:
+        frontmatter = format_vitepress_document(frontmatter)
+
+    ranges = document.section_ranges()
+    sections = [document.slice(start, stop) for start, stop in ranges]
+    keys = [section_key(section.text, clean, enhance) for section in sections]
+    semaphore = asyncio.Semaphore(settings.enhance_concurrency)
+
+    async def process_section(key: str, section: ParsedDocument) -> str:
+        if clean:
+            section = format_vitepress_document(section)
+        text = section.text
+        if not enhance or not text.strip():
+            section_cache.set(key, text)
+            return text
+
+        body = text.strip("\n")
+        leading = text[: len(text) - len(text.lstrip("\n"))]
+        trailing = text[len(text.rstrip("\n")) :]
+        try:
+            async with semaphore:
+                enhanced = await request_ai_enhancement(body)
+        except Exception as e:
+            # Section non améliorée : ne pas la mettre en cache
+            logger.warning(
+                f"Erreur lors de l'amélioration AI de la section: {e}", exc_info=True
+            )
+            return text
+
+        text = leading + enhanced.strip("\n") + trailing
+        section_cache.set(key, text)
+        return text
+
+    texts = {}
+    pending = {}
+    for index, key in enumerate(keys):
+        if key in texts or key in pending:
+            continue
+        cached = section_cache.get(key)
+        record_cache_lookup("section", cached is not None, cached is None)
+        if cached is None:
+            pending[key] = index
+        else:
+            texts[key] = cached
+
+    results = await asyncio.gather(
+        *(process_section(key, sections[index]) for key, index in pending.items())
+    )
+    texts.update(zip(pending, results, strict=True))
+
+    parts = [frontmatter.text] if len(frontmatter) else []
+    parts.extend(texts[key] for key in keys)
+    assembled = parse_markdown("\n".join(parts))
+    if clean:
+        assembled = add_vitepress_utilities_document(assembled)
+
+    return IncrementalResult(
+        document=assembled,
+        recomputed_sections=[index for index, key in enumerate(keys) if key in pending],
+        total_sections=len(sections),
+    )
@@ -0,0 +1,178 @@
+import codecs
+import hashlib
+import tempfile
+from contextlib import ExitStack
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.config import settings
+from src.core.tracing import span
+
+READ_BLOCK_SIZE = 64 * 1024
+# Boundaries, part headers and the other form fields around an uploaded file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured maximum size"""
+
+
+class IngestedUpload:
+    """
+    Upload copied into a spooled temporary file: kept in memory below
+    `upload_spool_bytes`, spilled to disk above. The content is validated as
+    UTF-8 and hashed while it is received, and can be read back line by line
+    as many times as needed without holding the whole document in memory.
+    """
+
+    def __init__(
+        self,
+        spool: tempfile.SpooledTemporaryFile,
+        size: int,
+        digest: str,
+        spilled: bool,
+    ):
+        self.spool = spool
+        self.size = size
+        self.digest = digest
+        self.spilled = spilled
+
+    def iter_lines(self) -> Iterator[str]:
+        """Decode the upload incrementally, with the semantics of str.split("\\n")"""
+        self.spool.seek(0)
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        remainder = ""
+        while block := self.spool.read(READ_BLOCK_SIZE):
+            text = remainder + decoder.decode(block)
+            lines = text.split("\n")
+            remainder = lines.pop()
+            yield from lines
+        yield remainder + decoder.decode(b"", final=True)
+
+    def open(self) -> BinaryIO:
+        """Binary file positioned at the start of the upload"""
+        self.spool.seek(0)
+        return self.spool
+
+    def read_text(self) -> str:
+        self.spool.seek(0)
+        return self.spool.read().decode("utf-8")
+
+    def close(self) -> None:
+        self.spool.close()
+
+
+async def ingest_upload(
+    file: UploadFile,
+    max_bytes: Optional[int] = None,
+    spool_bytes: Optional[int] = None,
+    text: bool = True,
+) -> IngestedUpload:
+    """
+    Copy an upload block by block, enforcing its maximum size.
+    With text=True the content must be valid UTF-8 (UnicodeDecodeError).
+    """
+    max_bytes = max_bytes or settings.max_upload_bytes
+    spool_bytes = spool_bytes or settings.upload_spool_bytes
+    with ExitStack() as stack:
+        spool = stack.enter_context(tempfile.SpooledTemporaryFile(max_size=spool_bytes))
+        with span("upload"):
+            # Reads and writes may hit the disk: keep them off the event loop
+            size, digest = await run_in_threadpool(
+                _copy_upload, file.file, spool, max_bytes, text
+            )
+        # Received in full: the spool now belongs to the IngestedUpload
+        stack.pop_all()
+
+    return IngestedUpload(spool, size, digest, size > spool_bytes)
+
+
+def _copy_upload(
+    source: BinaryIO, spool: BinaryIO, max_bytes: int, text: bool
+) -> tuple[int, str]:
+    """Copy an upload into the spool, returning its size and sha256"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    digest = hashlib.sha256()
+    size = 0
+
+    source.seek(0)
+    while block := source.read(READ_BLOCK_SIZE):
+        size += len(block)
+        if size > max_bytes:
+            raise UploadTooLargeError(
+                f"Upload exceeds the maximum size of {max_bytes} bytes"
+            )
+        if text:
+            decoder.decode(block)
+        digest.update(block)
+        spool.write(block)
+    if text:
+        decoder.decode(b"", final=True)
+    return size, digest.hexdigest()
+
+
+class UploadLimitMiddleware:
+    """
+    Rejects request bodies larger than the maximum upload size, plus room
+    for the multipart envelope, while they are received: from Content-Length
+    when it is sent, otherwise as soon as the received bytes exceed it.
+    Without it the whole body is parsed before ingest_upload can refuse it.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: Optional[int] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = (
+            self.max_bytes or settings.max_upload_bytes
+        ) + MULTIPART_OVERHEAD_BYTES
+        detail = f"Request body exceeds the maximum size of {max_bytes} bytes"
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > max_bytes:
+                response = JSONResponse({"detail": detail}, status_code=413)
+                await response(scope, receive, send)
+                return
+
+        received = 0
+
+        async def receive_limited() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # Re-raised by FastAPI while it parses the body
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, receive_limited, send)
+
+
+def iter_text_chunks(
+    lines: Iterable[str], chunk_size: int = READ_BLOCK_SIZE
+) -> Iterator[str]:
+    """Join lines back with "\\n" into chunks of roughly chunk_size characters"""
+    buffer: list[str] = []
+    size = 0
+    first = True
+    for line in lines:
+        if not first:
+            buffer.append("\n")
+        buffer.append(line)
+        first = False
+        size += len(line) + 1
+        if size >= chunk_size:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer)
@@ -0,0 +1,272 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.core.config import settings
+from src.core.metrics import QUEUE_DEPTH
+from src.core.database import AsyncSessionLocal, PruneSchedule, prune_rows
+from src.models.job import Job
+from src.services.markdown import parse_markdown
+from src.services.scheduler import PRIORITY_BACKGROUND, llm_priority
+from src.services.result_cache import FormatResult, make_etag, result_cache, result_key
+from src.services.translate import TranslateService
+from src.services.vitepress import (
+    StageOutput,
+    document_result,
+    process_document_streaming,
+)
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Minimum delay between two progress writes of the same job, in seconds
+PROGRESS_INTERVAL = 1.0
+
+
+class JobError(Exception):
+    """Raised when the processing of a job reports an error"""
+
+
+async def _format_events(content: str, params: dict) -> AsyncIterator[dict]:
+    clean, enhance = params["clean"], params["enhance"]
+    key = result_key(content, clean, enhance)
+    cached = await result_cache.get(key)
+    if cached is not None:
+        result = document_result(parse_markdown(cached.content))
+        yield {"status": "completed", "progress": 100, "result": result}
+        return
+
+    stage = StageOutput(None)
+    async for chunk in process_document_streaming(content, clean, enhance, stage):
+        yield json.loads(chunk)
+
+    # Same rule as the format routes: only complete results are cached
+    if stage.complete:
+        text = stage.content
+        await result_cache.set(
+            FormatResult(key=key, etag=make_etag(key, text), content=text)
+        )
+
+
+async def _translate_events(content: str, params: dict) -> AsyncIterator[dict]:
+    translate_service = TranslateService(model_name=params["model_name"])
+    async for chunk in translate_service.translate_markdown_streaming(
+        content=content,
+        source_language=params["source_language"],
+        target_language=params["target_language"],
+        model_name=params["model_name"],
+        chunked=params["chunked"],
+    ):
+        yield json.loads(chunk)
+
+
+# Each job kind runs one of the NDJSON streaming pipelines, whose events
+# provide the progress and whose "completed" event carries the result
+JOB_RUNNERS = {
+    "format": _format_events,
+    "translate": _translate_events,
+}
+
+
+class JobManager:
+    """
+    Persistent job queue run by an in-process worker pool.
+    Jobs are stored in the application database, so that jobs left queued
+    or running by a previous process are queued again on startup. Finished
+    jobs are pruned by age and row count as workers complete jobs.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None):
+        self.concurrency = concurrency or settings.job_concurrency
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: list[asyncio.Task] = []
+        self.prune_schedule = PruneSchedule()
+
+    async def start(self) -> None:
+        self.queue = asyncio.Queue()
+        for job_id in await self._recover():
+            self.queue.put_nowait(job_id)
+        self.workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        """Stop the workers, interrupted jobs stay running and resume on restart"""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def submit(self, kind: str, params: dict, content: str) -> Job:
+        if kind not in JOB_RUNNERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self.queue is None:
+            raise RuntimeError("Job manager is not started")
+
+        job = Job(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            status=QUEUED,
+            progress=0.0,
+            params=json.dumps(params),
+            content=content,
+            attempts=0,
+        )
+        job = await self._insert(job)
+        self.queue.put_nowait(job.id)
+        return job
+
+    def queued(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await self._get(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception(f"Job {job_id} could not be processed")
+            finally:
+                self.queue.task_done()
+            if self.prune_schedule.due():
+                await self.prune()
+
+    async def prune(self) -> int:
+        """Delete the finished jobs that are too old or past the row limit"""
+        async with AsyncSessionLocal() as db:
+            try:
+                deleted = await prune_rows(
+                    db,
+                    Job.updated_at,
+                    settings.job_ttl,
+                    settings.job_max_rows,
+                    where=(Job.status.in_([COMPLETED, FAILED]),),
+                )
+                await db.commit()
+            except SQLAlchemyError as e:
+                await db.rollback()
+                logger.warning(f"Failed to prune jobs: {e}")
+                return 0
+        if deleted:
+            logger.info(f"Pruned {deleted} finished jobs")
+        return deleted
+
+    async def _run(self, job_id: str) -> None:
+        job = await self._claim(job_id)
+        if job is None:
+            return
+
+        # Jobs give way to interactive requests in the LLM rate scheduler
+        llm_priority.set(PRIORITY_BACKGROUND)
+        try:
+            result = await self._follow(job)
+        except Exception as e:
+            logger.warning(f"Job {job_id} failed: {e}", exc_info=True)
+            await self._update(
+                job_id, status=FAILED, error=str(e), message="Job failed"
+            )
+            return
+
+        await self._update(
+            job_id,
+            status=COMPLETED,
+            progress=100.0,
+            message="Job completed",
+            result=json.dumps(result),
+        )
+
+    async def _follow(self, job: Job) -> dict:
+        """Run a job, recording its progress, and return its result"""
+        runner = JOB_RUNNERS[job.kind]
+        result = None
+        written_at = 0.0
+        async for event in runner(job.content, json.loads(job.params)):
+            status = event.get("status")
+            if status == "completed":
+                result = event.get("result")
+                continue
+            if status == "error":
+                raise JobError(event.get("message") or "Job failed")
+
+            now = time.monotonic()
+            if now - written_at >= PROGRESS_INTERVAL:
+                written_at = now
+                await self._update(
+                    job.id,
+                    progress=event.get("progress"),
+                    message=event.get("message"),
+                )
+
+        if result is None:
+            raise JobError("Job ended without a result")
+        return result
+
+    async def _recover(self) -> list[str]:
+        """Queue again the jobs left queued or running, oldest first"""
+        async with AsyncSessionLocal() as db:
+            jobs = await db.scalars(
+                select(Job)
+                .where(Job.status.in_([QUEUED, RUNNING]))
+                .order_by(Job.created_at)
+            )
+            job_ids = []
+            for job in jobs:
+                # A job interrupted too many times is given up
+                if job.status == RUNNING and job.attempts >= settings.job_max_attempts:
+                    job.status = FAILED
+                    job.error = f"Interrupted {job.attempts} times, giving up"
+                    continue
+                job.status = QUEUED
+                job_ids.append(job.id)
+            await db.commit()
+        if job_ids:
+            logger.info(f"Resuming {len(job_ids)} interrupted jobs")
+        return job_ids
+
+    async def _insert(self, job: Job) -> Job:
+        async with AsyncSessionLocal() as db:
+            db.add(job)
+            await db.commit()
+            # Load the timestamps set by the database
+            await db.refresh(job)
+        return job
+
+    async def _get(self, job_id: str) -> Optional[Job]:
+        async with AsyncSessionLocal() as db:
+            return await db.get(Job, job_id)
+
+    async def _claim(self, job_id: str) -> Optional[Job]:
+        """Move a queued job to running in one conditional UPDATE"""
+        async with AsyncSessionLocal() as db:
+            claimed = await db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == QUEUED)
+                .values(status=RUNNING, attempts=Job.attempts + 1)
+            )
+            await db.commit()
+            if claimed.rowcount == 0:
+                return None
+            return await db.get(Job, job_id)
+
+    async def _update(self, job_id: str, **fields) -> None:
+        values = {name: value for name, value in fields.items() if value is not None}
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Job).where(Job.id == job_id).values(**values))
+            await db.commit()
+
+
+job_manager = JobManager()
+QUEUE_DEPTH.labels("jobs").set_function(job_manager.queued)
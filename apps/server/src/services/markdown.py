@@ -0,0 +1,395 @@
+import re
+from array import array
+from itertools import islice
+from typing import Iterable, Iterator, Optional, Union
+
+# Types de lignes produits par le tokenizer
+TEXT = 0
+BLANK = 1
+FRONTMATTER_DELIMITER = 2
+FRONTMATTER = 3
+FENCE = 4
+CODE = 5
+CONTAINER_OPEN = 6
+CONTAINER_CLOSE = 7
+HEADING = 8
+
+FENCE_PATTERN = re.compile(r"^\s*(`{3,}|~{3,})")
+HEADING_PATTERN = re.compile(r"^(#{1,6})[ \t]+(.*?)(?:[ \t]+#+)?[ \t]*$")
+TOC_PATTERN = re.compile(r"\[\[toc\]\]", re.IGNORECASE)
+FENCE_PREFIXES = ("```", "~~~")
+HEADING_SEPARATORS = (" ", "\t")
+# Espaces au sens de \s, sauf "\n", énumérés : une classe littérale évite un
+# test de catégorie Unicode par caractère dans les recherches fréquentes
+SPACES = r" \t\r\f\v\x1c-\x1f\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000"
+# Premiers caractères ASCII qui peuvent donner à une ligne un autre type que
+# texte : titre, bloc de code, container. Les autres caractères ASCII
+# imprimables ne laissent que le texte, un espace peut précéder tout le reste.
+MARKUP_START_CHARS = "#`~:"
+TEXT_START_CHARS = frozenset(map(chr, range(0x21, 0x7F))) - set(MARKUP_START_CHARS)
+
+
+class MarkdownTokenizer:
+    """
+    Tokenizer ligne à ligne : chaque ligne est classée en une seule passe
+    selon le contexte (frontmatter, bloc de code, container, titre...).
+    """
+
+    __slots__ = ("line_number", "in_frontmatter", "fence", "allow_frontmatter")
+
+    def __init__(self, allow_frontmatter: bool = True):
+        self.line_number = 0
+        self.in_frontmatter = False
+        self.fence: Optional[str] = None
+        self.allow_frontmatter = allow_frontmatter
+
+    def classify(self, line: str) -> int:
+        line_number = self.line_number
+        self.line_number += 1
+        stripped = line.strip()
+
+        if self.in_frontmatter:
+            if stripped == "---":
+                self.in_frontmatter = False
+                return FRONTMATTER_DELIMITER
+            return FRONTMATTER
+
+        if line_number == 0 and self.allow_frontmatter and stripped == "---":
+            self.in_frontmatter = True
+            return FRONTMATTER_DELIMITER
+
+        if self.fence is not None:
+            match = FENCE_PATTERN.match(line)
+            if match and match.group(1).startswith(self.fence):
+                self.fence = None
+                return FENCE
+            return CODE
+
+        match = FENCE_PATTERN.match(line)
+        if match:
+            self.fence = match.group(1)
+            return FENCE
+
+        if stripped.startswith(":::"):
+            # Une suite de ":" seule ferme un container, "::::" compris
+            return CONTAINER_OPEN if stripped.strip(":") else CONTAINER_CLOSE
+
+        if not stripped:
+            return BLANK
+
+        if HEADING_PATTERN.match(line):
+            return HEADING
+
+        return TEXT
+
+
+class ParsedDocument:
+    """
+    Document markdown analysé : lignes et type de chaque ligne. Les lignes
+    et le texte se déduisent l'un de l'autre à la première lecture, et les
+    index (titres, frontmatter, table des matières, mots) sont calculés à
+    la première lecture seulement, à partir des types.
+    """
+
+    __slots__ = (
+        "_lines",
+        "_kinds",
+        "_text",
+        "_headings",
+        "_frontmatter_end",
+        "_has_toc",
+        "_word_count",
+    )
+
+    def __init__(
+        self,
+        lines: Optional[list[str]] = None,
+        kinds: Optional[array] = None,
+        text: Optional[str] = None,
+    ):
+        if lines is None and text is None:
+            lines = []
+        self._lines = lines
+        self._kinds = kinds
+        self._text = text
+        self._headings: Optional[list[int]] = None
+        self._frontmatter_end: Optional[int] = None
+        self._has_toc: Optional[bool] = None
+        self._word_count: Optional[int] = None
+
+    def __len__(self) -> int:
+        if self._kinds is not None:
+            return len(self._kinds)
+        return len(self.lines)
+
+    def items(self) -> Iterator[tuple[int, str]]:
+        return zip(self.kinds, self.lines, strict=True)
+
+    def indices(self, kind: int) -> list[int]:
+        """Index des lignes d'un type, recherchés dans les types en octets"""
+        raw = self.kinds.tobytes()
+        marker = bytes((kind,))
+        found = []
+        index = raw.find(marker)
+        while index != -1:
+            found.append(index)
+            index = raw.find(marker, index + 1)
+        return found
+
+    @property
+    def kinds(self) -> array:
+        if self._kinds is None:
+            self._kinds = _classify(self.lines)
+        return self._kinds
+
+    @property
+    def lines(self) -> list[str]:
+        if self._lines is None:
+            self._lines = self._text.split("\n")
+        return self._lines
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = "\n".join(self._lines)
+        return self._text
+
+    @property
+    def headings(self) -> list[int]:
+        if self._headings is None:
+            self._headings = self.indices(HEADING)
+        return self._headings
+
+    @property
+    def frontmatter_end(self) -> int:
+        if self._frontmatter_end is None:
+            if self._kinds is not None:
+                self._frontmatter_end = self._kinds.tobytes().find(
+                    bytes((FRONTMATTER_DELIMITER,)), 1
+                )
+            else:
+                # Seules les premières lignes sont lues, sans typer le document
+                self._frontmatter_end = _frontmatter_end(self._iter_lines())
+        return self._frontmatter_end
+
+    @property
+    def has_toc(self) -> bool:
+        if self._has_toc is None:
+            self._has_toc = False
+            text = self.text
+            index = position = 0
+            for match in TOC_PATTERN.finditer(text):
+                index += text.count("\n", position, match.start())
+                position = match.start()
+                if self.kinds[index] != CODE:
+                    self._has_toc = True
+                    break
+        return self._has_toc
+
+    @property
+    def word_count(self) -> int:
+        if self._word_count is None:
+            # Mots comptés ligne à ligne ("\n" les sépare déjà), sans la liste
+            # de tous les mots du document
+            self._word_count = sum(len(line.split()) for line in self._iter_lines())
+        return self._word_count
+
+    @property
+    def has_frontmatter(self) -> bool:
+        return self.frontmatter_end > 0
+
+    @property
+    def metadata(self) -> dict:
+        if not self.has_frontmatter:
+            return {}
+        return _parse_metadata(islice(self._iter_lines(), 1, self.frontmatter_end))
+
+    def _iter_lines(self) -> Iterator[str]:
+        """Lignes dans l'ordre, sans découper tout le texte s'il n'est pas découpé"""
+        if self._lines is not None:
+            return iter(self._lines)
+        return _iter_lines(self._text)
+
+    @property
+    def sections(self) -> list[str]:
+        sections = []
+        for index in self.headings:
+            title = heading_title(self.lines[index])
+            if title:
+                sections.append(title)
+        return sections
+
+    @property
+    def body_start(self) -> int:
+        return self.frontmatter_end + 1 if self.has_frontmatter else 0
+
+    def section_ranges(self) -> list[tuple[int, int]]:
+        """
+        Découpe le corps du document (hors frontmatter) en sections délimitées
+        par les titres : [start, stop) pour le préambule puis chaque titre.
+        """
+        start = self.body_start
+        ranges = []
+        for index in self.headings:
+            if index > start:
+                ranges.append((start, index))
+                start = index
+        if start < len(self):
+            ranges.append((start, len(self)))
+        return ranges
+
+    def slice(self, start: int, stop: int) -> "ParsedDocument":
+        """Extrait les lignes [start, stop) sans les re-tokenizer"""
+        return ParsedDocument(self.lines[start:stop], self.kinds[start:stop])
+
+    def heading_level(self, index: int) -> int:
+        match = HEADING_PATTERN.match(self.lines[index])
+        return len(match.group(1)) if match else 0
+
+
+class DocumentOutline:
+    """
+    Informations globales d'un document obtenues en le parcourant sans
+    conserver ses lignes, pour les traitements à mémoire bornée.
+    """
+
+    __slots__ = ("line_count", "frontmatter_end", "metadata", "has_toc", "unclosed")
+
+    def __init__(self):
+        self.line_count = 0
+        self.frontmatter_end = -1
+        self.metadata: dict = {}
+        self.has_toc = False
+        self.unclosed = False
+
+    @property
+    def has_frontmatter(self) -> bool:
+        return self.frontmatter_end > 0
+
+
+def scan_markdown(
+    lines: Iterable[str], allow_frontmatter: bool = True
+) -> DocumentOutline:
+    """
+    Parcourt un document ligne à ligne sans le garder en mémoire.
+    `unclosed` signale un frontmatter jamais refermé : il faut alors
+    reparcourir le document avec allow_frontmatter=False.
+    """
+    tokenizer = MarkdownTokenizer(allow_frontmatter=allow_frontmatter)
+    outline = DocumentOutline()
+    for index, line in enumerate(lines):
+        kind = tokenizer.classify(line)
+        if kind == FRONTMATTER:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                outline.metadata[key.strip()] = value.strip()
+        elif kind == FRONTMATTER_DELIMITER and index > 0:
+            outline.frontmatter_end = index
+        # Même règle que ParsedDocument.has_toc : hors blocs de code, le
+        # frontmatter compris
+        if kind != CODE and not outline.has_toc and TOC_PATTERN.search(line):
+            outline.has_toc = True
+        outline.line_count = index + 1
+
+    outline.unclosed = tokenizer.in_frontmatter
+    return outline
+
+
+def heading_title(line: str) -> str:
+    match = HEADING_PATTERN.match(line)
+    return match.group(2) if match else ""
+
+
+def _parse_metadata(lines: Iterable[str]) -> dict:
+    metadata = {}
+    for line in lines:
+        if ":" in line:
+            key, value = line.split(":", 1)
+            metadata[key.strip()] = value.strip()
+    return metadata
+
+
+def _iter_lines(text: str) -> Iterator[str]:
+    """Lignes de `text` comme text.split("\\n"), au fil de la lecture"""
+    start = 0
+    while (end := text.find("\n", start)) != -1:
+        yield text[start:end]
+        start = end + 1
+    yield text[start:]
+
+
+def _frontmatter_end(lines: Iterable[str]) -> int:
+    """
+    Index de la ligne qui ferme le frontmatter, ou -1 sans frontmatter refermé,
+    en ne lisant que les lignes du frontmatter.
+    """
+    tokenizer = MarkdownTokenizer()
+    for index, line in enumerate(lines):
+        tokenizer.classify(line)
+        if not tokenizer.in_frontmatter:
+            return index if index > 0 else -1
+    return -1
+
+
+def _fill(kind: int, count: int) -> array:
+    return array("B", bytes((kind,)) * count)
+
+
+def _classify(lines: list[str]) -> array:
+    """
+    Types des lignes, identiques à ceux de MarkdownTokenizer (un frontmatter
+    jamais refermé n'en est pas un). Une ligne qui commence par un caractère
+    de TEXT_START_CHARS reste du texte sans être examinée, et les blocs de
+    code sont remplis d'un coup à leur fermeture.
+    """
+    kinds = _fill(TEXT, len(lines))
+    end = _frontmatter_end(lines) if lines and lines[0].strip() == "---" else -1
+    if end > 0:
+        kinds[0] = kinds[end] = FRONTMATTER_DELIMITER
+        kinds[1:end] = _fill(FRONTMATTER, end - 1)
+        body = enumerate(islice(lines, end + 1, None), end + 1)
+    else:
+        body = enumerate(lines)
+
+    for index, line in body:
+        if line[:1] in TEXT_START_CHARS:
+            continue
+        if not line:
+            kinds[index] = BLANK
+            continue
+        stripped = line.lstrip()
+        if not stripped:
+            kinds[index] = BLANK
+        elif stripped.startswith(FENCE_PREFIXES):
+            fence = FENCE_PATTERN.match(stripped).group(1)
+            kinds[index] = FENCE
+            # Dans le bloc, seule une ligne contenant le marqueur peut le fermer
+            marker = fence[0]
+            for close, line in body:
+                if marker in line and line.lstrip().startswith(fence):
+                    kinds[index + 1 : close] = _fill(CODE, close - index - 1)
+                    kinds[close] = FENCE
+                    break
+            else:
+                kinds[index + 1 :] = _fill(CODE, len(lines) - index - 1)
+        elif stripped.startswith(":::"):
+            closing = not stripped.rstrip().strip(":")
+            kinds[index] = CONTAINER_CLOSE if closing else CONTAINER_OPEN
+        elif line[0] == "#":
+            # Ce que HEADING_PATTERN accepte : 1 à 6 "#" puis un espace
+            level = len(line) - len(line.lstrip("#"))
+            if level <= 6 and line[level : level + 1] in HEADING_SEPARATORS:
+                kinds[index] = HEADING
+
+    return kinds
+
+
+def parse_markdown(content: Union[str, Iterable[str]]) -> ParsedDocument:
+    """
+    Analyse un document markdown (texte ou itérable de lignes). Les lignes
+    sont typées en une passe à la première lecture des types : le frontmatter
+    seul se lit sans parcourir le reste du document.
+    """
+    if isinstance(content, str):
+        return ParsedDocument(text=content)
+    return ParsedDocument(lines=list(content))
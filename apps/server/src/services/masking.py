@@ -0,0 +1,161 @@
+import re
+from collections import Counter
+from typing import Iterable
+
+from src.services.markdown import (
+    CODE,
+    CONTAINER_CLOSE,
+    CONTAINER_OPEN,
+    FENCE,
+    FRONTMATTER,
+    parse_markdown,
+)
+
+PLACEHOLDER = "@@{}@@"
+PLACEHOLDER_PATTERN = re.compile(r"@@(\d+)@@")
+# End of a text that may be the beginning of a placeholder cut by streaming
+PARTIAL_PLACEHOLDER_PATTERN = re.compile(r"@(?:@\d*@?)?$")
+
+FRONTMATTER_KEY_PATTERN = re.compile(r"^\s*[\w.-]+:")
+CONTAINER_MARKER_PATTERN = re.compile(r"^\s*:::+\s*\w*")
+INLINE_PATTERN = re.compile(
+    "|".join(
+        (
+            # Placeholders already present in the document are masked as well
+            r"@@\d+@@",
+            # Inline code, whatever the length of the backtick run
+            r"(`+)[^`].*?\1(?!`)",
+            r"<!--.*?-->",
+            # HTML tags and autolinks
+            r"</?[A-Za-z][^<>]*>",
+            # Link and image targets: only the URL, the text stays translatable
+            r"(?<=\]\()[^)\s]+",
+            r"https?://[^\s<>()\[\]`]+",
+            # VitePress interpolations, table of contents and heading anchors
+            r"\{\{.*?\}\}",
+            r"\[\[toc\]\]",
+            r"\{#[\w-]+\}",
+        )
+    ),
+    re.IGNORECASE,
+)
+
+
+class MaskingError(ValueError):
+    """Raised when the model output does not contain every placeholder exactly once"""
+
+
+class MaskedText:
+    """
+    Markdown whose non-translatable spans (code, URLs, HTML, frontmatter keys,
+    container markers) are replaced with compact placeholders.
+    """
+
+    def __init__(self, text: str, spans: list[str]):
+        self.text = text
+        self.spans = spans
+
+    def restore(self, text: str, seen: list[int]) -> str:
+        """Put the spans back, recording which placeholders were found"""
+
+        def replace(match: re.Match) -> str:
+            index = int(match.group(1))
+            seen.append(index)
+            if index < len(self.spans):
+                return self.spans[index]
+            return match.group(0)
+
+        return PLACEHOLDER_PATTERN.sub(replace, text)
+
+    def verify(self, seen: Iterable[int]) -> None:
+        counts = Counter(seen)
+        missing = [index for index in range(len(self.spans)) if not counts[index]]
+        duplicated = [index for index, count in counts.items() if count > 1]
+        unknown = [index for index in counts if index >= len(self.spans)]
+        if missing or duplicated or unknown:
+            raise MaskingError(
+                f"Placeholders not restored exactly: missing={missing}, "
+                f"duplicated={duplicated}, unknown={unknown}"
+            )
+
+    def unmask(self, text: str) -> str:
+        seen: list[int] = []
+        restored = self.restore(text, seen)
+        self.verify(seen)
+        return restored
+
+
+class StreamingUnmasker:
+    """
+    Restores the spans of a streamed output. A delta ending with what may be
+    the beginning of a placeholder is held back until the next one.
+    """
+
+    def __init__(self, masked: MaskedText):
+        self.masked = masked
+        self.pending = ""
+        self.seen: list[int] = []
+
+    def feed(self, delta: str) -> str:
+        text = self.pending + delta
+        # Only what follows the last complete placeholder may be a partial one
+        complete_end = 0
+        for complete in PLACEHOLDER_PATTERN.finditer(text):
+            complete_end = complete.end()
+        match = PARTIAL_PLACEHOLDER_PATTERN.search(text, complete_end)
+        cut = match.start() if match else len(text)
+        self.pending = text[cut:]
+        return self.masked.restore(text[:cut], self.seen)
+
+    def finish(self) -> str:
+        """Return the text held back and check every placeholder came back"""
+        text = self.masked.restore(self.pending, self.seen)
+        self.pending = ""
+        self.masked.verify(self.seen)
+        return text
+
+
+def mask_markdown(content: str) -> MaskedText:
+    """Replace the spans the model must not rewrite with placeholders"""
+    spans: list[str] = []
+
+    def placeholder(span: str) -> str:
+        spans.append(span)
+        return PLACEHOLDER.format(len(spans) - 1)
+
+    def mask_inline(line: str) -> str:
+        return INLINE_PATTERN.sub(lambda match: placeholder(match.group(0)), line)
+
+    lines: list[str] = []
+    fenced: list[str] = []
+
+    for kind, line in parse_markdown(content).items():
+        # A fenced code block becomes a single placeholder
+        if kind == CODE or (kind == FENCE and fenced):
+            fenced.append(line)
+            if kind == FENCE:
+                lines.append(placeholder("\n".join(fenced)))
+                fenced = []
+            continue
+        if kind == FENCE:
+            fenced.append(line)
+            continue
+
+        if kind == FRONTMATTER:
+            match = FRONTMATTER_KEY_PATTERN.match(line)
+            if match:
+                line = placeholder(match.group(0)) + mask_inline(line[match.end() :])
+            lines.append(line)
+        elif kind == CONTAINER_CLOSE:
+            lines.append(placeholder(line))
+        elif kind == CONTAINER_OPEN:
+            match = CONTAINER_MARKER_PATTERN.match(line)
+            lines.append(placeholder(match.group(0)) + mask_inline(line[match.end() :]))
+        else:
+            lines.append(mask_inline(line))
+
+    # Fence never closed: keep its lines as a block as well
+    if fenced:
+        lines.append(placeholder("\n".join(fenced)))
+
+    return MaskedText("\n".join(lines), spans)
@@ -1,22 +1,206 @@
-from openai import AsyncOpenAI
-from typing import List, Dict
+from collections import deque
+from dataclasses import asdict
+from typing import AsyncIterator, List, Dict, Optional
+import httpx
+from openai import APIConnectionError, APIStatusError, OpenAIError
 from src.core.config import settings
+from src.core.metrics import LLMCallTimer, record_tokens
+from src.core.tracing import span
+from src.services.registry import llm_registry
+from src.services.resilience import (
+    AttemptTiming,
+    LatencyTracker,
+    ResiliencePolicy,
+    Target,
+)
+from src.services.tokens import count_tokens
 
+import asyncio
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 
+class ChatCompletionError(Exception):
+    """Raised when every attempt of a chat completion failed"""
+
+    def __init__(self, message: str, attempts: Optional[list[AttemptTiming]] = None):
+        super().__init__(message)
+        self.attempts = attempts or []
+
+
+class ServiceUnavailableError(ChatCompletionError):
+    """Raised without any network call while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive upstream failures.
+    Once `reset_timeout` seconds have passed, a single trial request is let
+    through (half-open): its success closes the breaker, its failure reopens it.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def release(self) -> None:
+        """Abandoned request (cancelled by the caller): neither success nor failure"""
+        self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class ServiceState:
+    """Health and circuit breaker state shared by every service on one base URL"""
+
+    def __init__(self):
+        self.breaker = CircuitBreaker(
+            settings.openai_breaker_threshold, settings.openai_breaker_reset_timeout
+        )
+        self.health: Optional[Dict[str, any]] = None
+        self.checked_at = 0.0
+        self.lock = asyncio.Lock()
+
+    def cached_health(self) -> Optional[Dict[str, any]]:
+        if self.health is None:
+            return None
+        if time.monotonic() - self.checked_at >= settings.openai_health_ttl:
+            return None
+        return self.health
+
+
+_service_states: Dict[Optional[str], ServiceState] = {}
+_latency_trackers: Dict[Target, LatencyTracker] = {}
+_recent_attempts: deque[AttemptTiming] = deque(maxlen=100)
+
+
+def _service_state(base_url: Optional[str]) -> ServiceState:
+    if base_url not in _service_states:
+        _service_states[base_url] = ServiceState()
+    return _service_states[base_url]
+
+
+def _latency_tracker(target: Target) -> LatencyTracker:
+    if target not in _latency_trackers:
+        _latency_trackers[target] = LatencyTracker()
+    return _latency_trackers[target]
+
+
+def _is_upstream_failure(error: Exception) -> bool:
+    """Connection errors, timeouts, rate limits and 5xx responses trip the breaker"""
+    # A stream cut or timed out mid-response raises the httpx error itself
+    if isinstance(error, (APIConnectionError, httpx.TransportError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def _prompt_tokens(messages: List[Dict[str, str]], model: str) -> int:
+    return sum(
+        count_tokens(message.get("content") or "", model) for message in messages
+    )
+
+
+def _record_usage(model: str, messages: List[Dict[str, str]], response) -> None:
+    """Token counters from the reported usage, estimated when there is none"""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        record_tokens(model, usage.prompt_tokens or 0, usage.completion_tokens or 0)
+        return
+    content = ""
+    if response.choices:
+        content = response.choices[0].message.content or ""
+    record_tokens(model, _prompt_tokens(messages, model), count_tokens(content, model))
+
+
 class OpenAIService:
     def __init__(self):
         self.config = settings
         self.api_key = self.config.openai_api_key
         self.base_url = self.config.openai_base_url
         self.model = self.config.openai_model
+        self.policy = ResiliencePolicy.from_settings()
+
+    @property
+    def client(self):
+        return llm_registry.openai_client(self.api_key, self.base_url)
 
-        self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+    @property
+    def state(self) -> ServiceState:
+        return _service_state(self.base_url)
 
-    async def health_check(self) -> Dict[str, any]:
+    @property
+    def fallback_targets(self) -> list[Target]:
+        return self.policy.targets(self.model, self.base_url)[1:]
+
+    async def health_check(self, force: bool = False) -> Dict[str, any]:
+        """
+        Return the service health, cached for `openai_health_ttl` seconds.
+        While the circuit breaker is open the service is reported unhealthy
+        without any network call.
+        """
+        with span("health_check"):
+            return await self._cached_health(force)
+
+    async def _cached_health(self, force: bool) -> Dict[str, any]:
+        state = self.state
+        circuit = state.breaker.state
+        if circuit == "open":
+            return {
+                "status": "unhealthy",
+                "error": "Circuit breaker open after repeated upstream failures",
+                "circuit": circuit,
+                "base_url": self.base_url,
+            }
+
+        if not force and (health := state.cached_health()) is not None:
+            return {**health, "circuit": circuit}
+
+        async with state.lock:
+            if not force and (health := state.cached_health()) is not None:
+                return {**health, "circuit": circuit}
+
+            state.health = await self._check_health()
+            state.checked_at = time.monotonic()
+            return {**state.health, "circuit": circuit}
+
+    async def is_available(self) -> bool:
+        health = await self.health_check()
+        return health["status"] == "healthy"
+
+    async def _check_health(self) -> Dict[str, any]:
         try:
             response = await self.client.models.list()
 
@@ -74,15 +258,224 @@ class OpenAIService:
         self, messages: List[Dict[str, str]], **kwargs
     ) -> Dict[str, any]:
         """
-        Create a chat completion using OpenAI API
+        Create a chat completion using OpenAI API, following the resilience
+        policy: retries with backoff, hedged duplicates of slow attempts, then
+        the fallback targets in order. The timing of every attempt is
+        returned under "attempts".
         """
+        started = time.monotonic()
+        attempts: list[AttemptTiming] = []
+        last_error: Optional[Exception] = None
+
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model, messages=messages, **kwargs
+            for target in self.policy.targets(self.model, self.base_url):
+                breaker = _service_state(target.base_url).breaker
+                for retry in range(self.policy.max_retries + 1):
+                    if retry:
+                        await asyncio.sleep(self.policy.backoff(retry - 1))
+                    if not breaker.allow_request():
+                        attempts.append(
+                            AttemptTiming(
+                                target,
+                                retry,
+                                time.monotonic() - started,
+                                0.0,
+                                "circuit_open",
+                            )
+                        )
+                        break
+
+                    try:
+                        response = await self._hedged_attempt(
+                            target, retry, started, attempts, messages, kwargs
+                        )
+                    except OpenAIError as e:
+                        last_error = e
+                        # Client errors are not retried, the next target may accept them
+                        if not _is_upstream_failure(e):
+                            break
+                        continue
+
+                    result = response.model_dump()
+                    result["attempts"] = [timing.to_dict() for timing in attempts]
+                    return result
+        finally:
+            _recent_attempts.extend(attempts)
+
+        if last_error is None:
+            raise ServiceUnavailableError(
+                "Chat completion skipped: circuit breaker open", attempts
             )
-            return response.model_dump()
-        except Exception as e:
-            raise Exception(f"Chat completion failed: {str(e)}")
+        raise ChatCompletionError(
+            f"Chat completion failed: {str(last_error)}", attempts
+        )
+
+    async def _hedged_attempt(
+        self,
+        target: Target,
+        retry: int,
+        started: float,
+        attempts: list[AttemptTiming],
+        messages: List[Dict[str, str]],
+        kwargs: dict,
+    ):
+        """
+        One attempt on a target. Once enough latencies are known, a duplicate
+        request is sent if the attempt is still pending after the configured
+        percentile: the first successful response wins.
+        """
+        breaker = _service_state(target.base_url).breaker
+        client = llm_registry.openai_client(
+            self.api_key, target.base_url, max_retries=0
+        )
+        tracker = _latency_tracker(target)
+
+        hedge_delay = None
+        if (
+            self.policy.hedge_percentile is not None
+            and len(tracker.durations) >= self.policy.hedge_min_samples
+        ):
+            hedge_delay = tracker.percentile(self.policy.hedge_percentile)
+
+        async def send(hedge: bool):
+            sent_at = time.monotonic()
+            timing = AttemptTiming(
+                target, retry, sent_at - started, 0.0, "pending", hedge
+            )
+            attempts.append(timing)
+            call = LLMCallTimer(target.model)
+            try:
+                response = await client.chat.completions.create(
+                    model=target.model, messages=messages, **kwargs
+                )
+            except asyncio.CancelledError:
+                timing.outcome = "cancelled"
+                raise
+            except Exception as e:
+                timing.outcome = "error"
+                timing.error = str(e)
+                raise
+            else:
+                timing.outcome = "success"
+            finally:
+                timing.duration = time.monotonic() - sent_at
+                call.finish(timing.outcome)
+            tracker.record(timing.duration)
+            _record_usage(target.model, messages, response)
+            return response
+
+        tasks = [asyncio.create_task(send(hedge=False))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if not done:
+                tasks.append(asyncio.create_task(send(hedge=True)))
+
+            error = None
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    response = await next_done
+                except OpenAIError as e:
+                    error = e
+                    continue
+                breaker.record_success()
+                return response
+        except BaseException:
+            # Cancelled, or failed outside the API client: free a half-open trial
+            breaker.release()
+            raise
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        # Every attempt failed with an API error
+        if _is_upstream_failure(error):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise error
+
+    async def chat_completion_stream(
+        self, messages: List[Dict[str, str]], **kwargs
+    ) -> AsyncIterator[str]:
+        """
+        Create a streamed chat completion and yield the content deltas
+        as the model generates them. Retries and fallback targets apply
+        until the first delta is received, not after.
+        """
+        last_error: Optional[Exception] = None
+        for target in self.policy.targets(self.model, self.base_url):
+            breaker = _service_state(target.base_url).breaker
+            client = llm_registry.openai_client(
+                self.api_key, target.base_url, max_retries=0
+            )
+            for retry in range(self.policy.max_retries + 1):
+                if retry:
+                    await asyncio.sleep(self.policy.backoff(retry - 1))
+                if not breaker.allow_request():
+                    break
+
+                received = False
+                call = LLMCallTimer(target.model)
+                output: list[str] = []
+                try:
+                    stream = await client.chat.completions.create(
+                        model=target.model, messages=messages, stream=True, **kwargs
+                    )
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            received = True
+                            call.token()
+                            output.append(chunk.choices[0].delta.content)
+                            yield chunk.choices[0].delta.content
+                except (GeneratorExit, asyncio.CancelledError):
+                    call.finish("cancelled")
+                    breaker.release()
+                    raise
+                except (OpenAIError, httpx.HTTPError) as e:
+                    call.finish("error")
+                    if _is_upstream_failure(e):
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                    if received:
+                        raise ChatCompletionError(
+                            f"Chat completion failed: {str(e)}"
+                        ) from e
+                    last_error = e
+                    if not _is_upstream_failure(e):
+                        break
+                    continue
+                except Exception:
+                    # Not an answer from the service: say nothing of its health
+                    call.finish("error")
+                    breaker.release()
+                    raise
+
+                call.finish("success")
+                record_tokens(
+                    target.model,
+                    _prompt_tokens(messages, target.model),
+                    count_tokens("".join(output), target.model),
+                )
+                breaker.record_success()
+                return
+
+        if last_error is None:
+            raise ServiceUnavailableError(
+                "Chat completion skipped: circuit breaker open"
+            )
+        raise ChatCompletionError(f"Chat completion failed: {str(last_error)}")
+
+    def resilience_stats(self) -> Dict[str, any]:
+        """Policy, latency percentiles per target and the latest attempts"""
+        return {
+            "policy": asdict(self.policy),
+            "targets": {
+                f"{target.model}@{target.base_url}": _latency_tracker(target).summary()
+                for target in self.policy.targets(self.model, self.base_url)
+            },
+            "recent_attempts": [timing.to_dict() for timing in _recent_attempts],
+        }
 
     async def text_completion(self, prompt: str, **kwargs) -> Dict[str, any]:
         """
@@ -0,0 +1,96 @@
+from typing import Optional
+
+import httpx
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
+from openai import AsyncOpenAI
+
+from src.core.config import settings
+from src.services.scheduler import llm_scheduler
+
+
+class LLMRegistry:
+    """
+    Process-wide registry of LLM clients and compiled prompt chains.
+    Every client shares one async HTTP connection pool, created during
+    the application lifespan and closed on shutdown.
+    """
+
+    def __init__(self):
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._chat_models: dict[tuple[str, float], ChatOpenAI] = {}
+        self._chains: dict[tuple[str, str, float], Runnable] = {}
+        self._openai_clients: dict[
+            tuple[str, Optional[str], Optional[int]], AsyncOpenAI
+        ] = {}
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        return self._ensure_client()
+
+    def start(self) -> None:
+        self._ensure_client()
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        """Create the shared HTTP client, or a new one once it was closed"""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(600.0, connect=10.0),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                # Every LLM call waits for its turn in the rate scheduler
+                event_hooks={
+                    "request": [llm_scheduler.before_request],
+                    "response": [llm_scheduler.after_response],
+                },
+            )
+        return self._http_client
+
+    def chat_model(self, model: str, temperature: float) -> ChatOpenAI:
+        key = (model, temperature)
+        if key not in self._chat_models:
+            self._chat_models[key] = ChatOpenAI(
+                temperature=temperature,
+                model_name=model,
+                openai_api_key=settings.openai_api_key,
+                openai_api_base=settings.openai_base_url,
+                http_async_client=self.http_client,
+            )
+        return self._chat_models[key]
+
+    def chain(
+        self, name: str, prompt: ChatPromptTemplate, model: str, temperature: float
+    ) -> Runnable:
+        key = (name, model, temperature)
+        if key not in self._chains:
+            self._chains[key] = prompt | self.chat_model(model, temperature)
+        return self._chains[key]
+
+    def openai_client(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        max_retries: Optional[int] = None,
+    ) -> AsyncOpenAI:
+        """`max_retries=0` leaves retries to the caller's resilience policy"""
+        key = (api_key, base_url, max_retries)
+        if key not in self._openai_clients:
+            options = {} if max_retries is None else {"max_retries": max_retries}
+            self._openai_clients[key] = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=self.http_client,
+                **options,
+            )
+        return self._openai_clients[key]
+
+    async def aclose(self) -> None:
+        self._chains.clear()
+        self._chat_models.clear()
+        self._openai_clients.clear()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+
+llm_registry = LLMRegistry()
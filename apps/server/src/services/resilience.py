@@ -0,0 +1,91 @@
+import random
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+from src.core.config import settings
+
+
+@dataclass(frozen=True)
+class Target:
+    """Model and base URL a chat completion can be sent to"""
+
+    model: str
+    base_url: Optional[str]
+
+
+@dataclass
+class AttemptTiming:
+    target: Target
+    attempt: int
+    started: float
+    duration: float
+    outcome: str
+    hedge: bool = False
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class ResiliencePolicy:
+    """
+    Retries with exponential backoff and full jitter, hedged duplicates of
+    slow attempts, and an ordered list of fallback models and base URLs.
+    """
+
+    max_retries: int = 2
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    hedge_percentile: Optional[float] = 0.95
+    hedge_min_samples: int = 20
+    fallback_models: list[str] = field(default_factory=list)
+    fallback_base_urls: list[str] = field(default_factory=list)
+
+    @classmethod
+    def from_settings(cls) -> "ResiliencePolicy":
+        return cls(
+            max_retries=settings.openai_max_retries,
+            backoff_base=settings.openai_backoff_base,
+            backoff_max=settings.openai_backoff_max,
+            hedge_percentile=settings.openai_hedge_percentile,
+            hedge_min_samples=settings.openai_hedge_min_samples,
+            fallback_models=list(settings.openai_fallback_models),
+            fallback_base_urls=list(settings.openai_fallback_base_urls),
+        )
+
+    def targets(self, model: str, base_url: Optional[str]) -> list[Target]:
+        """Primary target, then each fallback model, then each fallback base URL"""
+        targets = [Target(model, base_url)]
+        targets += [Target(fallback, base_url) for fallback in self.fallback_models]
+        targets += [Target(model, fallback) for fallback in self.fallback_base_urls]
+        return list(dict.fromkeys(targets))
+
+    def backoff(self, retry: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**retry))
+
+
+class LatencyTracker:
+    """Rolling window of successful attempt durations for one target"""
+
+    def __init__(self, window: int = 200):
+        self.durations: deque[float] = deque(maxlen=window)
+
+    def record(self, duration: float) -> None:
+        self.durations.append(duration)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        if not self.durations:
+            return None
+        ordered = sorted(self.durations)
+        index = min(len(ordered) - 1, int(percentile * len(ordered)))
+        return ordered[index]
+
+    def summary(self) -> dict:
+        return {
+            "samples": len(self.durations),
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+        }
@@ -0,0 +1,169 @@
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.core.cache import LRUCache
+from src.core.config import settings
+from src.core.metrics import record_cache_lookup
+from src.core.tracing import span
+from src.core.database import (
+    AsyncSessionLocal,
+    PruneSchedule,
+    bulk_upsert,
+    prune_rows,
+)
+from src.models.format_result import FormatResultEntry
+from src.services.markdown import ParsedDocument
+from src.services.vitepress import ENHANCE_PROMPT_VERSION
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FormatResult:
+    key: str
+    etag: str
+    content: str
+    document: Optional[ParsedDocument] = None
+
+
+def result_key(content: str, clean: bool, enhance: bool) -> str:
+    content_digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return result_key_from_digest(content_digest, clean, enhance)
+
+
+def result_key_from_digest(content_digest: str, clean: bool, enhance: bool) -> str:
+    """Cache key from the sha256 of the content, computed while it was received"""
+    digest = hashlib.sha256()
+    for part in (
+        f"clean={clean}",
+        f"enhance={enhance}",
+        (settings.openai_model or "") if enhance else "",
+        ENHANCE_PROMPT_VERSION if enhance else "",
+        content_digest,
+    ):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def make_etag(key: str, content: str) -> str:
+    """Strong ETag of a result: it changes whenever the produced content changes"""
+    digest = hashlib.sha256(key.encode("utf-8"))
+    digest.update(content.encode("utf-8"))
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def make_key_etag(key: str) -> str:
+    """ETag of a result that depends on its key alone, known before it is produced"""
+    digest = hashlib.sha256(key.encode("utf-8"))
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (candidate.strip() for candidate in if_none_match.split(","))
+    return etag in candidates
+
+
+class ResultCache:
+    """
+    Two-tier cache of formatted documents: an in-process LRU bounded by size
+    in front of a persistent table in the application database, pruned by
+    age and row count as results are stored.
+    """
+
+    def __init__(self):
+        self.memory = LRUCache(
+            settings.result_cache_entries, settings.result_cache_max_bytes
+        )
+        self.prune_schedule = PruneSchedule()
+
+    async def get(self, key: str) -> Optional[FormatResult]:
+        with span("cache"):
+            return await self._get(key)
+
+    async def _get(self, key: str) -> Optional[FormatResult]:
+        result = self.memory.get(key)
+        record_cache_lookup("format_result_memory", result is not None, result is None)
+        if result is not None:
+            return result
+
+        if not settings.result_cache_persistent:
+            return None
+
+        entry = await self._load(key)
+        record_cache_lookup("format_result_db", entry is not None, entry is None)
+        if entry is None:
+            return None
+
+        result = FormatResult(key=key, etag=entry.etag, content=entry.content)
+        self.memory.set(key, result, len(result.content))
+        return result
+
+    async def set(self, result: FormatResult) -> None:
+        self.memory.set(
+            result.key,
+            FormatResult(key=result.key, etag=result.etag, content=result.content),
+            len(result.content),
+        )
+        if settings.result_cache_persistent:
+            await self._save(result)
+
+    async def _load(self, key: str) -> Optional[FormatResultEntry]:
+        async with AsyncSessionLocal() as db:
+            try:
+                return await db.get(FormatResultEntry, key)
+            except SQLAlchemyError as e:
+                # The cache is only a shortcut: the document is formatted again
+                logger.warning(f"Failed to load format result: {e}")
+                return None
+
+    async def _save(self, result: FormatResult) -> None:
+        async with AsyncSessionLocal() as db:
+            try:
+                await bulk_upsert(
+                    db,
+                    FormatResultEntry,
+                    [
+                        {
+                            "key": result.key,
+                            "etag": result.etag,
+                            "content": result.content,
+                        }
+                    ],
+                )
+                await db.commit()
+            except SQLAlchemyError as e:
+                await db.rollback()
+                logger.warning(f"Failed to store format result: {e}")
+        if self.prune_schedule.due():
+            await self.prune()
+
+    async def prune(self) -> int:
+        """Delete the stored results that are too old or past the row limit"""
+        async with AsyncSessionLocal() as db:
+            try:
+                deleted = await prune_rows(
+                    db,
+                    FormatResultEntry.created_at,
+                    settings.result_cache_ttl,
+                    settings.result_cache_max_rows,
+                )
+                await db.commit()
+            except SQLAlchemyError as e:
+                await db.rollback()
+                logger.warning(f"Failed to prune format results: {e}")
+                return 0
+        if deleted:
+            logger.info(f"Pruned {deleted} format results")
+        return deleted
+
+
+result_cache = ResultCache()
@@ -0,0 +1,292 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import logging
+import re
+import time
+from typing import Mapping, Optional
+
+import httpx
+
+from src.core.config import settings
+from src.core.metrics import QUEUE_DEPTH
+from src.core.tracing import span
+from src.services.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Lower values are scheduled first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BACKGROUND = 2
+
+# Priority of the LLM calls made from the current context
+llm_priority: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "llm_priority", default=PRIORITY_NORMAL
+)
+
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse a rate-limit reset duration such as "1s", "6m0s" or "20ms" """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    matches = DURATION_PATTERN.findall(value)
+    if not matches:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in matches)
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> Optional[int]:
+    try:
+        return int(float(headers[name]))
+    except (KeyError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Budget refilled continuously at `limit` units per minute, up to `limit`.
+    A bucket without a limit never makes a caller wait.
+    """
+
+    def __init__(self, limit: Optional[float] = None):
+        self.limit = limit
+        self.level = limit or 0.0
+        self.updated = time.monotonic()
+
+    def set_limit(self, limit: float) -> None:
+        self.refill()
+        if self.limit is None:
+            self.level = limit
+        self.limit = limit
+        self.level = min(self.level, limit)
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        if self.limit is not None:
+            self.level = min(
+                self.limit, self.level + (now - self.updated) * self.limit / 60.0
+            )
+        self.updated = now
+
+    def delay(self, cost: float) -> float:
+        """Seconds to wait before `cost` units are available"""
+        if self.limit is None:
+            return 0.0
+        self.refill()
+        cost = min(cost, self.limit)
+        if self.level >= cost:
+            return 0.0
+        return (cost - self.level) * 60.0 / self.limit
+
+    def consume(self, cost: float) -> None:
+        if self.limit is not None:
+            self.level -= min(cost, self.limit)
+
+    def observe_remaining(self, remaining: int) -> None:
+        """The provider's remaining budget also counts other clients' usage"""
+        if self.limit is not None:
+            self.refill()
+            self.level = min(self.level, remaining)
+
+    def drain(self) -> None:
+        self.refill()
+        self.level = 0.0
+
+
+class RateScheduler:
+    """
+    Request and token buckets shared by every call to one LLM provider.
+    Calls wait in a priority queue until both budgets allow them; the limits
+    are learned from the x-ratelimit-* response headers and kept slightly
+    under the provider's so that throughput settles below the limit
+    instead of alternating between bursts and 429 backoff.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        headroom: float = 0.9,
+    ):
+        self.headroom = headroom
+        self.requests = TokenBucket(
+            requests_per_minute * headroom if requests_per_minute else None
+        )
+        self.tokens = TokenBucket(
+            tokens_per_minute * headroom if tokens_per_minute else None
+        )
+        self.paused_until = 0.0
+        self._waiters: list[tuple[int, int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    @property
+    def limited(self) -> bool:
+        return (
+            self.requests.limit is not None
+            or self.tokens.limit is not None
+            or self.paused_until > time.monotonic()
+        )
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for *_, future in self._waiters if not future.done())
+
+    async def acquire(self, tokens: int, priority: int = PRIORITY_NORMAL) -> None:
+        """Wait until a call estimated at `tokens` tokens may be sent"""
+        if not self.limited and not self._waiters:
+            return
+
+        self._ensure_dispatcher()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), tokens, future))
+        self._wakeup.set()
+        with span("rate_limit_wait"):
+            await future
+
+    def observe(self, status_code: int, headers: Mapping[str, str]) -> None:
+        """Adapt the buckets to the provider's rate-limit headers"""
+        for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+            limit = _header_int(headers, f"x-ratelimit-limit-{kind}")
+            if limit:
+                bucket.set_limit(limit * self.headroom)
+            remaining = _header_int(headers, f"x-ratelimit-remaining-{kind}")
+            if remaining is not None:
+                bucket.observe_remaining(remaining)
+
+        if status_code == 429:
+            # Back off every queued call until the provider's budget resets
+            retry_after = parse_duration(headers.get("retry-after")) or max(
+                parse_duration(headers.get("x-ratelimit-reset-requests")) or 0.0,
+                parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0.0,
+                1.0,
+            )
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            self.requests.drain()
+            self.tokens.drain()
+            logger.warning(f"LLM rate limit reached, pausing for {retry_after:.1f}s")
+
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_dispatcher(self) -> None:
+        loop = asyncio.get_running_loop()
+        if (
+            self._dispatcher is None
+            or self._dispatcher.done()
+            or self._dispatcher.get_loop() is not loop
+        ):
+            self._wakeup = asyncio.Event()
+            self._dispatcher = loop.create_task(self._dispatch())
+
+    def _delay(self, tokens: int) -> float:
+        return max(
+            self.paused_until - time.monotonic(),
+            self.requests.delay(1),
+            self.tokens.delay(tokens),
+        )
+
+    async def _dispatch(self) -> None:
+        while True:
+            # Calls whose caller went away are dropped
+            while self._waiters and self._waiters[0][3].done():
+                heapq.heappop(self._waiters)
+
+            if not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            _, _, tokens, future = self._waiters[0]
+            delay = self._delay(tokens)
+            if delay <= 0:
+                heapq.heappop(self._waiters)
+                self.requests.consume(1)
+                self.tokens.consume(tokens)
+                future.set_result(None)
+                continue
+
+            # Wait for the budget, or for a new call or new limits
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except TimeoutError:
+                pass
+
+
+def estimate_request_tokens(request: httpx.Request) -> int:
+    """
+    Prompt tokens plus the completion budget of a completion request.
+    The prompt is estimated from its length rather than tokenized: this runs
+    in an httpx hook on the event loop, for every call, and the budget only
+    needs to be approximate.
+    """
+    try:
+        body = json.loads(request.content)
+    except (httpx.RequestNotRead, ValueError):
+        return settings.llm_default_completion_tokens
+
+    prompt = body.get("prompt") or ""
+    if isinstance(prompt, list):
+        prompt = "".join(str(part) for part in prompt)
+    for message in body.get("messages") or []:
+        content = message.get("content") or ""
+        prompt += content if isinstance(content, str) else json.dumps(content)
+
+    completion = (
+        body.get("max_tokens")
+        or body.get("max_completion_tokens")
+        or settings.llm_default_completion_tokens
+    )
+    return estimate_tokens(prompt) + completion
+
+
+class LLMScheduler:
+    """
+    Schedules every LLM call sent through the shared HTTP client, with one
+    RateScheduler per provider host. Installed as httpx event hooks, so the
+    OpenAI client and the LangChain chains are both covered.
+    """
+
+    def __init__(self):
+        self._schedulers: dict[str, RateScheduler] = {}
+
+    def scheduler(self, host: str) -> RateScheduler:
+        if host not in self._schedulers:
+            self._schedulers[host] = RateScheduler(
+                settings.llm_requests_per_minute,
+                settings.llm_tokens_per_minute,
+                settings.llm_rate_headroom,
+            )
+        return self._schedulers[host]
+
+    def queued(self) -> int:
+        return sum(scheduler.queued for scheduler in self._schedulers.values())
+
+    async def before_request(self, request: httpx.Request) -> None:
+        if request.method == "POST" and request.url.path.endswith("completions"):
+            await self.scheduler(request.url.host).acquire(
+                estimate_request_tokens(request), llm_priority.get()
+            )
+
+    async def after_response(self, response: httpx.Response) -> None:
+        request = response.request
+        if request.method == "POST" and request.url.path.endswith("completions"):
+            self.scheduler(request.url.host).observe(
+                response.status_code, response.headers
+            )
+
+
+llm_scheduler = LLMScheduler()
+QUEUE_DEPTH.labels("llm").set_function(llm_scheduler.queued)
@@ -0,0 +1,134 @@
+from dataclasses import dataclass
+from typing import Callable, Iterable, Union
+
+from src.services.markdown import (
+    BLANK,
+    CONTAINER_CLOSE,
+    CONTAINER_OPEN,
+    HEADING,
+    parse_markdown,
+)
+from src.services.tokens import count_tokens
+
+
+def split_markdown_blocks(content: Union[str, Iterable[str]]) -> list[str]:
+    """
+    Split Markdown into blocks at headings and blank lines, using the line
+    kinds of the shared Markdown tokenizer.
+    Fenced code, VitePress containers and the frontmatter are never split,
+    and "\\n".join(blocks) always gives back the original content.
+    The content may also be given as its lines.
+    """
+    blocks: list[list[str]] = []
+    current: list[str] = []
+    # Colon run length of each open container, innermost last
+    containers: list[int] = []
+
+    for kind, line in parse_markdown(content).items():
+        if kind == CONTAINER_OPEN or kind == CONTAINER_CLOSE:
+            marker = line.lstrip()
+            run = len(marker) - len(marker.lstrip(":"))
+            if kind == CONTAINER_CLOSE:
+                # A bare colon run closes the innermost container it is as
+                # long as, e.g. "::::" after a nested ":::: code-group"
+                if containers and run >= containers[-1]:
+                    containers.pop()
+            else:
+                if not containers and current and current[-1].strip():
+                    blocks.append(current)
+                    current = []
+                containers.append(run)
+            current.append(line)
+            continue
+
+        if not containers and kind == HEADING and current:
+            blocks.append(current)
+            current = []
+
+        current.append(line)
+
+        if not containers and kind == BLANK:
+            blocks.append(current)
+            current = []
+
+    if current:
+        blocks.append(current)
+
+    return ["\n".join(block) for block in blocks]
+
+
+@dataclass
+class Chunk:
+    """
+    Part of a document sent to the model on its own. `context` holds the end
+    of the previous chunk, given to the model to read only: it is not part
+    of `text` and must not be emitted again.
+    """
+
+    text: str
+    context: str = ""
+    tokens: int = 0
+
+
+def plan_markdown_chunks(
+    content: Union[str, Iterable[str]],
+    max_tokens: int,
+    context_tokens: int = 0,
+    count: Callable[[str], int] = count_tokens,
+) -> list[Chunk]:
+    """
+    Group Markdown blocks into chunks of at most max_tokens tokens.
+    A single block larger than max_tokens becomes its own chunk, so fenced
+    code, containers and the frontmatter are never cut, and
+    "\\n".join(chunk.text for chunk in chunks) gives back the content.
+    """
+    groups: list[tuple[list[str], int]] = []
+    current: list[str] = []
+    size = 0
+
+    for block in split_markdown_blocks(content):
+        block_tokens = count(block) + 1
+        if current and size + block_tokens > max_tokens:
+            groups.append((current, size))
+            current = []
+            size = 0
+        current.append(block)
+        size += block_tokens
+
+    if current:
+        groups.append((current, size))
+
+    chunks: list[Chunk] = []
+    previous: list[str] = []
+    for group, tokens in groups:
+        context = _trailing_context(previous, context_tokens, count)
+        chunks.append(Chunk(text="\n".join(group), context=context, tokens=tokens))
+        previous = group
+    return chunks
+
+
+def _trailing_context(
+    blocks: list[str], max_tokens: int, count: Callable[[str], int]
+) -> str:
+    """Last lines of the previous chunk, within max_tokens tokens"""
+    if max_tokens <= 0 or not blocks:
+        return ""
+    lines = "\n".join(blocks).rstrip("\n").split("\n")
+    kept: list[str] = []
+    size = 0
+    for line in reversed(lines):
+        line_tokens = count(line) + 1
+        if size + line_tokens > max_tokens:
+            break
+        kept.append(line)
+        size += line_tokens
+    return "\n".join(reversed(kept))
+
+
+def split_markdown_segments(
+    content: Union[str, Iterable[str]],
+    max_tokens: int,
+    count: Callable[[str], int] = count_tokens,
+) -> list[str]:
+    """Markdown segments of at most max_tokens tokens, without context"""
+    return [chunk.text for chunk in plan_markdown_chunks(content, max_tokens, 0, count)]
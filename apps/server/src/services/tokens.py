@@ -0,0 +1,44 @@
+import logging
+from functools import lru_cache
+from typing import Optional
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODING = "cl100k_base"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a text, about four characters per token"""
+    return len(text) // 4 + 1
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: Optional[str]):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+
+    try:
+        try:
+            return tiktoken.encoding_for_model(model or "")
+        except KeyError:
+            return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except (OSError, ValueError) as e:
+        # The encoding files are downloaded on first use, which fails offline
+        # (requests errors are OSErrors, a corrupt download a ValueError)
+        logger.warning(f"Tokenizer unavailable, estimating tokens instead: {e}")
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Count the tokens of a text locally with tiktoken, or estimate them
+    from its length when no encoding is available
+    """
+    encoding = _encoding(model or settings.openai_model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
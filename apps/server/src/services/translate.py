@@ -1,12 +1,74 @@
-from typing import Optional
+from dataclasses import dataclass
+from typing import AsyncGenerator, Iterable, Optional, Union
 import asyncio
+import json
+import logging
+import time
 
-from langchain_openai import ChatOpenAI
 from langchain.prompts import (
     ChatPromptTemplate,
 )
 
 from src.core.config import settings
+from src.core.metrics import (
+    LLMCallTimer,
+    observe_stage,
+    record_cache_lookup,
+    record_tokens,
+    stage_timer,
+)
+from src.models.translation_memory import TranslationMemoryEntry
+from src.schemas.translate import TranslateResponse
+from src.services.masking import (
+    MaskedText,
+    MaskingError,
+    StreamingUnmasker,
+    mask_markdown,
+)
+from src.services.registry import llm_registry
+from src.services.splitter import split_markdown_segments
+from src.services.tokens import count_tokens
+from src.services.translation_memory import (
+    normalize_segment,
+    segment_key,
+    translation_memory,
+)
+
+
+logger = logging.getLogger(__name__)
+
+PROMPT_VERSION = "2"
+
+TRANSLATION_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "You are a professional translator specialized in technical documentation and Markdown.",
+        ),
+        (
+            "human",
+            "Translate the following Markdown content from {source_language} to {target_language}.\n"
+            "Preserve all Markdown formatting, links and structure.\n"
+            "Keep every @@n@@ placeholder exactly once and unchanged, they stand for code and links.\n\n"
+            "Content:\n"
+            "{content}\n",
+        ),
+    ]
+)
+
+
+@dataclass
+class TranslationResult:
+    content: str
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+
+@dataclass
+class RetriedSegment:
+    """Translation of a segment redone without masking, replacing its streamed deltas"""
+
+    content: str
 
 
 class TranslateService:
@@ -20,43 +82,497 @@ class TranslateService:
         source_language: str,
         target_language: str,
         model_name: Optional[str] = None,
+        chunked: bool = False,
     ) -> str:
-        model = model_name or self.model_name
+        result = await self.translate_document(
+            content, source_language, target_language, model_name, chunked
+        )
+        return result.content
+
+    async def translate_document(
+        self,
+        content: str,
+        source_language: str,
+        target_language: str,
+        model_name: Optional[str] = None,
+        chunked: bool = False,
+    ) -> TranslationResult:
+        return await self.translate_split_document(
+            self.split(content, chunked), source_language, target_language, model_name
+        )
 
-        def build_and_run():
-            llm = ChatOpenAI(
-                temperature=self.temperature,
-                model_name=model,
-                openai_api_key=settings.openai_api_key,
+    async def translate_split_document(
+        self,
+        segments: list[str],
+        source_language: str,
+        target_language: str,
+        model_name: Optional[str] = None,
+    ) -> TranslationResult:
+        """Translate the segments of a document returned by split()"""
+        model = model_name or self.model_name
+        semaphore = asyncio.Semaphore(settings.translate_concurrency)
+        with stage_timer("translate"):
+            return await self.translate_segments(
+                segments, source_language, target_language, model, semaphore
             )
 
-            chat_prompt = ChatPromptTemplate.from_messages(
-                [
-                    (
-                        "system",
-                        "You are a professional translator specialized in technical documentation and Markdown.",
-                    ),
-                    (
-                        "human",
-                        "Translate the following Markdown content from {source_language} to {target_language}.\n"
-                        "Preserve all Markdown formatting, links and structure.\n\n"
-                        "Content:\n"
-                        "{content}\n",
-                    ),
-                ]
+    async def translate_segments(
+        self,
+        segments: list[str],
+        source_language: str,
+        target_language: str,
+        model: str,
+        semaphore: asyncio.Semaphore,
+    ) -> TranslationResult:
+        """
+        Translate segments concurrently under the given semaphore.
+        Segments already present in the translation memory skip the LLM,
+        identical segments are only translated once.
+        """
+        segment_keys, bodies = _segment_keys(
+            segments, source_language, target_language, model
+        )
+        cached = await self._recall(bodies)
+
+        async def run(key: str, body: str) -> tuple[str, str]:
+            async with semaphore:
+                translated = await self._translate_text(
+                    body, source_language, target_language, model
+                )
+            return key, translated.strip("\n")
+
+        tasks = [
+            asyncio.create_task(run(key, body))
+            for key, body in bodies.items()
+            if key not in cached
+        ]
+        try:
+            translated = dict(await asyncio.gather(*tasks))
+        except BaseException:
+            # The document fails with its first failed segment: stop the others
+            for task in tasks:
+                task.cancel()
+            raise
+        await self._remember(
+            translated, bodies, source_language, target_language, model
+        )
+
+        translations = {**cached, **translated}
+        pieces = []
+        cache_hits = 0
+        cache_misses = 0
+        for segment, key in zip(segments, segment_keys, strict=True):
+            if key is None:
+                pieces.append(segment)
+                continue
+            if key in cached:
+                cache_hits += 1
+            else:
+                cache_misses += 1
+            leading, trailing = _spacing(segment)
+            pieces.append(leading + translations[key] + trailing)
+
+        return TranslationResult(
+            content="\n".join(pieces),
+            cache_hits=cache_hits,
+            cache_misses=cache_misses,
+        )
+
+    async def translate_markdown_streaming(
+        self,
+        content: str,
+        source_language: str,
+        target_language: str,
+        model_name: Optional[str] = None,
+        chunked: bool = False,
+    ) -> AsyncGenerator[str, None]:
+        """
+        Translate a document and stream the translated Markdown as NDJSON deltas.
+        Segments are generated concurrently but their deltas are emitted in
+        document order, so concatenating every delta gives the final content.
+        A segment whose placeholders did not come back is translated again
+        without masking: a "segment_retried" event then carries its content,
+        which replaces the deltas already sent with the same "segment".
+        """
+        async for event in self.translate_segments_streaming(
+            self.split(content, chunked), source_language, target_language, model_name
+        ):
+            yield event
+
+    async def translate_segments_streaming(
+        self,
+        segments: list[str],
+        source_language: str,
+        target_language: str,
+        model_name: Optional[str] = None,
+    ) -> AsyncGenerator[str, None]:
+        """Stream the translation of the segments returned by split()"""
+        model = model_name or self.model_name
+        started = time.perf_counter()
+        yield _event(
+            {
+                "status": "start",
+                "progress": 0,
+                "message": f"Starting translation with {model}...",
+            }
+        )
+
+        segment_keys, bodies = _segment_keys(
+            segments, source_language, target_language, model
+        )
+        cached = await self._recall(bodies)
+        semaphore = asyncio.Semaphore(settings.translate_concurrency)
+
+        queues: dict[str, asyncio.Queue] = {}
+        tasks: dict[str, asyncio.Task] = {}
+        for key, body in bodies.items():
+            if key not in cached:
+                queues[key] = asyncio.Queue()
+                tasks[key] = asyncio.create_task(
+                    self._stream_text(
+                        body,
+                        source_language,
+                        target_language,
+                        model,
+                        semaphore,
+                        queues[key],
+                    )
+                )
+
+        translated: dict[str, str] = {}
+        parts: list[str] = []
+        cache_hits = 0
+        cache_misses = 0
+        total = len(segments)
+
+        def delta(text: str, done: int, segment: Optional[int] = None) -> str:
+            parts.append(text)
+            event = {
+                "status": "translating",
+                "progress": (done / total) * 95,
+                "delta": text,
+            }
+            if segment is not None:
+                event["segment"] = segment
+            return _event(event)
+
+        try:
+            for index, (segment, key) in enumerate(
+                zip(segments, segment_keys, strict=True)
+            ):
+                if index:
+                    yield delta("\n", index)
+                if key is None:
+                    if segment:
+                        yield delta(segment, index)
+                    continue
+
+                leading, trailing = _spacing(segment)
+                if leading:
+                    yield delta(leading, index)
+
+                if key in cached:
+                    cache_hits += 1
+                    yield delta(cached[key], index, index)
+                elif key in translated:
+                    cache_misses += 1
+                    yield delta(translated[key], index, index)
+                else:
+                    cache_misses += 1
+                    body_start = len(parts)
+                    while (item := await queues[key].get()) is not None:
+                        if not isinstance(item, RetriedSegment):
+                            yield delta(item, index, index)
+                            continue
+                        del parts[body_start:]
+                        parts.append(item.content)
+                        yield _event(
+                            {
+                                "status": "segment_retried",
+                                "progress": (index / total) * 95,
+                                "segment": index,
+                                "message": f"Placeholders lost in segment {index + 1}/{total}, translated again without masking",
+                                "content": item.content,
+                            }
+                        )
+                    translated[key] = await tasks[key]
+
+                if trailing:
+                    yield delta(trailing, index + 1)
+
+        except Exception as e:
+            logger.warning(f"Streamed translation failed: {e}", exc_info=True)
+            yield _event(
+                {
+                    "status": "error",
+                    "progress": 100,
+                    "message": f"Error translating file: {str(e)}",
+                }
             )
+            return
+
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        await self._remember(
+            translated, bodies, source_language, target_language, model
+        )
+        observe_stage("translate", time.perf_counter() - started)
+
+        result = TranslateResponse(
+            translated_content="".join(parts),
+            source_language=source_language,
+            target_language=target_language,
+            model_used=model,
+            cache_hits=cache_hits,
+            cache_misses=cache_misses,
+        )
+        yield _event(
+            {
+                "status": "completed",
+                "progress": 100,
+                "message": "Translation completed",
+                "result": result.model_dump(),
+            }
+        )
+
+    def warmup(self) -> None:
+        """Create the client, chain and tokenizer for the default model ahead of time"""
+        if self.model_name:
+            self._chain(self.model_name)
+        count_tokens("", self.model_name)
+
+    def _chain(self, model: str):
+        return llm_registry.chain(
+            "translate", TRANSLATION_PROMPT, model, self.temperature
+        )
 
-            chain = chat_prompt | llm
+    def _mask(self, content: str) -> MaskedText:
+        if not settings.masking_enabled:
+            return MaskedText(content, [])
+        return mask_markdown(content)
+
+    def split(self, content: Union[str, Iterable[str]], chunked: bool) -> list[str]:
+        """
+        Segments translated on their own. The content may be given as its
+        lines: a chunked upload is then split without reading it whole.
+        """
+        if chunked:
+            with stage_timer("split"):
+                return split_markdown_segments(content, settings.translate_chunk_tokens)
+        return [content if isinstance(content, str) else "\n".join(content)]
+
+    async def _recall(self, bodies: dict[str, str]) -> dict[str, str]:
+        if not settings.translation_memory_enabled:
+            return {}
+        cached = await translation_memory.lookup(list(bodies))
+        record_cache_lookup(
+            "translation_memory", len(cached), len(bodies) - len(cached)
+        )
+        return cached
+
+    async def _remember(
+        self,
+        translated: dict[str, str],
+        bodies: dict[str, str],
+        source_language: str,
+        target_language: str,
+        model: str,
+    ) -> None:
+        if not translated or not settings.translation_memory_enabled:
+            return
+        await translation_memory.store(
+            [
+                TranslationMemoryEntry(
+                    key=key,
+                    source_language=source_language,
+                    target_language=target_language,
+                    model_name=model,
+                    prompt_version=PROMPT_VERSION,
+                    source_text=normalize_segment(bodies[key]),
+                    translated_text=text,
+                )
+                for key, text in translated.items()
+            ]
+        )
+
+    async def _translate_text(
+        self,
+        content: str,
+        source_language: str,
+        target_language: str,
+        model: str,
+    ) -> str:
+        masked = self._mask(content)
+        translated = await self._invoke(
+            masked.text, source_language, target_language, model
+        )
+        try:
+            return masked.unmask(translated)
+        except MaskingError as e:
+            # The model dropped or altered placeholders: translate unmasked
+            logger.warning(f"Retrying translation without masking: {e}")
+            return await self._invoke(content, source_language, target_language, model)
 
-            result = chain.invoke(
+    async def _invoke(
+        self,
+        content: str,
+        source_language: str,
+        target_language: str,
+        model: str,
+    ) -> str:
+        call = LLMCallTimer(model)
+        try:
+            result = await self._chain(model).ainvoke(
                 {
                     "content": content,
                     "source_language": source_language,
                     "target_language": target_language,
                 }
             )
+        except asyncio.CancelledError:
+            call.finish("cancelled")
+            raise
+        except Exception:
+            call.finish("error")
+            raise
+        call.finish("success")
+
+        usage = getattr(result, "usage_metadata", None)
+        if usage:
+            record_tokens(model, usage["input_tokens"], usage["output_tokens"])
+        else:
+            record_tokens(
+                model,
+                count_tokens(content, model),
+                count_tokens(result.content, model),
+            )
+        return result.content
+
+    async def _stream_text(
+        self,
+        content: str,
+        source_language: str,
+        target_language: str,
+        model: str,
+        semaphore: asyncio.Semaphore,
+        queue: asyncio.Queue,
+    ) -> str:
+        """
+        Stream the translation of one segment into a queue, ended by None.
+        Surrounding newlines are dropped as they are for non-streamed segments.
+        Masked spans are restored as they arrive; if a placeholder is missing
+        once the segment is complete, the segment is translated again without
+        masking and queued as a RetriedSegment.
+        """
+        masked = self._mask(content)
+        unmasker = StreamingUnmasker(masked)
+        parts = []
+        pending = ""
+
+        def emit(piece: str) -> None:
+            nonlocal pending
+            text = pending + piece
+            if not parts:
+                text = text.lstrip("\n")
+            stripped = text.rstrip("\n")
+            pending = text[len(stripped) :]
+            if stripped:
+                parts.append(stripped)
+                queue.put_nowait(stripped)
+
+        try:
+            try:
+                await self._stream_masked(
+                    masked,
+                    unmasker,
+                    source_language,
+                    target_language,
+                    model,
+                    semaphore,
+                    emit,
+                )
+                emit(unmasker.finish())
+            except MaskingError as e:
+                # The model dropped or altered placeholders: translate unmasked
+                logger.warning(f"Retrying translation without masking: {e}")
+                async with semaphore:
+                    translated = await self._invoke(
+                        content, source_language, target_language, model
+                    )
+                parts[:] = [translated.strip("\n")]
+                queue.put_nowait(RetriedSegment(parts[0]))
+        finally:
+            queue.put_nowait(None)
+        return "".join(parts)
+
+    async def _stream_masked(
+        self,
+        masked: MaskedText,
+        unmasker: StreamingUnmasker,
+        source_language: str,
+        target_language: str,
+        model: str,
+        semaphore: asyncio.Semaphore,
+        emit,
+    ) -> None:
+        """Stream the masked segment, passing each unmasked piece to `emit`"""
+        async with semaphore:
+            call = LLMCallTimer(model)
+            output = []
+            try:
+                async for chunk in self._chain(model).astream(
+                    {
+                        "content": masked.text,
+                        "source_language": source_language,
+                        "target_language": target_language,
+                    }
+                ):
+                    if chunk.content:
+                        call.token()
+                        output.append(chunk.content)
+                    emit(unmasker.feed(chunk.content))
+            except asyncio.CancelledError:
+                call.finish("cancelled")
+                raise
+            except Exception:
+                call.finish("error")
+                raise
+            call.finish("success")
+            record_tokens(
+                model,
+                count_tokens(masked.text, model),
+                count_tokens("".join(output), model),
+            )
+
+
+def _segment_keys(
+    segments: list[str], source_language: str, target_language: str, model: str
+) -> tuple[list[Optional[str]], dict[str, str]]:
+    """
+    Compute the translation memory key of every segment (None for blank ones)
+    and map each distinct key to the segment body to translate.
+    """
+    bodies: dict[str, str] = {}
+    segment_keys: list[Optional[str]] = []
+    for segment in segments:
+        body = segment.strip("\n")
+        if not body.strip():
+            segment_keys.append(None)
+            continue
+        key = segment_key(body, source_language, target_language, model, PROMPT_VERSION)
+        segment_keys.append(key)
+        bodies.setdefault(key, body)
+    return segment_keys, bodies
+
+
+def _spacing(segment: str) -> tuple[str, str]:
+    """Return the blank lines surrounding a segment"""
+    leading = segment[: len(segment) - len(segment.lstrip("\n"))]
+    trailing = segment[len(segment.rstrip("\n")) :]
+    return leading, trailing
 
-            return result.content
 
-        translated = await asyncio.to_thread(build_and_run)
-        return translated
+def _event(data: dict) -> str:
+    return json.dumps(data) + "\n"
@@ -0,0 +1,121 @@
+import hashlib
+import logging
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.core.config import settings
+from src.core.database import (
+    AsyncSessionLocal,
+    PruneSchedule,
+    bulk_upsert,
+    prune_rows,
+)
+from src.models.translation_memory import TranslationMemoryEntry
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_segment(text: str) -> str:
+    """
+    Normalize a segment before hashing so that line endings, trailing
+    spaces and surrounding blank lines do not produce distinct entries.
+    """
+    lines = text.replace("\r\n", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+
+def segment_key(
+    text: str,
+    source_language: str,
+    target_language: str,
+    model_name: str,
+    prompt_version: str,
+) -> str:
+    digest = hashlib.sha256()
+    for part in (
+        source_language.strip().lower(),
+        target_language.strip().lower(),
+        model_name,
+        prompt_version,
+        normalize_segment(text),
+    ):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class TranslationMemory:
+    """
+    Translation memory stored in the application database, pruned by age
+    and row count as entries are stored.
+    """
+
+    def __init__(self):
+        self.prune_schedule = PruneSchedule()
+
+    async def lookup(self, keys: list[str]) -> dict[str, str]:
+        if not keys:
+            return {}
+        async with AsyncSessionLocal() as db:
+            try:
+                rows = await db.execute(
+                    select(
+                        TranslationMemoryEntry.key,
+                        TranslationMemoryEntry.translated_text,
+                    ).where(TranslationMemoryEntry.key.in_(keys))
+                )
+            except SQLAlchemyError as e:
+                # The memory is only a shortcut: every segment is translated
+                logger.warning(f"Failed to look up translation memory entries: {e}")
+                return {}
+        return {key: translated_text for key, translated_text in rows}
+
+    async def store(self, entries: list[TranslationMemoryEntry]) -> None:
+        if not entries:
+            return
+        rows = [
+            {
+                "key": entry.key,
+                "source_language": entry.source_language,
+                "target_language": entry.target_language,
+                "model_name": entry.model_name,
+                "prompt_version": entry.prompt_version,
+                "source_text": entry.source_text,
+                "translated_text": entry.translated_text,
+            }
+            for entry in entries
+        ]
+        async with AsyncSessionLocal() as db:
+            try:
+                await bulk_upsert(
+                    db, TranslationMemoryEntry, rows, update_columns=["translated_text"]
+                )
+                await db.commit()
+            except SQLAlchemyError as e:
+                await db.rollback()
+                logger.warning(f"Failed to store translation memory entries: {e}")
+        if self.prune_schedule.due():
+            await self.prune()
+
+    async def prune(self) -> int:
+        """Delete the entries that are too old or past the row limit"""
+        async with AsyncSessionLocal() as db:
+            try:
+                deleted = await prune_rows(
+                    db,
+                    TranslationMemoryEntry.created_at,
+                    settings.translation_memory_ttl,
+                    settings.translation_memory_max_rows,
+                )
+                await db.commit()
+            except SQLAlchemyError as e:
+                await db.rollback()
+                logger.warning(f"Failed to prune translation memory: {e}")
+                return 0
+        if deleted:
+            logger.info(f"Pruned {deleted} translation memory entries")
+        return deleted
+
+
+translation_memory = TranslationMemory()
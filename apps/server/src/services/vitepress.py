@@ -1,38 +1,74 @@
 import json
+import logging
 import re
 import asyncio
-
-from typing import AsyncGenerator
-from langchain.text_splitter import MarkdownTextSplitter
-
+import time
+from array import array
+
+from typing import AsyncGenerator, Callable, Iterable, Iterator, Optional, Union
+
+from src.services.markdown import (
+    BLANK,
+    CONTAINER_OPEN,
+    FRONTMATTER,
+    FRONTMATTER_DELIMITER,
+    HEADING,
+    SPACES,
+    TEXT,
+    MarkdownTokenizer,
+    ParsedDocument,
+    parse_markdown,
+    scan_markdown,
+)
+from src.services.masking import (
+    MaskedText,
+    MaskingError,
+    StreamingUnmasker,
+    mask_markdown,
+)
 from src.services.openai import OpenAIService
+from src.services.splitter import plan_markdown_chunks
 from src.core.config import settings
+from src.core.metrics import observe_stage, stage_timer
+from src.core.tracing import span
+
+logger = logging.getLogger(__name__)
 
 openai_service = OpenAIService()
 
 
-async def enhance_content_with_ai(content: str) -> str:
-    """Améliore le contenu avec le service AI configuré (gpt-oss)"""
-    try:
-        # Vérifier que le service OpenAI est disponible
-        health = await openai_service.health_check()
-        if health["status"] != "healthy":
-            print(
-                f"Attention: Service AI non disponible ({health.get('error', 'Unknown error')}), amélioration ignorée"
-            )
-            return content
+ENHANCE_PROMPT_VERSION = "3"
 
-        messages = [
-            {
-                "role": "system",
-                "content": """Tu es un expert en rédaction technique et documentation. 
+
+class EnhancementUnavailableError(Exception):
+    """Le service AI n'est pas disponible, le contenu n'a pas été amélioré"""
+
+
+def build_enhance_messages(content: str, context: str = "") -> list[dict[str, str]]:
+    """
+    Construit les messages de la requête d'amélioration. `context` est la fin
+    du passage précédent, fournie pour la lecture seulement.
+    """
+    if context:
+        content = f"""Contexte précédent (à ne pas réécrire ni inclure dans la réponse) :
+
+{context}
+
+Passage à améliorer :
+
+{content}"""
+
+    return [
+        {
+            "role": "system",
+            "content": """Tu es un expert en rédaction technique et documentation. 
                 Tu améliores la documentation en français en corrigeant les erreurs grammaticales et orthographiques,
                 en améliorant la clarté et la structure, et en ajoutant des exemples pertinents si nécessaire.
                 Tu dois absolument préserver le format markdown et les spécificités VitePress.""",
-            },
-            {
-                "role": "user",
-                "content": f"""Améliore cette documentation en français tout en préservant le format markdown VitePress :
+        },
+        {
+            "role": "user",
+            "content": f"""Améliore cette documentation en français tout en préservant le format markdown VitePress :
 
 {content}
 
@@ -43,156 +79,383 @@ Instructions :
 4. Garde strictement le format markdown et les containers VitePress
 5. Préserve le frontmatter YAML
 6. Améliore les titres pour qu'ils soient plus descriptifs
+7. Conserve chaque marqueur @@n@@ une seule fois et sans le modifier : il remplace du code ou un lien
 
 Contenu amélioré :""",
-            },
-        ]
+        },
+    ]
+
 
-        response = await openai_service.chat_completion(
-            messages=messages, temperature=0.3, max_tokens=4000
+async def request_ai_enhancement(content: str, context: str = "") -> str:
+    """Améliore le contenu avec AI et lève une exception en cas d'échec"""
+    # Vérifier que le service OpenAI est disponible, sauf si des cibles de
+    # repli peuvent prendre le relais
+    health = await openai_service.health_check()
+    if health["status"] != "healthy" and not openai_service.fallback_targets:
+        raise EnhancementUnavailableError(
+            f"Service AI non disponible ({health.get('error', 'Unknown error')})"
         )
 
-        enhanced_content = response["choices"][0]["message"]["content"].strip()
-        return enhanced_content
+    # Masquer le code, les liens et les marqueurs que le modèle n'a pas à réécrire
+    masked = _mask(content)
+    enhanced = await _complete_enhancement(masked.text, context)
+    try:
+        return masked.unmask(enhanced).strip()
+    except MaskingError as e:
+        # Marqueurs perdus ou modifiés : refaire la requête sans masquage
+        logger.warning(f"{e}, nouvelle tentative sans masquage")
+        return (await _complete_enhancement(content, context)).strip()
+
+
+async def _complete_enhancement(content: str, context: str) -> str:
+    response = await openai_service.chat_completion(
+        messages=build_enhance_messages(content, context),
+        temperature=0.3,
+        max_tokens=4000,
+    )
+    return response["choices"][0]["message"]["content"]
 
-    except Exception as e:
+
+async def stream_ai_enhancement(
+    content: str, context: str = ""
+) -> AsyncGenerator[str, None]:
+    """
+    Comme request_ai_enhancement, mais renvoie le texte au fil de la génération.
+    Un marqueur de masquage absent de la réponse lève MaskingError à la fin.
+    """
+    health = await openai_service.health_check()
+    if health["status"] != "healthy" and not openai_service.fallback_targets:
+        raise EnhancementUnavailableError(
+            f"Service AI non disponible ({health.get('error', 'Unknown error')})"
+        )
+
+    masked = _mask(content)
+    unmasker = StreamingUnmasker(masked)
+    async for delta in openai_service.chat_completion_stream(
+        messages=build_enhance_messages(masked.text, context),
+        temperature=0.3,
+        max_tokens=4000,
+    ):
+        if text := unmasker.feed(delta):
+            yield text
+    if text := unmasker.finish():
+        yield text
+
+
+def _mask(content: str) -> MaskedText:
+    if not settings.masking_enabled:
+        return MaskedText(content, [])
+    return mask_markdown(content)
+
+
+async def enhance_content_with_ai(content: str) -> str:
+    """Améliore le contenu avec le service AI configuré (gpt-oss)"""
+    try:
+        return await request_ai_enhancement(content)
+
+    except EnhancementUnavailableError as e:
+        logger.warning(f"{e}, amélioration ignorée")
+        return content
+
+    except Exception:
         # En cas d'erreur AI, retourner le contenu original
-        print(f"Erreur lors de l'amélioration AI: {e}")
+        logger.exception("Erreur lors de l'amélioration AI")
         return content
 
 
+CONTAINER_TITLES = {
+    "tip": "Conseil",
+    "warning": "Attention",
+    "danger": "Important",
+    "info": "Information",
+    "details": "Détails",
+}
+# Container VitePress sans titre personnalisé, ex: "::: tip"
+UNTITLED_CONTAINER_PATTERN = re.compile(r"^(\s*):::[ \t]+(\w+)[ \t]*$")
+# Lien markdown (hors images) dont l'URL ne contient pas de titre, sur une
+# seule ligne. Le "[" vient avant le lookbehind pour que la recherche parte
+# de ce préfixe. La première alternative ne reconnaît que les liens internes
+# à compléter, chemin (groupe 2) et ancre (groupe 3) : sans schéma d'URL, ne
+# finissant pas par "/" et dont le nom de fichier n'a pas d'extension au sens
+# de posixpath.splitext (pas de point après ses points de tête). Les autres
+# liens sont consommés tels quels par la seconde.
+LINK_PATTERN = re.compile(
+    rf"\[(?<!!\[)([^\]\n]+)\]\("
+    rf"(?:(?![a-zA-Z][a-zA-Z0-9+.-]*:)"
+    rf"((?:[^)\n#{SPACES}]*/)?(?=[^)\n#/{SPACES}])\.*[^)\n#./{SPACES}]*)"
+    rf"(#[^)\n{SPACES}]*)?"
+    rf"|[^)\n{SPACES}]+)\)"
+)
+# Suite de lignes (texte, titres, lignes vides) où les liens sont corrigés,
+# recherchée dans les types en octets
+LINKABLE_RUN_PATTERN = re.compile(b"[" + bytes((TEXT, BLANK, HEADING)) + b"]+")
+CONTAINER_OPEN_BYTE = bytes((CONTAINER_OPEN,))
+LINK_WINDOW_LINES = 64
+FRONTMATTER_DEFAULTS = (
+    ("lastUpdated", "lastUpdated: true"),
+    ("editLink", "editLink: true"),
+)
+DEFAULT_FRONTMATTER = (
+    (FRONTMATTER_DELIMITER, "---"),
+    (FRONTMATTER, "outline: deep"),
+    (FRONTMATTER, "lastUpdated: true"),
+    (FRONTMATTER, "editLink: true"),
+    (FRONTMATTER_DELIMITER, "---"),
+    (BLANK, ""),
+)
+DEFAULT_FRONTMATTER_LINES = [line for _, line in DEFAULT_FRONTMATTER]
+DEFAULT_FRONTMATTER_KINDS = array("B", [kind for kind, _ in DEFAULT_FRONTMATTER])
+TOC_LINES = ["", "[[toc]]", ""]
+TOC_KINDS = array("B", [BLANK, TEXT, BLANK])
+PROGRESS_BATCH_LINES = 50
+
+
 def extract_sections(content: str) -> list[str]:
-    """Extrait les sections principales du markdown"""
-    sections = []
-    for line in content.split("\n"):
-        if line.startswith("#"):
-            # Supprimer les # et nettoyer
-            section = line.lstrip("#").strip()
-            if section:
-                sections.append(section)
-    return sections
+    """Extrait les sections principales du markdown, hors blocs de code"""
+    return parse_markdown(content).sections
 
 
 def format_vitepress_markdown(content: str) -> str:
     """Formate et améliore le contenu markdown VitePress en préservant ses fonctionnalités"""
-    lines = content.split("\n")
-    formatted_lines = []
-    in_frontmatter = False
-    frontmatter_lines = []
-
-    for line in lines:
-        # Préserver et améliorer le frontmatter YAML
-        if line.strip() == "---":
-            if not in_frontmatter:
-                in_frontmatter = True
-                frontmatter_lines.append(line)
+    # Le document analysé ici n'est pas réutilisé : ses lignes sont formatées
+    # sur place, les lignes d'origine modifiées sont libérées au fur et à mesure
+    return format_vitepress_document(parse_markdown(content), in_place=True).text
+
+
+@stage_timer("clean")
+def format_vitepress_document(
+    document: ParsedDocument, in_place: bool = False
+) -> ParsedDocument:
+    """
+    Formate un document déjà analysé, sans le re-tokenizer. Avec in_place,
+    les lignes du document sont modifiées : il ne doit plus servir ensuite.
+    """
+    text, kinds = _format_range(document, 0, len(document), in_place)
+    if text == document.text:
+        # Rien à changer : garder le document et ses lignes déjà connues
+        return document
+    return ParsedDocument(kinds=kinds, text=text)
+
+
+def _format_range(
+    document: ParsedDocument, start: int, stop: int, in_place: bool = False
+) -> tuple[str, array]:
+    """Texte des lignes [start, stop) du document formatées, avec leurs types"""
+    lines = document.lines if in_place else document.lines[start:stop]
+    kinds = document.kinds[start:stop]
+
+    # Compléter le frontmatter YAML avant sa fermeture
+    end = document.frontmatter_end
+    if start <= end < stop:
+        defaults = _missing_frontmatter_defaults(document.metadata)
+        lines[end - start : end - start] = defaults
+        kinds[end - start : end - start] = array(
+            "B", bytes((FRONTMATTER,)) * len(defaults)
+        )
+
+    raw = kinds.tobytes()
+    index = raw.find(CONTAINER_OPEN_BYTE)
+    while index != -1:
+        lines[index] = _format_container(lines[index])
+        index = raw.find(CONTAINER_OPEN_BYTE, index + 1)
+
+    # Les liens sont corrigés par fenêtres de lignes de texte, en un appel par
+    # fenêtre (un lien ne déborde jamais de sa ligne). Seules les lignes
+    # modifiées sont remplacées, les autres restent les chaînes du document.
+    for match in LINKABLE_RUN_PATTERN.finditer(raw):
+        run_start, run_stop = match.span()
+        for window_start in range(run_start, run_stop, LINK_WINDOW_LINES):
+            window_stop = min(window_start + LINK_WINDOW_LINES, run_stop)
+            window = "\n".join(lines[window_start:window_stop])
+            if "](" not in window:
                 continue
-            else:
-                in_frontmatter = False
-                # Ajouter des métadonnées manquantes si nécessaire
-                frontmatter_content = "\n".join(frontmatter_lines[1:])
-                if "lastUpdated:" not in frontmatter_content:
-                    frontmatter_lines.append("lastUpdated: true")
-                if "editLink:" not in frontmatter_content:
-                    frontmatter_lines.append("editLink: true")
-                frontmatter_lines.append(line)
-                formatted_lines.extend(frontmatter_lines)
-                frontmatter_lines = []
+            fixed = LINK_PATTERN.sub(_fix_internal_link, window)
+            if fixed == window:
                 continue
+            for index, line in enumerate(fixed.split("\n"), window_start):
+                if line != lines[index]:
+                    lines[index] = line
+    return "\n".join(lines), kinds
 
-        if in_frontmatter:
-            frontmatter_lines.append(line)
-            continue
-
-        # Préserver et améliorer les containers VitePress
-        if line.strip().startswith("::: "):
-            container_type = line.strip().split(" ")[1]
-            # Ajouter des titres personnalisés si manquants
-            if container_type in ["tip", "warning", "danger", "info", "details"]:
-                if len(line.strip().split(" ")) == 2:  # Pas de titre personnalisé
-                    titles = {
-                        "tip": "Conseil",
-                        "warning": "Attention",
-                        "danger": "Important",
-                        "info": "Information",
-                        "details": "Détails",
-                    }
-                    line = f"::: {container_type} {titles.get(container_type, container_type.capitalize())}"
 
-        # Améliorer les liens internes VitePress
-        if "[" in line and "](" in line and not line.strip().startswith("!["):
-            # Vérifier si c'est un lien interne sans extension
-            link_pattern = r"\[([^\]]+)\]\(([^)]+)\)"
-            matches = re.findall(link_pattern, line)
-            for text, url in matches:
-                if (
-                    not url.startswith("http")
-                    and not url.startswith("#")
-                    and not url.endswith(".md")
-                ):
-                    if not url.endswith("/"):
-                        line = line.replace(f"]({url})", f"]({url}.md)")
+def _missing_frontmatter_defaults(metadata: dict) -> list[str]:
+    return [default for key, default in FRONTMATTER_DEFAULTS if key not in metadata]
+
+
+def _format_line(kind: int, line: str) -> str:
+    """Règles de formatage propres à une ligne, selon son type"""
+    if kind == CONTAINER_OPEN:
+        return _format_container(line)
+
+    # Améliorer les liens internes VitePress
+    if (kind == TEXT or kind == HEADING) and "](" in line:
+        return LINK_PATTERN.sub(_fix_internal_link, line)
+
+    return line
+
+
+def _format_container(line: str) -> str:
+    """Ajoute un titre personnalisé aux containers qui n'en ont pas"""
+    match = UNTITLED_CONTAINER_PATTERN.match(line)
+    if match and match.group(2) in CONTAINER_TITLES:
+        indent, container_type = match.groups()
+        return f"{indent}::: {container_type} {CONTAINER_TITLES[container_type]}"
+    return line
+
+
+def iter_clean_vitepress_markdown(
+    open_lines: Callable[[], Iterable[str]],
+) -> Iterator[str]:
+    """
+    Nettoyage VitePress (formatage et utilitaires) à mémoire bornée.
+    `open_lines` doit pouvoir relire le document : un premier parcours collecte
+    les informations globales (frontmatter, table des matières), le second
+    produit les lignes nettoyées au fil de l'eau, sans garder le document.
+    """
+    # Un frontmatter jamais refermé n'en est pas un : reparcourir sans
+    allow_frontmatter = True
+    outline = scan_markdown(open_lines())
+    if outline.unclosed:
+        allow_frontmatter = False
+        outline = scan_markdown(open_lines(), allow_frontmatter=False)
+
+    # Ajouter un frontmatter minimal si absent
+    if not outline.has_frontmatter:
+        for _, line in DEFAULT_FRONTMATTER:
+            yield line
 
-        formatted_lines.append(line)
+    tokenizer = MarkdownTokenizer(allow_frontmatter=allow_frontmatter)
+    insert_toc = not outline.has_toc
+    for index, line in enumerate(open_lines()):
+        kind = tokenizer.classify(line)
+        if kind == FRONTMATTER_DELIMITER and index == outline.frontmatter_end:
+            yield from _missing_frontmatter_defaults(outline.metadata)
 
-    return "\n".join(formatted_lines)
+        yield _format_line(kind, line)
+
+        if insert_toc and kind == HEADING and line.startswith("# "):
+            yield from ("", "[[toc]]", "")
+            insert_toc = False
+
+
+def _fix_internal_link(match: re.Match) -> str:
+    """Ajoute l'extension .md aux liens internes qui n'en ont pas"""
+    path = match[2]
+    if path is None:
+        return match[0]
+    anchor = match[3]
+    if anchor is None:
+        return f"[{match[1]}]({path}.md)"
+    return f"[{match[1]}]({path}.md{anchor})"
 
 
 def add_vitepress_utilities(content: str) -> str:
     """Ajoute des utilitaires VitePress pour améliorer la navigation et la présentation"""
-    lines = content.split("\n")
-    enhanced_lines = []
-    has_frontmatter = False
+    document, _, _ = _add_utilities(parse_markdown(content))
+    return document.text
 
-    # Vérifier si le frontmatter existe
-    if lines and lines[0].strip() == "---":
-        has_frontmatter = True
 
-    # Ajouter un frontmatter minimal si absent
-    if not has_frontmatter:
-        enhanced_lines.extend(
-            ["---", "outline: deep", "lastUpdated: true", "editLink: true", "---", ""]
-        )
+def add_vitepress_utilities_document(document: ParsedDocument) -> ParsedDocument:
+    """Ajoute les utilitaires VitePress à un document déjà analysé"""
+    enhanced, _, _ = _add_utilities(document)
+    return enhanced
 
-    enhanced_lines.extend(lines)
-
-    # Ajouter une table des matières si elle n'existe pas
-    content_str = "\n".join(enhanced_lines)
-    if "[[toc]]" not in content_str.lower():
-        # Trouver la première section pour insérer la TOC
-        for i, line in enumerate(enhanced_lines):
-            if line.startswith("# ") and i > 0:
-                enhanced_lines.insert(i + 1, "")
-                enhanced_lines.insert(i + 2, "[[toc]]")
-                enhanced_lines.insert(i + 3, "")
+
+def clean_vitepress_document(document: ParsedDocument) -> ParsedDocument:
+    """Formate le document puis ajoute les utilitaires VitePress"""
+    cleaned, _, _ = _add_utilities(format_vitepress_document(document))
+    return cleaned
+
+
+@stage_timer("utilities")
+def _add_utilities(document: ParsedDocument) -> tuple[ParsedDocument, bool, bool]:
+    """Ajoute frontmatter et table des matières, et indique ce qui a été ajouté"""
+    lines = document.lines
+    kinds = document.kinds
+
+    # Ajouter une table des matières après le premier titre si elle n'existe pas
+    added_toc = False
+    if not document.has_toc:
+        for index in document.headings:
+            if lines[index].startswith("# "):
+                lines = lines[: index + 1] + TOC_LINES + lines[index + 1 :]
+                kinds = kinds[: index + 1] + TOC_KINDS + kinds[index + 1 :]
+                added_toc = True
                 break
 
-    return "\n".join(enhanced_lines)
+    # Ajouter un frontmatter minimal si absent
+    added_frontmatter = not document.has_frontmatter
+    if added_frontmatter:
+        lines = DEFAULT_FRONTMATTER_LINES + lines
+        kinds = DEFAULT_FRONTMATTER_KINDS + kinds
+
+    if not (added_toc or added_frontmatter):
+        return document, False, False
+    return ParsedDocument(lines, kinds), added_frontmatter, added_toc
 
 
 def extract_vitepress_metadata(content: str) -> dict:
     """Extrait les métadonnées VitePress du frontmatter"""
-    metadata = {}
-    lines = content.split("\n")
-    in_frontmatter = False
-
-    for line in lines:
-        if line.strip() == "---":
-            if not in_frontmatter:
-                in_frontmatter = True
-                continue
-            else:
-                break
+    return parse_markdown(content).metadata
+
+
+async def process_document(
+    content: str, clean: bool = True, enhance: bool = True
+) -> tuple[ParsedDocument, bool]:
+    """
+    Traite un document complet : une seule analyse pour le nettoyage, puis AI.
+    Renvoie aussi si le traitement est complet, c'est-à-dire si l'amélioration
+    AI demandée a bien été appliquée.
+    """
+    with span("parse"):
+        document = parse_markdown(content)
+    if clean:
+        document = clean_vitepress_document(document)
+    if enhance:
+        try:
+            with stage_timer("enhance"):
+                enhanced = await request_ai_enhancement(document.text)
+        except Exception as e:
+            logger.warning(f"Amélioration AI ignorée ({e})", exc_info=True)
+            return document, False
+        document = parse_markdown(enhanced)
+    return document, True
+
+
+def _as_document(content: Union[str, ParsedDocument]) -> ParsedDocument:
+    if isinstance(content, ParsedDocument):
+        return content
+    return parse_markdown(content)
+
+
+class StageOutput:
+    """
+    Document transmis d'une étape du pipeline de streaming à la suivante.
+    `complete` passe à False si une amélioration AI demandée n'a pas eu lieu.
+    """
 
-        if in_frontmatter and ":" in line:
-            key, value = line.split(":", 1)
-            metadata[key.strip()] = value.strip()
+    __slots__ = ("document", "complete")
 
-    return metadata
+    def __init__(self, document: ParsedDocument):
+        self.document = document
+        self.complete = True
+
+    @property
+    def content(self) -> str:
+        return self.document.text
+
+
+class RetriedChunk:
+    """Amélioration d'un chunk refaite sans masquage, qui remplace ses deltas"""
+
+    __slots__ = ("content",)
+
+    def __init__(self, content: str):
+        self.content = content
 
 
 async def format_vitepress_markdown_streaming(
-    content: str,
+    content: Union[str, ParsedDocument], output: Optional[StageOutput] = None
 ) -> AsyncGenerator[str, None]:
     """Formate le contenu VitePress en streaming avec des chunks de progression"""
     yield (
@@ -200,97 +463,63 @@ async def format_vitepress_markdown_streaming(
         + "\n"
     )
 
-    lines = content.split("\n")
-    formatted_lines = []
-    in_frontmatter = False
-    frontmatter_lines = []
-    total_lines = len(lines)
+    document = _as_document(content)
+    texts: list[str] = []
+    kinds = array("B")
+    total_lines = len(document)
+    # Durée du formatage seul, sans l'attente du client entre deux chunks
+    elapsed = 0.0
 
-    for i, line in enumerate(lines):
-        # Envoyer un chunk de progression tous les 50 lignes
-        if i % 50 == 0:
-            progress = (i / total_lines) * 30  # 30% pour le formatage VitePress
-            yield (
-                json.dumps(
-                    {
-                        "status": "formatting",
-                        "progress": progress,
-                        "message": f"Formatage VitePress: {i}/{total_lines} lignes...",
-                    }
-                )
-                + "\n"
+    # Envoyer un chunk de progression tous les 50 lignes
+    for start in range(0, total_lines, PROGRESS_BATCH_LINES):
+        progress = (start / total_lines) * 30  # 30% pour le formatage VitePress
+        yield (
+            json.dumps(
+                {
+                    "status": "formatting",
+                    "progress": progress,
+                    "message": f"Formatage VitePress: {start}/{total_lines} lignes...",
+                }
             )
-            await asyncio.sleep(0.01)  # Petite pause pour le streaming
-
-        # Préserver et améliorer le frontmatter YAML
-        if line.strip() == "---":
-            if not in_frontmatter:
-                in_frontmatter = True
-                frontmatter_lines.append(line)
-                continue
-            else:
-                in_frontmatter = False
-                # Ajouter des métadonnées manquantes si nécessaire
-                frontmatter_content = "\n".join(frontmatter_lines[1:])
-                if "lastUpdated:" not in frontmatter_content:
-                    frontmatter_lines.append("lastUpdated: true")
-                if "editLink:" not in frontmatter_content:
-                    frontmatter_lines.append("editLink: true")
-                frontmatter_lines.append(line)
-                formatted_lines.extend(frontmatter_lines)
-                frontmatter_lines = []
-                continue
-
-        if in_frontmatter:
-            frontmatter_lines.append(line)
-            continue
-
-        # Préserver et améliorer les containers VitePress
-        if line.strip().startswith("::: "):
-            container_type = line.strip().split(" ")[1]
-            if container_type in ["tip", "warning", "danger", "info", "details"]:
-                if len(line.strip().split(" ")) == 2:
-                    titles = {
-                        "tip": "Conseil",
-                        "warning": "Attention",
-                        "danger": "Important",
-                        "info": "Information",
-                        "details": "Détails",
-                    }
-                    line = f"::: {container_type} {titles.get(container_type, container_type.capitalize())}"
-
-        # Améliorer les liens internes VitePress
-        if "[" in line and "](" in line and not line.strip().startswith("!["):
-            link_pattern = r"\[([^\]]+)\]\(([^)]+)\)"
-            matches = re.findall(link_pattern, line)
-            for text, url in matches:
-                if (
-                    not url.startswith("http")
-                    and not url.startswith("#")
-                    and not url.endswith(".md")
-                ):
-                    if not url.endswith("/"):
-                        line = line.replace(f"]({url})", f"]({url}.md)")
-
-        formatted_lines.append(line)
-
-    formatted_content = "\n".join(formatted_lines)
+            + "\n"
+        )
+        started = time.perf_counter()
+        batch_text, batch_kinds = _format_range(
+            document, start, min(start + PROGRESS_BATCH_LINES, total_lines)
+        )
+        texts.append(batch_text)
+        kinds.extend(batch_kinds)
+        elapsed += time.perf_counter() - started
+
+    # Les premières lignes formatées sont toutes dans le premier lot
+    first_batch = texts[0] if texts else ""
+    formatted = ParsedDocument(kinds=kinds, text="\n".join(texts))
+    del texts
+    observe_stage("clean", elapsed)
+    if output is not None:
+        output.document = formatted
+
+    preview = "\n".join(
+        first_batch.split("\n", PROGRESS_BATCH_LINES)[:PROGRESS_BATCH_LINES]
+    )
     yield (
         json.dumps(
             {
                 "status": "vitepress_done",
                 "progress": 30,
                 "message": "Formatage VitePress terminé",
-                "content_preview": formatted_content[:200] + "..."
-                if len(formatted_content) > 200
-                else formatted_content,
+                "content_preview": preview[:200] + "..."
+                if len(preview) > 200
+                else preview,
             }
         )
         + "\n"
     )
 
 
-async def add_vitepress_utilities_streaming(content: str) -> AsyncGenerator[str, None]:
+async def add_vitepress_utilities_streaming(
+    content: Union[str, ParsedDocument], output: Optional[StageOutput] = None
+) -> AsyncGenerator[str, None]:
     """Ajoute les utilitaires VitePress en streaming"""
     yield (
         json.dumps(
@@ -302,39 +531,20 @@ async def add_vitepress_utilities_streaming(content: str) -> AsyncGenerator[str,
         )
         + "\n"
     )
-    await asyncio.sleep(0.1)
 
-    lines = content.split("\n")
-    enhanced_lines = []
-    has_frontmatter = False
+    enhanced, added_frontmatter, added_toc = _add_utilities(_as_document(content))
+    if output is not None:
+        output.document = enhanced
 
-    if lines and lines[0].strip() == "---":
-        has_frontmatter = True
-
-    if not has_frontmatter:
-        enhanced_lines.extend(
-            ["---", "outline: deep", "lastUpdated: true", "editLink: true", "---", ""]
-        )
+    if added_frontmatter:
         yield (
             json.dumps({"status": "utilities", "message": "Frontmatter ajouté"}) + "\n"
         )
-
-    enhanced_lines.extend(lines)
-
-    content_str = "\n".join(enhanced_lines)
-    if "[[toc]]" not in content_str.lower():
-        for i, line in enumerate(enhanced_lines):
-            if line.startswith("# ") and i > 0:
-                enhanced_lines.insert(i + 1, "")
-                enhanced_lines.insert(i + 2, "[[toc]]")
-                enhanced_lines.insert(i + 3, "")
-                yield (
-                    json.dumps(
-                        {"status": "utilities", "message": "Table des matières ajoutée"}
-                    )
-                    + "\n"
-                )
-                break
+    if added_toc:
+        yield (
+            json.dumps({"status": "utilities", "message": "Table des matières ajoutée"})
+            + "\n"
+        )
 
     yield (
         json.dumps(
@@ -348,10 +558,57 @@ async def add_vitepress_utilities_streaming(content: str) -> AsyncGenerator[str,
     )
 
 
+def document_result(document: ParsedDocument) -> dict:
+    """Résultat d'un formatage : contenu, résumé, nombre de mots et sections"""
+    sections = document.sections
+    word_count = document.word_count
+    model_name = settings.openai_model or "AI"
+    return {
+        "formatted_content": document.text,
+        "summary": f"Document formaté avec {model_name}: {len(sections)} sections et {word_count} mots",
+        "word_count": word_count,
+        "sections": sections,
+    }
+
+
+async def replay_document_streaming(
+    document: ParsedDocument,
+) -> AsyncGenerator[str, None]:
+    """Renvoie en streaming un résultat déjà calculé, sans retraitement"""
+    yield (
+        json.dumps(
+            {
+                "status": "start",
+                "progress": 0,
+                "message": "Résultat déjà calculé, servi depuis le cache",
+            }
+        )
+        + "\n"
+    )
+    yield (
+        json.dumps(
+            {
+                "status": "completed",
+                "progress": 100,
+                "message": "Traitement terminé avec succès",
+                "result": document_result(document),
+            }
+        )
+        + "\n"
+    )
+
+
 async def process_document_streaming(
-    content: str, clean: bool = True, enhance: bool = True
+    content: str,
+    clean: bool = True,
+    enhance: bool = True,
+    output: Optional[StageOutput] = None,
 ) -> AsyncGenerator[str, None]:
-    """Traite un document complet en streaming avec AI"""
+    """
+    Traite un document complet en streaming avec AI.
+    Chaque étape s'exécute une seule fois et transmet son résultat à la suivante,
+    le document final reste disponible dans `output` si fourni.
+    """
     model_name = settings.openai_model
     yield (
         json.dumps(
@@ -364,32 +621,23 @@ async def process_document_streaming(
         + "\n"
     )
 
-    current_content = content
+    stage = output if output is not None else StageOutput(None)
+    with span("parse"):
+        stage.document = parse_markdown(content)
 
     # Étape 1: Formatage VitePress
     if clean:
-        async for chunk in format_vitepress_markdown_streaming(current_content):
+        async for chunk in format_vitepress_markdown_streaming(stage.document, stage):
             yield chunk
-        current_content = format_vitepress_markdown(current_content)
-
-        async for chunk in add_vitepress_utilities_streaming(current_content):
+        async for chunk in add_vitepress_utilities_streaming(stage.document, stage):
             yield chunk
-        current_content = add_vitepress_utilities(current_content)
 
     # Étape 2: Amélioration AI
-    enhanced_content = current_content
     if enhance:
-        enhanced_content_from_ai = None
-        async for chunk in enhance_content_with_ai_streaming(current_content):
-            chunk_data = json.loads(chunk.strip())
-            if "enhanced_content" in chunk_data:
-                enhanced_content_from_ai = chunk_data["enhanced_content"]
+        async for chunk in enhance_content_with_ai_streaming(stage.content, stage):
             yield chunk
 
-        if enhanced_content_from_ai:
-            enhanced_content = enhanced_content_from_ai
-        else:
-            enhanced_content = await enhance_content_with_ai(current_content)
+    document = stage.document
 
     # Étape 3: Finalisation
     yield (
@@ -403,15 +651,14 @@ async def process_document_streaming(
         + "\n"
     )
 
-    sections = extract_sections(enhanced_content)
-    word_count = len(enhanced_content.split())
+    result = document_result(document)
 
     yield (
         json.dumps(
             {
                 "status": "analyzing",
                 "progress": 95,
-                "message": f"Analyse terminée: {len(sections)} sections, {word_count} mots",
+                "message": f"Analyse terminée: {len(result['sections'])} sections, {result['word_count']} mots",
             }
         )
         + "\n"
@@ -422,23 +669,23 @@ async def process_document_streaming(
         "status": "completed",
         "progress": 100,
         "message": "Traitement terminé avec succès",
-        "result": {
-            "formatted_content": enhanced_content,
-            "summary": f"Document formaté avec {model_name}: {len(sections)} sections et {word_count} mots",
-            "word_count": word_count,
-            "sections": sections,
-        },
+        "result": result,
     }
 
     yield json.dumps(final_result) + "\n"
 
 
-async def enhance_content_with_ai_streaming(content: str) -> AsyncGenerator[str, None]:
+async def enhance_content_with_ai_streaming(
+    content: str, output: Optional[StageOutput] = None
+) -> AsyncGenerator[str, None]:
     """Améliore le contenu avec AI en streaming"""
+    started = time.perf_counter()
     try:
         # Vérifier que le service AI est disponible
         health = await openai_service.health_check()
-        if health["status"] != "healthy":
+        if health["status"] != "healthy" and not openai_service.fallback_targets:
+            if output is not None:
+                output.complete = False
             yield (
                 json.dumps(
                     {
@@ -463,32 +710,111 @@ async def enhance_content_with_ai_streaming(content: str) -> AsyncGenerator[str,
             + "\n"
         )
 
-        # Diviser le contenu en chunks pour le traitement
-        splitter = MarkdownTextSplitter(chunk_size=3000, chunk_overlap=200)
-        chunks = splitter.split_text(content)
+        # Diviser le contenu en chunks mesurés en tokens, sans couper les blocs
+        # de code, containers ni frontmatter ; la fin du chunk précédent sert
+        # de contexte mais n'est pas réémise
+        with stage_timer("split"):
+            plan = [
+                chunk
+                for chunk in plan_markdown_chunks(
+                    content,
+                    settings.enhance_chunk_tokens,
+                    settings.enhance_context_tokens,
+                )
+                if chunk.text.strip()
+            ]
+        chunks = [chunk.text.strip("\n") for chunk in plan]
 
-        enhanced_chunks = []
         total_chunks = len(chunks)
+        enhanced_chunks = [None] * total_chunks
+        semaphore = asyncio.Semaphore(settings.enhance_concurrency)
+        queue = asyncio.Queue()
 
-        for i, chunk in enumerate(chunks):
-            progress = 60 + (i / total_chunks) * 25  # 60% à 85%
-            yield (
-                json.dumps(
-                    {
-                        "status": "ai_processing",
-                        "progress": progress,
-                        "message": f"Traitement {model_name}: chunk {i + 1}/{total_chunks}",
-                    }
-                )
-                + "\n"
+        failed_chunks = 0
+
+        # Améliorer les chunks en parallèle, ils publient leurs deltas dans
+        # une file commune
+        tasks = [
+            asyncio.create_task(
+                _stream_enhanced_chunk(index, chunk, planned.context, semaphore, queue)
             )
+            for index, (chunk, planned) in enumerate(zip(chunks, plan, strict=True))
+        ]
+        try:
+            # Les deltas et la progression sont transmis au fil de la
+            # génération, dans l'ordre de complétion : chaque delta porte
+            # l'indice de son chunk, les chunks se joignent par "\n\n"
+            completed = 0
+            while completed < total_chunks:
+                index, delta = await queue.get()
+                progress = 60 + (completed / total_chunks) * 25  # 60% à 85%
+                if isinstance(delta, RetriedChunk):
+                    # Le chunk refait sans masquage remplace ses deltas déjà reçus
+                    yield (
+                        json.dumps(
+                            {
+                                "status": "ai_chunk_retried",
+                                "progress": progress,
+                                "chunk": index,
+                                "message": f"Marqueurs perdus dans le chunk {index + 1}/{total_chunks}, amélioré à nouveau sans masquage",
+                                "content": delta.content,
+                            }
+                        )
+                        + "\n"
+                    )
+                    continue
+                if delta is not None:
+                    yield _ai_delta(index, delta, progress)
+                    continue
+
+                chunk = chunks[index]
+                try:
+                    enhanced_chunks[index] = await tasks[index]
+                except Exception as e:
+                    # En cas d'erreur AI, conserver le chunk original : il
+                    # remplace les deltas déjà reçus pour ce chunk
+                    logger.warning(
+                        f"Erreur lors de l'amélioration AI du chunk {index}: {e}",
+                        exc_info=True,
+                    )
+                    failed_chunks += 1
+                    enhanced_chunks[index] = chunk
+                    yield (
+                        json.dumps(
+                            {
+                                "status": "ai_chunk_failed",
+                                "progress": progress,
+                                "chunk": index,
+                                "message": f"Erreur AI sur le chunk {index + 1}/{total_chunks}: {str(e)}, contenu original conservé",
+                                "content": chunk,
+                            }
+                        )
+                        + "\n"
+                    )
 
-            enhanced_chunk = await enhance_content_with_ai(chunk)
-            enhanced_chunks.append(enhanced_chunk)
+                completed += 1
+                yield (
+                    json.dumps(
+                        {
+                            "status": "ai_processing",
+                            "progress": 60 + (completed / total_chunks) * 25,
+                            "chunk": index,
+                            "message": f"Traitement {model_name}: chunk {index + 1}/{total_chunks} terminé ({completed}/{total_chunks})",
+                        }
+                    )
+                    + "\n"
+                )
+        finally:
+            for task in tasks:
+                task.cancel()
 
-            await asyncio.sleep(0.2)
+        # Un contenu vide ou blanc n'a aucun chunk : il est rendu tel quel
+        enhanced_content = "\n\n".join(enhanced_chunks) if enhanced_chunks else content
+        observe_stage("enhance", time.perf_counter() - started)
+        if output is not None:
+            output.document = parse_markdown(enhanced_content)
+            output.complete = output.complete and not failed_chunks
 
-        enhanced_content = "\n\n".join(enhanced_chunks)
         yield (
             json.dumps(
                 {
@@ -502,6 +828,8 @@ async def enhance_content_with_ai_streaming(content: str) -> AsyncGenerator[str,
         )
 
     except Exception as e:
+        if output is not None:
+            output.complete = False
         yield (
             json.dumps(
                 {
@@ -513,3 +841,53 @@ async def enhance_content_with_ai_streaming(content: str) -> AsyncGenerator[str,
             )
             + "\n"
         )
+
+
+async def _stream_enhanced_chunk(
+    index: int,
+    chunk: str,
+    context: str,
+    semaphore: asyncio.Semaphore,
+    queue: asyncio.Queue,
+) -> str:
+    """
+    Améliore un chunk en publiant ses deltas dans la file sous la forme
+    (index, delta), puis (index, None) une fois le chunk terminé.
+    Les espaces de début et de fin sont retirés, comme pour request_ai_enhancement.
+    Si des marqueurs de masquage manquent à la fin, le chunk est amélioré à
+    nouveau sans masquage et publié d'un bloc sous la forme (index, RetriedChunk).
+    """
+    parts = []
+    pending = ""
+    try:
+        async with semaphore:
+            try:
+                async for delta in stream_ai_enhancement(chunk, context):
+                    text = pending + delta
+                    if not parts:
+                        text = text.lstrip()
+                    stripped = text.rstrip()
+                    pending = text[len(stripped) :]
+                    if stripped:
+                        parts.append(stripped)
+                        queue.put_nowait((index, stripped))
+            except MaskingError as e:
+                # Marqueurs perdus ou modifiés : refaire la requête sans masquage
+                logger.warning(
+                    f"{e}, nouvelle tentative sans masquage du chunk {index}"
+                )
+                enhanced = await _complete_enhancement(chunk, context)
+                parts[:] = [enhanced.strip()]
+                queue.put_nowait((index, RetriedChunk(parts[0])))
+    finally:
+        queue.put_nowait((index, None))
+    return "".join(parts)
+
+
+def _ai_delta(index: int, delta: str, progress: float) -> str:
+    return (
+        json.dumps(
+            {"status": "ai_delta", "progress": progress, "chunk": index, "delta": delta}
+        )
+        + "\n"
+    )
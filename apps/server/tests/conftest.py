@@ -0,0 +1,66 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+# Settings requires an OpenAI configuration: the tests never call the API
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("OPENAI_BASE_URL", "http://127.0.0.1:9/v1")
+os.environ.setdefault("OPENAI_MODEL", "test-model")
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("LOG_FILE", "")
+
+
+@pytest.fixture
+def database(tmp_path):
+    """
+    Empty SQLite database in a temporary file, bound to the shared async
+    session. Without a pool: each test runs its own event loops.
+    """
+    import src.models  # noqa: F401
+    from src.core.database import AsyncSessionLocal, Base, async_engine
+
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", poolclass=NullPool
+    )
+
+    async def create_tables():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    AsyncSessionLocal.configure(bind=engine)
+    yield engine
+    AsyncSessionLocal.configure(bind=async_engine)
+    asyncio.run(engine.dispose())
+
+
+class FailingSession:
+    """Session on a locked database: every read and write fails"""
+
+    bind = SimpleNamespace(dialect=SimpleNamespace(name="sqlite"))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def get(self, *args):
+        raise OperationalError("SELECT", {}, Exception("database is locked"))
+
+    async def execute(self, *args):
+        raise OperationalError("SELECT", {}, Exception("database is locked"))
+
+    async def rollback(self):
+        pass
+
+
+@pytest.fixture
+def failing_session():
+    """Session factory to patch in place of AsyncSessionLocal"""
+    return FailingSession
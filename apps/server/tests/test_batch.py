@@ -0,0 +1,97 @@
+import asyncio
+import io
+import tarfile
+import threading
+import zipfile
+
+import pytest
+
+from src.core.config import settings
+from src.services import batch
+from src.services.batch import (
+    ArchiveTooLargeError,
+    read_markdown_archive,
+    translate_archive,
+)
+from src.services.translate import TranslateService
+
+
+def zip_archive(files: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for path, content in files.items():
+            archive.writestr(path, content)
+    return buffer.getvalue()
+
+
+def tar_archive(files: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for path, content in files.items():
+            info = tarfile.TarInfo(path)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(settings, "max_upload_bytes", 1000)
+    monkeypatch.setattr(settings, "archive_max_members", 5)
+
+
+@pytest.mark.parametrize("build", [zip_archive, tar_archive])
+def test_archive_within_limits_is_read(limits, build):
+    files = {"docs/a.md": b"# A", "docs/b.md": "# É".encode(), "notes.txt": b"x"}
+    assert read_markdown_archive(build(files)) == {
+        "docs/a.md": "# A",
+        "docs/b.md": "# É",
+    }
+
+
+@pytest.mark.parametrize("build", [zip_archive, tar_archive])
+def test_highly_compressed_member_is_refused(limits, build):
+    # A few hundred bytes once compressed, far past the limit once extracted
+    archive = build({"bomb.md": b"a" * 1_000_000})
+    assert len(archive) < 10_000
+    with pytest.raises(ArchiveTooLargeError):
+        read_markdown_archive(archive)
+
+
+@pytest.mark.parametrize("build", [zip_archive, tar_archive])
+def test_extracted_total_is_bounded(limits, build):
+    files = {f"{name}.md": b"a" * 400 for name in "abc"}
+    with pytest.raises(ArchiveTooLargeError):
+        read_markdown_archive(build(files))
+
+
+@pytest.mark.parametrize("build", [zip_archive, tar_archive])
+def test_member_count_is_bounded(limits, build):
+    files = {f"{index}.txt": b"" for index in range(6)}
+    with pytest.raises(ArchiveTooLargeError):
+        read_markdown_archive(build(files))
+
+
+def test_archive_preparation_runs_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(settings, "translation_memory_enabled", False)
+    threads = []
+    split = batch.split_markdown_segments
+
+    def recording_split(content, max_tokens):
+        threads.append(threading.current_thread())
+        return split(content, max_tokens)
+
+    async def fake_translate(self, body, source_language, target_language, model):
+        return f"[{target_language}] {body}"
+
+    monkeypatch.setattr(batch, "split_markdown_segments", recording_split)
+    monkeypatch.setattr(TranslateService, "_translate_text", fake_translate)
+
+    data = zip_archive({"guide/intro.md": b"Bonjour", "index.md": b"Salut"})
+    result = asyncio.run(translate_archive(data, "fr", ["en", "de"], "gpt-oss"))
+
+    assert threads and threading.main_thread() not in threads
+    with zipfile.ZipFile(io.BytesIO(result.archive)) as archive:
+        assert archive.read("en/guide/intro.md") == b"[en] Bonjour"
+        assert archive.read("de/index.md") == b"[de] Salut"
+    assert (result.files, result.languages) == (2, 2)
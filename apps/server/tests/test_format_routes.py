@@ -0,0 +1,195 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.core.cache import LRUCache
+from src.core.config import settings
+from src.routes import format as format_routes
+from src.services import incremental, vitepress
+from src.services import result_cache as result_cache_module
+from src.services.ingest import IngestedUpload
+from src.services.result_cache import ResultCache
+
+DOCUMENT = (
+    "# Guide\n\nIntroduction.\n\n## Installation\n\nÉtapes.\n\n## Usage\n\nExemples.\n"
+)
+
+
+@pytest.fixture
+def enhanced(monkeypatch):
+    """Amélioration AI factice : renvoie le texte marqué et garde ses appels"""
+    calls = []
+
+    async def fake_enhancement(content: str, context: str = "") -> str:
+        calls.append(content)
+        return content.replace("\n\n", "\n\n<!-- ai -->\n\n", 1)
+
+    monkeypatch.setattr(vitepress, "request_ai_enhancement", fake_enhancement)
+    monkeypatch.setattr(incremental, "request_ai_enhancement", fake_enhancement)
+    return calls
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(format_routes.router, prefix="/format")
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def result_cache(monkeypatch, database):
+    monkeypatch.setattr(settings, "result_cache_persistent", True)
+    cache = ResultCache()
+    monkeypatch.setattr(format_routes, "result_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def section_cache(monkeypatch):
+    cache = LRUCache(100)
+    monkeypatch.setattr(incremental, "section_cache", cache)
+    return cache
+
+
+def format_text(client: TestClient, content: str, **options):
+    return client.post("/format/doc/text", json={"content": content, **options})
+
+
+def test_incremental_mode_only_recomputes_edited_sections(
+    client, enhanced, section_cache
+):
+    first = format_text(client, DOCUMENT, incremental=True)
+    assert first.status_code == 200
+    total = first.json()["total_sections"]
+    assert first.json()["recomputed_sections"] == list(range(total))
+    assert len(enhanced) == total
+
+    enhanced.clear()
+    edited = DOCUMENT.replace("Étapes.", "Étapes détaillées.")
+    second = format_text(client, edited, incremental=True)
+
+    assert second.status_code == 200
+    assert second.json()["total_sections"] == total
+    assert second.json()["recomputed_sections"] == [1]
+    assert enhanced == ["## Installation\n\nÉtapes détaillées."]
+    assert "Étapes détaillées." in second.json()["formatted_content"]
+    assert second.headers["ETag"] != first.headers["ETag"]
+
+
+def test_incremental_mode_reuses_every_unchanged_section(
+    client, enhanced, section_cache
+):
+    first = format_text(client, DOCUMENT, incremental=True)
+    enhanced.clear()
+    second = format_text(client, DOCUMENT, incremental=True)
+
+    assert second.json()["recomputed_sections"] == []
+    assert enhanced == []
+    assert second.json()["formatted_content"] == first.json()["formatted_content"]
+    assert second.headers["ETag"] == first.headers["ETag"]
+
+
+def test_matching_etag_returns_304(client, enhanced, result_cache):
+    first = format_text(client, DOCUMENT)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    second = client.post(
+        "/format/doc/text",
+        json={"content": DOCUMENT},
+        headers={"If-None-Match": f'"autre", {etag}'},
+    )
+
+    assert second.status_code == 304
+    assert second.headers["ETag"] == etag
+    assert second.content == b""
+    assert len(enhanced) == 1
+
+
+def test_stale_etag_returns_the_document(client, enhanced, result_cache):
+    response = client.post(
+        "/format/doc/text",
+        json={"content": DOCUMENT},
+        headers={"If-None-Match": '"perime"'},
+    )
+
+    assert response.status_code == 200
+    assert "<!-- ai -->" in response.json()["formatted_content"]
+
+
+def test_upload_route_honours_if_none_match(client, enhanced, result_cache):
+    files = {"file": ("guide.md", DOCUMENT.encode("utf-8"))}
+    first = client.post("/format/doc", files=files)
+    etag = first.headers["ETag"]
+
+    second = client.post("/format/doc", files=files, headers={"If-None-Match": etag})
+
+    assert second.status_code == 304
+    assert len(enhanced) == 1
+
+
+@pytest.fixture
+def closed_uploads(monkeypatch):
+    """Uploads spilled from the first bytes, with the ones closed"""
+    closed = []
+    close = IngestedUpload.close
+
+    def recording_close(upload: IngestedUpload) -> None:
+        closed.append(upload)
+        close(upload)
+
+    monkeypatch.setattr(settings, "upload_spool_bytes", 16)
+    monkeypatch.setattr(IngestedUpload, "close", recording_close)
+    return closed
+
+
+def test_spilled_upload_is_closed_once_streamed(client, closed_uploads):
+    files = {"file": ("guide.md", DOCUMENT.encode("utf-8"))}
+
+    response = client.post("/format/doc/markdown?enhance=false", files=files)
+
+    assert response.status_code == 200
+    assert response.text.startswith("---\n")
+    assert len(closed_uploads) == 1
+
+
+def test_spilled_upload_is_closed_when_the_response_fails(
+    client, closed_uploads, monkeypatch
+):
+    def broken_chunks(lines):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(format_routes, "iter_text_chunks", broken_chunks)
+    files = {"file": ("guide.md", DOCUMENT.encode("utf-8"))}
+
+    response = client.post("/format/doc/markdown?enhance=false", files=files)
+
+    assert response.status_code == 500
+    assert len(closed_uploads) == 1
+
+
+def test_evicted_result_is_served_from_the_database(client, enhanced, result_cache):
+    first = format_text(client, DOCUMENT)
+    result_cache.memory = LRUCache(settings.result_cache_entries)
+
+    second = format_text(client, DOCUMENT)
+
+    assert len(enhanced) == 1
+    assert second.json() == first.json()
+    assert second.headers["ETag"] == first.headers["ETag"]
+    # The database hit fills the memory tier again
+    assert len(result_cache.memory) == 1
+    format_text(client, DOCUMENT)
+    assert result_cache.memory.hits == 1
+
+
+def test_database_errors_are_cache_misses(
+    client, enhanced, result_cache, monkeypatch, failing_session
+):
+    monkeypatch.setattr(result_cache_module, "AsyncSessionLocal", failing_session)
+
+    response = format_text(client, DOCUMENT)
+
+    assert response.status_code == 200
+    assert len(enhanced) == 1
@@ -0,0 +1,94 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import FastAPI, Request, UploadFile
+from fastapi.testclient import TestClient
+
+from src.services.ingest import (
+    MULTIPART_OVERHEAD_BYTES,
+    READ_BLOCK_SIZE,
+    IngestedUpload,
+    UploadLimitMiddleware,
+    UploadTooLargeError,
+    ingest_upload,
+    iter_text_chunks,
+)
+
+# "\r\n" and a two-byte "é" each cut in half by the end of the first block
+CRLF_ACROSS_BLOCKS = "a" * (READ_BLOCK_SIZE - 1) + "\r\nsuite\r\n"
+MULTIBYTE_ACROSS_BLOCKS = "a" * (READ_BLOCK_SIZE - 1) + "é\nété\n\nfin"
+
+
+def ingest(data: bytes, **options) -> IngestedUpload:
+    file = UploadFile(io.BytesIO(data), filename="doc.md")
+    return asyncio.run(ingest_upload(file, **options))
+
+
+@pytest.mark.parametrize("spool_bytes", [1024, 1024 * 1024])
+@pytest.mark.parametrize(
+    "text", [CRLF_ACROSS_BLOCKS, MULTIBYTE_ACROSS_BLOCKS, "", "\n", "a\nb"]
+)
+def test_lines_match_str_split(text: str, spool_bytes: int):
+    upload = ingest(text.encode("utf-8"), spool_bytes=spool_bytes)
+    try:
+        assert upload.spilled == (upload.size > spool_bytes)
+        assert list(upload.iter_lines()) == text.split("\n")
+        # Read back as many times as needed
+        assert list(upload.iter_lines()) == text.split("\n")
+        assert upload.read_text() == text
+    finally:
+        upload.close()
+
+
+def test_invalid_utf8_is_refused():
+    data = b"a" * (READ_BLOCK_SIZE - 1) + "é".encode("latin-1")
+    with pytest.raises(UnicodeDecodeError):
+        ingest(data)
+
+
+def test_upload_over_the_maximum_size_is_refused():
+    with pytest.raises(UploadTooLargeError):
+        ingest(b"a" * 101, max_bytes=100)
+
+
+@pytest.mark.parametrize("text", [CRLF_ACROSS_BLOCKS, MULTIBYTE_ACROSS_BLOCKS, ""])
+@pytest.mark.parametrize("chunk_size", [1, 7, READ_BLOCK_SIZE])
+def test_text_chunks_join_lines_back(text: str, chunk_size: int):
+    assert "".join(iter_text_chunks(text.split("\n"), chunk_size)) == text
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        return {"size": len(await request.body())}
+
+    app.add_middleware(UploadLimitMiddleware, max_bytes=100)
+    return TestClient(app)
+
+
+LIMIT = 100 + MULTIPART_OVERHEAD_BYTES
+
+
+def test_body_within_the_limit_goes_through(client):
+    response = client.post("/upload", content=b"a" * LIMIT)
+    assert response.status_code == 200
+    assert response.json() == {"size": LIMIT}
+
+
+def test_content_length_over_the_limit_is_refused_upfront(client):
+    response = client.post("/upload", content=b"a" * (LIMIT + 1))
+    assert response.status_code == 413
+
+
+def test_body_without_content_length_is_refused_while_received(client):
+    def body():
+        for _ in range(LIMIT // 1024 + 2):
+            yield b"a" * 1024
+
+    response = client.post("/upload", content=body())
+    assert "content-length" not in response.request.headers
+    assert response.status_code == 413
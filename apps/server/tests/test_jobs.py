@@ -0,0 +1,152 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.core.config import settings
+from src.core.database import AsyncSessionLocal
+from src.models.job import Job
+from src.routes import jobs as jobs_routes
+from src.services import jobs
+from src.services.jobs import COMPLETED, FAILED, QUEUED, RUNNING, JobManager
+
+
+async def fake_format_events(content: str, params: dict):
+    if content == "échec":
+        yield {"status": "error", "message": "Formatage impossible"}
+        return
+    yield {"status": "processing", "progress": 50, "message": "À mi-chemin"}
+    yield {"status": "completed", "progress": 100, "result": {"content": content}}
+
+
+@pytest.fixture
+def manager(monkeypatch, database):
+    monkeypatch.setitem(jobs.JOB_RUNNERS, "format", fake_format_events)
+    manager = JobManager(concurrency=1)
+    monkeypatch.setattr(jobs_routes, "job_manager", manager)
+    return manager
+
+
+@pytest.fixture
+def app(manager):
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await manager.start()
+        yield
+        await manager.stop()
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(jobs_routes.router, prefix="/jobs")
+    return app
+
+
+@pytest.fixture
+def client(app):
+    with TestClient(app) as client:
+        yield client
+
+
+def wait_for(client: TestClient, job_id: str, status: str) -> dict:
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} never reached {status}: {job}")
+
+
+def test_submitted_job_runs_to_completion(client, database):
+    # Without INSERT ... RETURNING, server defaults are not sent back
+    database.sync_engine.dialect.insert_returning = False
+    response = client.post("/jobs/format", json={"content": "# Titre"})
+
+    assert response.status_code == 202
+    submitted = response.json()
+    assert submitted["status"] == QUEUED
+    assert submitted["created_at"] is not None
+
+    job = wait_for(client, submitted["id"], COMPLETED)
+    assert job["progress"] == 100.0
+    assert job["attempts"] == 1
+
+    result = client.get(f"/jobs/{submitted['id']}/result")
+    assert result.status_code == 200
+    assert result.json()["result"] == {"content": "# Titre"}
+
+
+def test_failed_job_reports_its_error(client):
+    submitted = client.post("/jobs/format", json={"content": "échec"}).json()
+
+    job = wait_for(client, submitted["id"], FAILED)
+    assert job["error"] == "Formatage impossible"
+
+    result = client.get(f"/jobs/{submitted['id']}/result")
+    assert result.status_code == 409
+
+
+def test_unknown_job_is_not_found(client):
+    assert client.get("/jobs/inconnu").status_code == 404
+
+
+def add_job(job_id: str, status: str, attempts: int = 0) -> None:
+    async def insert():
+        async with AsyncSessionLocal() as db:
+            db.add(
+                Job(
+                    id=job_id,
+                    kind="format",
+                    status=status,
+                    progress=0.0,
+                    params=json.dumps({"clean": True, "enhance": False}),
+                    content="# Titre",
+                    attempts=attempts,
+                )
+            )
+            await db.commit()
+
+    asyncio.run(insert())
+
+
+def test_job_is_claimed_once(manager):
+    add_job("a", QUEUED)
+
+    async def claim_twice():
+        return await manager._claim("a"), await manager._claim("a")
+
+    first, second = asyncio.run(claim_twice())
+    assert (first.status, first.attempts) == (RUNNING, 1)
+    assert second is None
+
+
+def test_interrupted_jobs_are_recovered_on_startup(manager, monkeypatch):
+    monkeypatch.setattr(settings, "job_max_attempts", 2)
+    add_job("queued", QUEUED)
+    add_job("interrupted", RUNNING, attempts=1)
+    add_job("given-up", RUNNING, attempts=2)
+    add_job("done", COMPLETED, attempts=1)
+
+    async def recover():
+        job_ids = await manager._recover()
+        given_up = await manager.get("given-up")
+        interrupted = await manager.get("interrupted")
+        return job_ids, given_up, interrupted
+
+    job_ids, given_up, interrupted = asyncio.run(recover())
+    assert sorted(job_ids) == ["interrupted", "queued"]
+    assert interrupted.status == QUEUED
+    assert given_up.status == FAILED
+    assert given_up.error == "Interrupted 2 times, giving up"
+
+
+def test_recovered_job_runs_after_a_restart(app):
+    add_job("interrupted", RUNNING, attempts=1)
+
+    with TestClient(app) as client:
+        job = wait_for(client, "interrupted", COMPLETED)
+
+    assert job["attempts"] == 2
@@ -0,0 +1,139 @@
+import json
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.core import logger as logger_module
+from src.core.logger import (
+    REQUEST_ID_HEADER,
+    JsonFormatter,
+    RequestContextFilter,
+    RequestIdMiddleware,
+    current_request_id,
+    setup_logging,
+    stop_logging,
+)
+
+log = logging.getLogger("tests.logger")
+
+
+class ListHandler(logging.Handler):
+    """Keeps the formatted records"""
+
+    def __init__(self):
+        super().__init__()
+        self.lines: list[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.lines.append(self.format(record))
+
+
+@pytest.fixture
+def records():
+    """JSON records of the test logger, tagged as the queue handler does"""
+    handler = ListHandler()
+    handler.setFormatter(JsonFormatter())
+    handler.addFilter(RequestContextFilter())
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    yield handler.lines
+    log.removeHandler(handler)
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/hello")
+    def hello():
+        log.info("hello", extra={"route": "hello"})
+        return {"request_id": current_request_id()}
+
+    app.add_middleware(RequestIdMiddleware)
+    return TestClient(app)
+
+
+def test_incoming_request_id_is_echoed_and_logged(client, records):
+    response = client.get("/hello", headers={REQUEST_ID_HEADER: "abc-123"})
+
+    assert response.headers[REQUEST_ID_HEADER] == "abc-123"
+    assert response.json() == {"request_id": "abc-123"}
+    record = json.loads(records[-1])
+    assert record["request_id"] == "abc-123"
+    assert record["message"] == "hello"
+    assert record["route"] == "hello"
+    assert record["level"] == "INFO"
+
+
+@pytest.mark.parametrize("incoming", [None, "", "x" * 129, "bad\x01id"])
+def test_missing_or_invalid_request_id_is_generated(client, records, incoming):
+    headers = {REQUEST_ID_HEADER: incoming} if incoming is not None else {}
+
+    response = client.get("/hello", headers=headers)
+
+    request_id = response.headers[REQUEST_ID_HEADER]
+    assert request_id != incoming
+    assert len(request_id) == 32
+    assert json.loads(records[-1])["request_id"] == request_id
+
+
+def test_records_outside_a_request_have_no_id(records):
+    log.info("outside")
+    assert json.loads(records[-1])["request_id"] == "-"
+
+
+def make_record(level: int) -> logging.LogRecord:
+    return logging.LogRecord("tests", level, __file__, 1, "message", None, None)
+
+
+def test_sampling_keeps_warnings_and_errors():
+    sampler = RequestContextFilter(sample_rate=0.0)
+
+    assert not sampler.filter(make_record(logging.DEBUG))
+    assert not sampler.filter(make_record(logging.INFO))
+    assert sampler.filter(make_record(logging.WARNING))
+    assert sampler.filter(make_record(logging.ERROR))
+
+
+def test_sampling_keeps_or_drops_a_request_as_a_whole():
+    sampler = RequestContextFilter(sample_rate=0.5)
+    kept = set()
+    for index in range(50):
+        token = logger_module._request_id.set(f"request-{index}")
+        try:
+            decisions = {sampler.filter(make_record(logging.INFO)) for _ in range(5)}
+        finally:
+            logger_module._request_id.reset(token)
+        assert len(decisions) == 1
+        kept |= decisions
+    assert kept == {True, False}
+
+
+@pytest.fixture
+def output(monkeypatch):
+    """Logging set up with a list handler in place of stderr and the log file"""
+    root = logging.getLogger()
+    saved = root.handlers[:], root.level
+    handler = ListHandler()
+    handler.setFormatter(logging.Formatter("[%(request_id)s] %(message)s"))
+    monkeypatch.setattr(logger_module, "_output_handlers", lambda: [handler])
+    setup_logging(logging.INFO)
+    yield handler.lines
+    stop_logging()
+    root.handlers[:], level = saved
+    root.setLevel(level)
+
+
+def test_stop_writes_queued_records_then_logs_directly(output):
+    for index in range(100):
+        log.info(f"queued {index}")
+
+    stop_logging()
+
+    assert logger_module._listener is None
+    assert output == [f"[-] queued {index}" for index in range(100)]
+    # Records logged after shutdown are written, not left in a dead queue
+    log.warning("after shutdown")
+    assert output[-1] == "[-] after shutdown"
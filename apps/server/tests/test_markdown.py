@@ -0,0 +1,124 @@
+import random
+
+import pytest
+
+from benchmarks.corpus import generate_page
+from src.services.markdown import (
+    CONTAINER_CLOSE,
+    CONTAINER_OPEN,
+    MarkdownTokenizer,
+    parse_markdown,
+    scan_markdown,
+)
+
+FUZZ_PIECES = [
+    "---",
+    " --- ",
+    "```",
+    "  ```py",
+    "~~~",
+    "````",
+    "::: tip",
+    "  ::: warning Titre",
+    ":::",
+    ":::: code-group",
+    "::::",
+    " :::: ",
+    "# T",
+    "#",
+    "# ",
+    "#x",
+    "#\tx",
+    "## x ##",
+    "###### y",
+    "####### z",
+    "",
+    "  ",
+    "\t",
+    "\r",
+    "[[toc]]",
+    "texte [lien](./page)",
+    "titre: valeur",
+    "- liste",
+    "    code",
+    "é accentué",
+]
+
+
+def tokenizer_kinds(lines: list[str]) -> list[int]:
+    """Types donnés par MarkdownTokenizer, sans frontmatter s'il n'est pas refermé"""
+    tokenizer = MarkdownTokenizer()
+    kinds = [tokenizer.classify(line) for line in lines]
+    if tokenizer.in_frontmatter:
+        tokenizer = MarkdownTokenizer(allow_frontmatter=False)
+        kinds = [tokenizer.classify(line) for line in lines]
+    return kinds
+
+
+def assert_same_kinds(content: str) -> None:
+    lines = content.split("\n")
+    assert list(parse_markdown(content).kinds) == tokenizer_kinds(lines)
+    assert list(parse_markdown(lines).kinds) == tokenizer_kinds(lines)
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("size", [1024, 16384])
+def test_classify_matches_tokenizer_on_corpus(size: int, seed: int):
+    assert_same_kinds(generate_page(size, seed))
+
+
+def test_classify_matches_tokenizer_on_fuzzed_documents():
+    generator = random.Random(7)
+    for _ in range(3000):
+        lines = [generator.choice(FUZZ_PIECES) for _ in range(generator.randint(0, 14))]
+        assert_same_kinds("\n".join(lines))
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "",
+        "---",
+        "---\ntitre: a",
+        "---\ntitre: a\n---\n# T",
+        "```\n# dans le code",
+        "~~~\n```\n~~~\n# T",
+        "````\n```\n````",
+        "  ```py\ncode\n  ```",
+        "#x\n####### x\n#\tx\n######\ty",
+        "::: tip\n:::\n  ::: warning Titre\n  :::",
+        ":::: code-group\n::: tip\n:::\n::::",
+        "texte\n---\nsuite",
+    ],
+)
+def test_classify_matches_tokenizer_on_edge_cases(content: str):
+    assert_same_kinds(content)
+
+
+def test_bare_colon_run_closes_a_container():
+    kinds = list(parse_markdown(":::: code-group\n::: tip\n:::\n::::").kinds)
+    assert kinds == [CONTAINER_OPEN, CONTAINER_OPEN, CONTAINER_CLOSE, CONTAINER_CLOSE]
+
+
+def test_sections_skip_code_blocks():
+    document = parse_markdown("# Titre\n```\n# pas un titre\n```\n## Partie ##")
+    assert document.sections == ["Titre", "Partie"]
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "---\ntitre: Page\nauteur: a: b\n---\n# T",
+        "---\ntitre: Page",
+        "# T\n---\ntitre: Page\n---",
+        "",
+    ],
+)
+def test_metadata_matches_scan(content: str):
+    lines = content.split("\n")
+    outline = scan_markdown(lines)
+    if outline.unclosed:
+        outline = scan_markdown(lines, allow_frontmatter=False)
+    document = parse_markdown(content)
+    assert document.metadata == outline.metadata
+    assert document.frontmatter_end == outline.frontmatter_end
@@ -0,0 +1,150 @@
+import random
+
+import pytest
+
+from benchmarks.corpus import generate_page
+from src.services.masking import (
+    MaskedText,
+    MaskingError,
+    StreamingUnmasker,
+    mask_markdown,
+)
+
+DOCUMENT = """---
+title: Guide de démarrage
+outline: deep
+---
+
+# Installation {#installation}
+
+Lancez `npm install` puis ouvrez [la doc](https://vitepress.dev/guide) ou
+<kbd>Ctrl</kbd> + C. Valeur : {{ $frontmatter.title }}
+
+[[toc]]
+
+::: tip Astuce
+Voir ![schéma](./images/schema.png) et <!-- note interne -->.
+:::
+
+```ts
+// Ce commentaire ne doit pas être traduit
+export default defineConfig({})
+```
+
+Texte déjà marqué @@0@@ par l'auteur.
+"""
+
+
+def test_round_trip_restores_the_document():
+    masked = mask_markdown(DOCUMENT)
+    assert masked.unmask(masked.text) == DOCUMENT
+    # The author's own placeholder-like text is masked too
+    assert "@@0@@" in masked.spans
+
+
+@pytest.mark.parametrize(
+    "span",
+    [
+        "title:",
+        "`npm install`",
+        "https://vitepress.dev/guide",
+        "<kbd>",
+        "{{ $frontmatter.title }}",
+        "[[toc]]",
+        "{#installation}",
+        "::: tip",
+        "./images/schema.png",
+        "<!-- note interne -->",
+        ":::",
+    ],
+)
+def test_non_translatable_spans_are_masked(span: str):
+    masked = mask_markdown(DOCUMENT)
+    assert span in masked.spans
+    assert span not in masked.text
+
+
+def test_translatable_text_stays_visible():
+    masked = mask_markdown(DOCUMENT)
+    for text in ("Guide de démarrage", "Installation", "la doc", "Astuce", "schéma"):
+        assert text in masked.text
+
+
+def test_fenced_block_is_a_single_placeholder():
+    masked = mask_markdown(DOCUMENT)
+    block = next(span for span in masked.spans if span.startswith("```ts"))
+    assert block.endswith("```")
+    assert "Ce commentaire" not in masked.text
+
+
+def test_unclosed_fence_is_kept_as_a_block():
+    content = "Texte\n```python\nprint('ok')"
+    masked = mask_markdown(content)
+    assert masked.text == "Texte\n@@0@@"
+    assert masked.unmask(masked.text) == content
+
+
+def test_generated_pages_round_trip():
+    for seed in range(20):
+        page = generate_page(4096, seed=seed)
+        masked = mask_markdown(page)
+        assert masked.unmask(masked.text) == page
+
+
+def test_missing_placeholder_is_refused():
+    masked = MaskedText("@@0@@ et @@1@@", ["`a`", "`b`"])
+    with pytest.raises(MaskingError, match=r"missing=\[1\]"):
+        masked.unmask("@@0@@ et rien")
+
+
+def test_duplicated_placeholder_is_refused():
+    masked = MaskedText("@@0@@ et @@1@@", ["`a`", "`b`"])
+    with pytest.raises(MaskingError, match=r"duplicated=\[0\]"):
+        masked.unmask("@@0@@ @@0@@ et @@1@@")
+
+
+def test_unknown_placeholder_is_refused():
+    masked = MaskedText("@@0@@", ["`a`"])
+    with pytest.raises(MaskingError, match=r"unknown=\[7\]"):
+        masked.unmask("@@0@@ @@7@@")
+
+
+def split_randomly(text: str, rng: random.Random) -> list[str]:
+    pieces = []
+    start = 0
+    while start < len(text):
+        size = rng.randint(1, 8)
+        pieces.append(text[start : start + size])
+        start += size
+    return pieces
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_streaming_unmasker_matches_unmask(seed: int):
+    rng = random.Random(seed)
+    masked = mask_markdown(generate_page(2048, seed=seed))
+    unmasker = StreamingUnmasker(masked)
+
+    output = "".join(unmasker.feed(piece) for piece in split_randomly(masked.text, rng))
+    output += unmasker.finish()
+
+    assert output == masked.unmask(masked.text)
+
+
+def test_streaming_unmasker_holds_a_cut_placeholder():
+    masked = MaskedText("a @@0@@ b", ["`code`"])
+    unmasker = StreamingUnmasker(masked)
+
+    assert unmasker.feed("a @") == "a "
+    assert unmasker.feed("@0") == ""
+    assert unmasker.feed("@@ b") == "`code` b"
+    assert unmasker.finish() == ""
+
+
+def test_streaming_unmasker_reports_a_lost_placeholder():
+    masked = MaskedText("@@0@@ et @@1@@", ["`a`", "`b`"])
+    unmasker = StreamingUnmasker(masked)
+
+    assert unmasker.feed("@@0@@ et fin") == "`a` et fin"
+    with pytest.raises(MaskingError, match=r"missing=\[1\]"):
+        unmasker.finish()
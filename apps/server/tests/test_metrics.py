@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client.parser import text_string_to_metric_families
+
+import main
+from src.core.config import settings
+from src.routes import format as format_routes
+from src.services import openai as openai_service
+from src.services import vitepress
+from src.services.result_cache import ResultCache
+
+
+class FakeClient:
+    """Answers every chat completion with the same text and usage"""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model: str, messages, **kwargs):
+        message = SimpleNamespace(content="# Guide\n\nIntroduction revue.")
+        return SimpleNamespace(
+            model=model,
+            usage=SimpleNamespace(prompt_tokens=12, completion_tokens=5),
+            choices=[SimpleNamespace(message=message)],
+            model_dump=lambda: {
+                "model": model,
+                "choices": [{"message": {"content": message.content}}],
+            },
+        )
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def healthy(force: bool = False):
+        return {"status": "healthy"}
+
+    monkeypatch.setattr(settings, "result_cache_persistent", False)
+    monkeypatch.setattr(format_routes, "result_cache", ResultCache())
+    monkeypatch.setattr(openai_service, "_service_states", {})
+    monkeypatch.setattr(openai_service, "_latency_trackers", {})
+    monkeypatch.setattr(
+        openai_service.llm_registry,
+        "openai_client",
+        lambda api_key, base_url=None, max_retries=None: FakeClient(),
+    )
+    monkeypatch.setattr(vitepress.openai_service, "health_check", healthy)
+    # Without the lifespan: no database, job worker or warmup
+    return TestClient(main.app)
+
+
+def samples(client: TestClient) -> dict:
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(response.text)
+        for sample in family.samples
+    }
+
+
+def test_metrics_expose_request_and_llm_counters(client):
+    model = settings.openai_model
+    stage = ("pipeline_stage_duration_seconds_count", (("stage", "enhance"),))
+    tokens = (
+        "llm_tokens_total",
+        (("direction", "input"), ("model", model)),
+    )
+    calls = (
+        "llm_request_duration_seconds_count",
+        (("model", model), ("outcome", "success")),
+    )
+    before = samples(client)
+
+    response = client.post(
+        "/format/doc/text",
+        json={"content": "# Guide\n\nIntroduction à revoir.\n", "enhance": True},
+    )
+    assert response.status_code == 200
+
+    after = samples(client)
+    assert after[stage] == before.get(stage, 0) + 1
+    assert after[tokens] >= before.get(tokens, 0) + 12
+    assert after[calls] >= before.get(calls, 0) + 1
+    assert ("http_requests_in_flight", ()) in after
@@ -0,0 +1,354 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import APIConnectionError, BadRequestError
+
+from src.services import openai as openai_service
+from src.services.openai import (
+    ChatCompletionError,
+    CircuitBreaker,
+    OpenAIService,
+    ServiceUnavailableError,
+)
+from src.services.resilience import ResiliencePolicy, Target
+
+
+@pytest.fixture
+def breaker():
+    return CircuitBreaker(failure_threshold=2, reset_timeout=30.0)
+
+
+def expire(breaker: CircuitBreaker) -> None:
+    """Move the opening of the breaker past its reset timeout"""
+    breaker.opened_at -= breaker.reset_timeout
+
+
+def test_breaker_opens_after_consecutive_failures(breaker):
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+
+
+def test_success_resets_the_failure_count(breaker):
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_breaker_lets_a_single_trial_through(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    expire(breaker)
+
+    assert breaker.state == "half_open"
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+
+def test_successful_trial_closes_the_breaker(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    expire(breaker)
+    breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+
+def test_failed_trial_reopens_the_breaker(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    expire(breaker)
+    breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+
+
+def test_released_trial_frees_the_half_open_slot(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    expire(breaker)
+    breaker.allow_request()
+
+    breaker.release()
+    assert breaker.state == "half_open"
+    assert breaker.allow_request()
+
+
+REQUEST = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+
+
+def connection_error() -> APIConnectionError:
+    return APIConnectionError(request=REQUEST)
+
+
+def bad_request() -> BadRequestError:
+    response = httpx.Response(400, request=REQUEST)
+    return BadRequestError("bad request", response=response, body=None)
+
+
+class FakeResponse:
+    usage = SimpleNamespace(prompt_tokens=3, completion_tokens=2)
+    choices = []
+
+    def __init__(self, model: str):
+        self.model = model
+
+    def model_dump(self) -> dict:
+        return {"model": self.model}
+
+
+def chunk(content: str):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(delta=SimpleNamespace(content=content))]
+    )
+
+
+class FakeClient:
+    """
+    Plays a script of outcomes, one per call: an exception is raised,
+    "hang" never answers, a list of deltas (possibly ending with an
+    exception) is streamed, anything else answers with a response.
+    """
+
+    def __init__(self, script: list):
+        self.script = list(script)
+        self.calls: list[str] = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model: str, messages, stream: bool = False, **kwargs):
+        self.calls.append(model)
+        outcome = self.script.pop(0) if self.script else "ok"
+        if isinstance(outcome, BaseException):
+            raise outcome
+        if outcome == "hang":
+            await asyncio.Event().wait()
+        if stream:
+            return self._stream(outcome)
+        return FakeResponse(model)
+
+    async def _stream(self, items: list):
+        for item in items:
+            if isinstance(item, BaseException):
+                raise item
+            yield chunk(item)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(openai_service, "_service_states", {})
+    monkeypatch.setattr(openai_service, "_latency_trackers", {})
+    service = OpenAIService()
+    service.policy = ResiliencePolicy(
+        max_retries=2, backoff_base=0.0, hedge_percentile=None
+    )
+    return service
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    """One fake client per base URL, each with its own script"""
+    clients: dict = {}
+
+    def openai_client(api_key, base_url=None, max_retries=None):
+        return clients.setdefault(base_url, FakeClient([]))
+
+    monkeypatch.setattr(openai_service.llm_registry, "openai_client", openai_client)
+    return clients
+
+
+def complete(service: OpenAIService) -> dict:
+    return asyncio.run(service.chat_completion([{"role": "user", "content": "Hi"}]))
+
+
+def stream(service: OpenAIService) -> list[str]:
+    async def collect():
+        return [
+            delta
+            async for delta in service.chat_completion_stream(
+                [{"role": "user", "content": "Hi"}]
+            )
+        ]
+
+    return asyncio.run(collect())
+
+
+def test_open_breaker_reports_unhealthy_without_a_call(service, monkeypatch):
+    async def unexpected_check():
+        raise AssertionError("health checked through the network")
+
+    monkeypatch.setattr(service, "_check_health", unexpected_check)
+    breaker = service.state.breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    health = asyncio.run(service.health_check())
+    assert health["status"] == "unhealthy"
+    assert health["circuit"] == "open"
+
+
+def test_health_is_cached_until_forced(service, monkeypatch):
+    checks = []
+
+    async def check():
+        checks.append(1)
+        return {"status": "healthy"}
+
+    monkeypatch.setattr(service, "_check_health", check)
+
+    async def scenario():
+        await service.health_check()
+        await service.health_check()
+        await service.health_check(force=True)
+
+    asyncio.run(scenario())
+    assert len(checks) == 2
+
+
+def test_upstream_failures_are_retried(service, clients):
+    clients[service.base_url] = FakeClient([connection_error(), connection_error()])
+
+    result = complete(service)
+
+    assert result["model"] == service.model
+    outcomes = [attempt["outcome"] for attempt in result["attempts"]]
+    assert outcomes == ["error", "error", "success"]
+
+
+def test_exhausted_retries_raise_with_every_attempt(service, clients):
+    clients[service.base_url] = FakeClient([connection_error()] * 3)
+
+    with pytest.raises(ChatCompletionError) as error:
+        complete(service)
+
+    assert len(error.value.attempts) == 3
+    assert len(clients[service.base_url].calls) == 3
+
+
+def test_client_errors_go_to_the_fallback_model_without_retry(service, clients):
+    service.policy.fallback_models = ["backup-model"]
+    clients[service.base_url] = FakeClient([bad_request()])
+
+    result = complete(service)
+
+    assert clients[service.base_url].calls == [service.model, "backup-model"]
+    assert result["model"] == "backup-model"
+
+
+def test_fallback_base_url_takes_over_from_a_failing_one(service, clients):
+    service.policy.max_retries = 0
+    service.policy.fallback_base_urls = ["http://backup.test/v1"]
+    clients[service.base_url] = FakeClient([connection_error()])
+
+    result = complete(service)
+
+    assert len(clients["http://backup.test/v1"].calls) == 1
+    targets = [attempt["target"]["base_url"] for attempt in result["attempts"]]
+    assert targets == [service.base_url, "http://backup.test/v1"]
+
+
+def test_open_breaker_skips_the_call(service, clients):
+    breaker = service.state.breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    clients[service.base_url] = FakeClient([])
+
+    with pytest.raises(ServiceUnavailableError):
+        complete(service)
+
+    assert clients[service.base_url].calls == []
+
+
+def test_slow_attempt_is_hedged(service, clients):
+    service.policy.hedge_percentile = 0.5
+    service.policy.hedge_min_samples = 1
+    openai_service._latency_tracker(Target(service.model, service.base_url)).record(
+        0.01
+    )
+    clients[service.base_url] = FakeClient(["hang"])
+
+    result = complete(service)
+
+    # The hanging attempt is still being cancelled when the hedge wins
+    assert len(clients[service.base_url].calls) == 2
+    hedges = [attempt for attempt in result["attempts"] if attempt["hedge"]]
+    assert [attempt["outcome"] for attempt in hedges] == ["success"]
+
+
+def test_error_outside_the_api_client_frees_the_half_open_trial(service, clients):
+    breaker = service.state.breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    breaker.opened_at -= breaker.reset_timeout
+    clients[service.base_url] = FakeClient([RuntimeError("bug")])
+
+    with pytest.raises(RuntimeError, match="bug"):
+        complete(service)
+
+    assert breaker.state == "half_open"
+    assert breaker.allow_request()
+
+
+def test_stream_is_retried_before_the_first_delta(service, clients):
+    clients[service.base_url] = FakeClient(
+        [connection_error(), ["Bon", connection_error()]]
+    )
+
+    with pytest.raises(ChatCompletionError):
+        stream(service)
+
+    # The second call failed after a delta had been forwarded: no third call
+    assert len(clients[service.base_url].calls) == 2
+
+
+def test_stream_failing_before_any_delta_retries_then_succeeds(service, clients):
+    clients[service.base_url] = FakeClient([[connection_error()], ["Bon", "jour"]])
+
+    assert stream(service) == ["Bon", "jour"]
+    assert len(clients[service.base_url].calls) == 2
+
+
+def test_stream_cut_mid_response_counts_as_an_upstream_failure(service, clients):
+    clients[service.base_url] = FakeClient(
+        [["Bon", httpx.ReadError("connection reset", request=REQUEST)]]
+    )
+
+    with pytest.raises(ChatCompletionError):
+        stream(service)
+
+    assert service.state.breaker.failures == 1
+
+
+def test_stream_read_timeout_before_any_delta_is_retried(service, clients):
+    clients[service.base_url] = FakeClient(
+        [[httpx.ReadTimeout("timed out", request=REQUEST)], ["Bon", "jour"]]
+    )
+
+    assert stream(service) == ["Bon", "jour"]
+    assert len(clients[service.base_url].calls) == 2
+
+
+def test_stream_error_outside_the_api_client_frees_the_half_open_trial(
+    service, clients
+):
+    breaker = service.state.breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    breaker.opened_at -= breaker.reset_timeout
+    clients[service.base_url] = FakeClient([["Bon", RuntimeError("bug")]])
+
+    with pytest.raises(RuntimeError, match="bug"):
+        stream(service)
+
+    assert breaker.state == "half_open"
+    assert breaker.allow_request()
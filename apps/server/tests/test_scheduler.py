@@ -0,0 +1,186 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import scheduler
+from src.services.scheduler import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_NORMAL,
+    RateScheduler,
+    TokenBucket,
+    parse_duration,
+)
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("1s", 1.0),
+        ("6m0s", 360.0),
+        ("20ms", 0.02),
+        ("1h2m", 3720.0),
+        ("1.5", 1.5),
+        ("", None),
+        (None, None),
+        ("soon", None),
+    ],
+)
+def test_parse_duration(value, expected):
+    assert parse_duration(value) == pytest.approx(expected)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake scheduler clock, only moved forward by the test"""
+    clock = SimpleNamespace(now=1000.0)
+    clock.monotonic = lambda: clock.now
+    monkeypatch.setattr(scheduler, "time", clock)
+    return clock
+
+
+def test_bucket_without_limit_never_waits(clock):
+    bucket = TokenBucket()
+    bucket.consume(1_000_000)
+    assert bucket.delay(1_000_000) == 0.0
+
+
+def test_bucket_refills_at_its_rate_per_minute(clock):
+    bucket = TokenBucket(60)
+    bucket.consume(60)
+    assert bucket.delay(6) == pytest.approx(6.0)
+
+    clock.now += 3
+    assert bucket.delay(6) == pytest.approx(3.0)
+
+    clock.now += 3
+    assert bucket.delay(6) == 0.0
+
+
+def test_bucket_refills_up_to_its_limit(clock):
+    bucket = TokenBucket(60)
+    clock.now += 600
+    bucket.refill()
+    assert bucket.level == 60
+
+
+def test_cost_above_the_limit_waits_for_a_full_bucket(clock):
+    bucket = TokenBucket(60)
+    assert bucket.delay(500) == 0.0
+    bucket.consume(500)
+    assert bucket.level == 0.0
+
+
+def test_remaining_budget_from_the_provider_lowers_the_level(clock):
+    bucket = TokenBucket(60)
+    bucket.observe_remaining(10)
+    assert bucket.level == 10
+    bucket.observe_remaining(50)
+    assert bucket.level == 10
+
+
+def test_new_limit_caps_the_level(clock):
+    bucket = TokenBucket()
+    bucket.set_limit(100)
+    assert (bucket.limit, bucket.level) == (100, 100)
+    bucket.set_limit(40)
+    assert (bucket.limit, bucket.level) == (40, 40)
+
+
+def test_limits_are_learned_from_the_headers(clock):
+    rates = RateScheduler(headroom=0.9)
+    assert not rates.limited
+
+    rates.observe(
+        200,
+        {
+            "x-ratelimit-limit-requests": "100",
+            "x-ratelimit-remaining-requests": "5",
+            "x-ratelimit-limit-tokens": "10000",
+            "x-ratelimit-remaining-tokens": "9000",
+        },
+    )
+
+    assert rates.limited
+    assert rates.requests.limit == pytest.approx(90)
+    assert rates.requests.level == 5
+    assert rates.tokens.limit == pytest.approx(9000)
+    assert rates.tokens.level == pytest.approx(9000)
+
+
+def test_rate_limit_response_pauses_until_the_reset(clock):
+    rates = RateScheduler(requests_per_minute=100)
+
+    rates.observe(429, {"x-ratelimit-reset-requests": "6m0s"})
+
+    assert rates.paused_until == clock.now + 360
+    assert rates.requests.level == 0.0
+    assert rates._delay(1) == pytest.approx(360)
+
+
+def test_retry_after_takes_precedence_over_the_reset_headers(clock):
+    rates = RateScheduler()
+
+    rates.observe(429, {"retry-after": "2", "x-ratelimit-reset-requests": "1m"})
+
+    assert rates.paused_until == clock.now + 2
+    assert rates.limited
+
+
+def test_unlimited_calls_are_not_queued():
+    async def scenario():
+        rates = RateScheduler()
+        await rates.acquire(1000)
+        return rates
+
+    rates = asyncio.run(scenario())
+    assert rates._dispatcher is None
+
+
+def test_waiting_calls_are_granted_by_priority():
+    async def scenario():
+        # 20 calls per second, none available right away
+        rates = RateScheduler(requests_per_minute=1200, headroom=1.0)
+        rates.requests.drain()
+        granted = []
+
+        async def call(name: str, priority: int):
+            await rates.acquire(1, priority)
+            granted.append(name)
+
+        await asyncio.gather(
+            call("background", PRIORITY_BACKGROUND),
+            call("normal", PRIORITY_NORMAL),
+            call("interactive", PRIORITY_INTERACTIVE),
+            call("normal bis", PRIORITY_NORMAL),
+        )
+        return granted
+
+    granted = asyncio.run(scenario())
+    assert granted == ["interactive", "normal", "normal bis", "background"]
+
+
+def test_rate_limit_response_holds_queued_calls():
+    async def scenario():
+        rates = RateScheduler()
+        rates.observe(429, {"retry-after": "0.2"})
+        started = time.monotonic()
+        await rates.acquire(1)
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.15
+
+
+def test_cancelled_call_is_dropped_from_the_queue():
+    async def scenario():
+        rates = RateScheduler(requests_per_minute=1200, headroom=1.0)
+        rates.requests.drain()
+        waiting = asyncio.create_task(rates.acquire(1, PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await rates.acquire(1, PRIORITY_BACKGROUND)
+        return rates.queued
+
+    assert asyncio.run(scenario()) == 0
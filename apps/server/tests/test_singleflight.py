@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from src.core.singleflight import Broadcast, StreamFlight
+
+
+async def endless(produced: list[str]):
+    index = 0
+    while True:
+        event = f"event {index}\n"
+        produced.append(event)
+        yield event
+        index += 1
+        await asyncio.sleep(0)
+
+
+async def finite(count: int):
+    for index in range(count):
+        yield f"{index:04d}"
+        await asyncio.sleep(0)
+
+
+def test_producer_cancelled_when_last_subscriber_leaves():
+    async def scenario():
+        produced: list[str] = []
+        broadcast = Broadcast(endless(produced))
+        first = broadcast.subscribe()
+        second = broadcast.subscribe()
+        await anext(first)
+        await anext(second)
+
+        await first.aclose()
+        assert broadcast.subscribers == 1
+        assert not broadcast.task.done()
+
+        await second.aclose()
+        assert broadcast.abandoned and not broadcast.joinable
+        await asyncio.sleep(0)
+        assert broadcast.task.cancelled()
+        count = len(produced)
+        await asyncio.sleep(0.01)
+        assert len(produced) == count
+
+    asyncio.run(scenario())
+
+
+def test_detached_producer_runs_to_the_end():
+    async def scenario():
+        broadcast = Broadcast(finite(20), detached=True)
+        subscriber = broadcast.subscribe()
+        await anext(subscriber)
+        await subscriber.aclose()
+
+        await broadcast.task
+        assert broadcast.done and not broadcast.abandoned
+        assert broadcast.events[-1] == "0019"
+
+    asyncio.run(scenario())
+
+
+def test_history_read_by_every_subscriber_is_dropped():
+    async def scenario():
+        broadcast = Broadcast(finite(100), replay_bytes=40)
+        fast = broadcast.subscribe()
+        slow = broadcast.subscribe()
+
+        fast_events = [event async for event in fast]
+        assert fast_events == [f"{index:04d}" for index in range(100)]
+        # The slow subscriber has read nothing: its events are all kept
+        assert broadcast.start == 0 and len(broadcast.events) == 100
+
+        slow_events = [event async for event in slow]
+        assert slow_events == fast_events
+        assert broadcast.start > 0 and broadcast.size <= 40
+        assert not broadcast.joinable
+
+    asyncio.run(scenario())
+
+
+def test_trimmed_stream_is_not_joined():
+    async def scenario():
+        flight = StreamFlight()
+        started = 0
+
+        def factory():
+            nonlocal started
+            started += 1
+            return finite(100)
+
+        first = flight.subscribe("key", factory)
+        second = flight.subscribe("key", factory)
+        assert started == 1 and flight.coalesced == 1
+
+        for _ in range(50):
+            await anext(first)
+            await anext(second)
+        # Joining now would miss the dropped events: a new producer starts
+        broadcast = flight._streams["key"]
+        broadcast.replay_bytes = 0
+        broadcast._trim()
+        late = flight.subscribe("key", factory)
+        assert started == 2
+        assert [event async for event in late][0] == "0000"
+
+        await first.aclose()
+        await second.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_producer_error_reaches_every_subscriber():
+    async def failing():
+        yield "first"
+        raise ValueError("broken")
+
+    async def scenario():
+        broadcast = Broadcast(failing())
+        subscribers = [broadcast.subscribe(), broadcast.subscribe()]
+        for subscriber in subscribers:
+            assert await anext(subscriber) == "first"
+            with pytest.raises(ValueError, match="broken"):
+                await anext(subscriber)
+
+    asyncio.run(scenario())
@@ -0,0 +1,126 @@
+from itertools import pairwise
+
+import pytest
+
+from benchmarks.corpus import generate_page
+from src.services.splitter import (
+    plan_markdown_chunks,
+    split_markdown_blocks,
+    split_markdown_segments,
+)
+
+
+def words(text: str) -> int:
+    return len(text.split())
+
+
+NESTED = """Introduction.
+
+:::: code-group
+
+::: tip Astuce
+Texte de l'astuce.
+
+Suite de l'astuce.
+:::
+
+::::
+
+## Après
+
+Paragraphe après le groupe."""
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_blocks_give_back_the_content(seed: int):
+    page = generate_page(4096, seed=seed)
+    assert "\n".join(split_markdown_blocks(page)) == page
+
+
+def test_blocks_from_lines_match_blocks_from_text():
+    page = generate_page(4096, seed=3)
+    assert split_markdown_blocks(iter(page.split("\n"))) == split_markdown_blocks(page)
+
+
+def test_blocks_split_at_headings_and_blank_lines():
+    blocks = split_markdown_blocks("# Titre\nTexte\n\nSuite\n## Partie")
+    assert blocks == ["# Titre\nTexte\n", "Suite", "## Partie"]
+
+
+def test_fence_inside_a_container_is_not_split():
+    content = "::: details Code\n```md\n:::\n\n# pas un titre\n```\n:::\n\nFin"
+    blocks = split_markdown_blocks(content)
+    assert blocks == [
+        "::: details Code\n```md\n:::\n\n# pas un titre\n```\n:::\n",
+        "Fin",
+    ]
+
+
+def test_nested_container_is_one_block_closed_by_its_own_run():
+    blocks = split_markdown_blocks(NESTED)
+    assert blocks[1].startswith(":::: code-group")
+    assert blocks[1].endswith("::::\n")
+    assert blocks[2:] == ["## Après\n", "Paragraphe après le groupe."]
+
+
+def test_shorter_run_does_not_close_an_outer_container():
+    content = ":::: code-group\n:::\n\nTexte\n::::\n\nFin"
+    assert split_markdown_blocks(content) == [
+        ":::: code-group\n:::\n\nTexte\n::::\n",
+        "Fin",
+    ]
+
+
+def test_frontmatter_is_never_split():
+    content = "---\ntitle: Guide\n\n# pas un titre\n---\n\n# Titre"
+    blocks = split_markdown_blocks(content)
+    assert blocks[0] == "---\ntitle: Guide\n\n# pas un titre\n---\n"
+    assert blocks[1:] == ["# Titre"]
+
+
+def test_oversize_block_becomes_its_own_segment():
+    fence = "```ts\n" + "\n".join(f"const v{i} = {i}" for i in range(50)) + "\n```"
+    content = f"Avant.\n\n{fence}\n\nAprès."
+
+    segments = split_markdown_segments(content, 20, count=words)
+
+    assert fence + "\n" in segments
+    assert "\n".join(segments) == content
+
+
+def test_unclosed_frontmatter_is_plain_text():
+    # Like the shared tokenizer, a "---" never closed is not a frontmatter
+    content = "---\ntitle: Guide\n\n# Titre\n\nTexte"
+    assert split_markdown_blocks(content) == [
+        "---\ntitle: Guide\n",
+        "# Titre\n",
+        "Texte",
+    ]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_chunks_stay_within_the_budget(seed: int):
+    page = generate_page(8192, seed=seed)
+    chunks = plan_markdown_chunks(page, 200, count=words)
+
+    for chunk in chunks:
+        blocks = split_markdown_blocks(chunk.text)
+        # Only a single block larger than the budget may go over it
+        assert chunk.tokens <= 200 or len(blocks) == 1
+        assert chunk.tokens == sum(words(block) + 1 for block in blocks)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_context_is_never_emitted_again(seed: int):
+    page = generate_page(8192, seed=seed)
+    chunks = plan_markdown_chunks(page, 200, context_tokens=30, count=words)
+
+    assert len(chunks) > 1
+    assert chunks[0].context == ""
+    assert "\n".join(chunk.text for chunk in chunks) == page
+    assert any(chunk.context for chunk in chunks)
+    for previous, chunk in pairwise(chunks):
+        # The context is the end of the previous chunk, read but not sent back
+        assert words(chunk.context) <= 30
+        assert previous.text.rstrip("\n").endswith(chunk.context)
+        assert not chunk.context or not chunk.text.startswith(chunk.context)
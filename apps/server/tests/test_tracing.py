@@ -0,0 +1,97 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.core.config import settings
+from src.core.tracing import TracedJSONResponse, TracingMiddleware
+from src.routes import format as format_routes
+from src.services.result_cache import ResultCache
+
+DOCUMENT = "# Guide\n\nIntroduction.\n\n## Usage\n\nExemples.\n"
+TOKEN = "secret-token"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "result_cache_persistent", False)
+    monkeypatch.setattr(format_routes, "result_cache", ResultCache())
+    app = FastAPI(default_response_class=TracedJSONResponse)
+    app.include_router(format_routes.router, prefix="/format")
+    app.add_middleware(TracingMiddleware)
+    return TestClient(app)
+
+
+def format_text(client: TestClient, path: str = "/format/doc/text", **kwargs):
+    return client.post(path, json={"content": DOCUMENT, "enhance": False}, **kwargs)
+
+
+def server_timing(response) -> dict[str, str]:
+    entries = {}
+    for entry in response.headers["Server-Timing"].split(", "):
+        name, _, params = entry.partition(";")
+        entries[name] = params
+    return entries
+
+
+def test_server_timing_reports_the_spans_of_the_request(client):
+    response = format_text(client)
+
+    assert response.status_code == 200
+    entries = server_timing(response)
+    assert entries["clean"].startswith("dur=")
+    assert entries["total"].startswith("dur=")
+    assert "profile" not in response.json()
+
+
+def test_stream_ends_with_a_timings_event(client):
+    files = {"file": ("guide.md", DOCUMENT.encode("utf-8"))}
+
+    response = client.post("/format/doc/stream?enhance=false", files=files)
+
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[-2]["status"] == "completed"
+    timings = events[-1]
+    assert timings["status"] == "timings"
+    assert timings["spans"]["clean"]["count"] == 1
+    assert timings["total_ms"] >= timings["spans"]["clean"]["ms"]
+    assert "profile" not in timings
+    assert "Server-Timing" in response.headers
+
+
+@pytest.mark.parametrize(
+    "enabled, token, header",
+    [
+        (False, TOKEN, TOKEN),
+        (True, None, TOKEN),
+        (True, TOKEN, None),
+        (True, TOKEN, "wrong-token"),
+    ],
+)
+def test_profiling_needs_the_setting_and_the_token(
+    client, monkeypatch, enabled, token, header
+):
+    monkeypatch.setattr(settings, "profiling_enabled", enabled)
+    monkeypatch.setattr(settings, "profile_token", token)
+    headers = {"X-Profile-Token": header} if header else {}
+
+    response = format_text(client, "/format/doc/text?profile=1", headers=headers)
+
+    assert response.status_code == 200
+    assert "profile" not in response.json()
+
+
+def test_profile_is_added_with_the_setting_and_the_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "profiling_enabled", True)
+    monkeypatch.setattr(settings, "profile_token", TOKEN)
+
+    response = format_text(
+        client, "/format/doc/text?profile=1", headers={"X-Profile-Token": TOKEN}
+    )
+
+    body = response.json()
+    assert body["formatted_content"]
+    assert body["profile"]["interval_ms"] == settings.profile_interval_ms
+    assert "clean" in body["timings"]["spans"]
+    assert response.headers["content-length"] == str(len(response.content))
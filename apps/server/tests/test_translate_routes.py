@@ -0,0 +1,132 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.core.config import settings
+from src.routes import translate as translate_routes
+from src.services.masking import PLACEHOLDER_PATTERN
+from src.services.translate import TranslateService
+
+DOCUMENT = (
+    "# Premier\n\nTexte lent du premier passage.\n\n"
+    "## Deuxième\n\nTexte rapide avec `code` et [un lien](./guide).\n\n"
+    "## Troisième\n\nFin rapide.\n"
+)
+
+
+def translated(content: str) -> str:
+    return "\n".join(
+        f"[en] {line}" if line.strip() else line for line in content.split("\n")
+    )
+
+
+class FakeChain:
+    """
+    Translation chain answering "[en] " before every line. Segments with
+    "lent" stream slowly, so later segments finish first; segments with one
+    of the `lose` words drop their placeholders when streamed.
+    """
+
+    def __init__(self, lose: tuple[str, ...] = ()):
+        self.lose = lose
+        self.finished: list[str] = []
+
+    async def ainvoke(self, inputs: dict):
+        return SimpleNamespace(
+            content=translated(inputs["content"]), usage_metadata=None
+        )
+
+    async def astream(self, inputs: dict):
+        content = inputs["content"]
+        text = translated(content)
+        if any(word in content for word in self.lose):
+            text = PLACEHOLDER_PATTERN.sub("", text)
+        for start in range(0, len(text), 4):
+            await asyncio.sleep(0.02 if "lent" in content else 0)
+            yield SimpleNamespace(content=text[start : start + 4])
+        self.finished.append(content)
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    monkeypatch.setattr(settings, "translation_memory_enabled", False)
+    monkeypatch.setattr(settings, "translate_chunk_tokens", 12)
+    chain = FakeChain()
+    monkeypatch.setattr(TranslateService, "_chain", lambda self, model: chain)
+    return chain
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(translate_routes.router)
+    with TestClient(app) as client:
+        yield client
+
+
+def post(client: TestClient, path: str, content: str = DOCUMENT):
+    return client.post(
+        path,
+        files={"file": ("guide.md", content.encode("utf-8"), "text/markdown")},
+        data={
+            "source_language": "fr",
+            "target_language": "en",
+            "model_name": "gpt-oss",
+            "chunked": "true",
+        },
+    )
+
+
+def rebuild(events: list[dict]) -> str:
+    """Document rebuilt by a client: a retried segment replaces its deltas"""
+    parts: list[tuple[object, str]] = []
+    for event in events:
+        if event["status"] == "translating":
+            parts.append((event.get("segment"), event["delta"]))
+        elif event["status"] == "segment_retried":
+            segment = event["segment"]
+            first = next(i for i, (index, _) in enumerate(parts) if index == segment)
+            parts = [part for part in parts if part[0] != segment]
+            parts.insert(first, (segment, event["content"]))
+    return "".join(text for _, text in parts)
+
+
+def stream_events(client: TestClient) -> list[dict]:
+    response = post(client, "/translate-file/stream")
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_streamed_segments_rebuild_the_document_in_order(client, chain):
+    expected = post(client, "/translate-file").json()["translated_content"]
+    chain.finished.clear()
+
+    events = stream_events(client)
+
+    # The slow first segment finished last, its deltas still come first
+    segments = TranslateService().split(DOCUMENT, chunked=True)
+    assert len(segments) > 2
+    assert "lent" in chain.finished[-1]
+    assert events[0]["status"] == "start"
+    assert events[-1]["status"] == "completed"
+    assert rebuild(events) == expected
+    assert events[-1]["result"]["translated_content"] == expected
+
+
+def test_segment_with_lost_placeholders_is_retried(client, chain):
+    chain.lose = ("avec",)
+
+    events = stream_events(client)
+
+    retried = [event for event in events if event["status"] == "segment_retried"]
+    assert len(retried) == 1
+    assert retried[0]["content"] == translated(
+        "Texte rapide avec `code` et [un lien](./guide)."
+    )
+    final = events[-1]["result"]["translated_content"]
+    assert rebuild(events) == final
+    assert "[en] Texte rapide avec `code` et [un lien](./guide)." in final
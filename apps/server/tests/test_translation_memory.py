@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from src.core.config import settings
+from src.services import translate
+from src.services import translation_memory as translation_memory_module
+from src.services.translate import PROMPT_VERSION, TranslateService, _segment_keys
+from src.services.translation_memory import normalize_segment, segment_key
+
+
+def key(text: str, source: str = "fr", target: str = "en", **overrides) -> str:
+    params = {"model_name": "gpt-oss", "prompt_version": PROMPT_VERSION, **overrides}
+    return segment_key(text, source, target, **params)
+
+
+@pytest.mark.parametrize(
+    "variant",
+    [
+        "# Titre\r\nTexte",
+        "# Titre  \nTexte\t",
+        "\n\n# Titre\nTexte\n\n",
+    ],
+)
+def test_normalization_ignores_line_endings_and_surrounding_blanks(variant: str):
+    assert normalize_segment(variant) == "# Titre\nTexte"
+    assert key(variant) == key("# Titre\nTexte")
+
+
+@pytest.mark.parametrize(
+    "other",
+    [
+        "# Titre\n  Texte",
+        "# Titre\n\nTexte",
+        "# titre\nTexte",
+    ],
+)
+def test_normalization_keeps_meaningful_differences(other: str):
+    assert key(other) != key("# Titre\nTexte")
+
+
+def test_key_ignores_language_case_and_spaces():
+    assert key("Bonjour", " FR", "En ") == key("Bonjour", "fr", "en")
+
+
+def test_key_depends_on_language_pair_model_and_prompt_version():
+    reference = key("Bonjour")
+    variants = [
+        key("Bonjour", "fr", "de"),
+        key("Bonjour", "en", "fr"),
+        key("Bonjour", model_name="gpt-4o"),
+        key("Bonjour", prompt_version=PROMPT_VERSION + "-next"),
+    ]
+    assert reference not in variants
+    assert len(set(variants)) == len(variants)
+
+
+def test_duplicate_segments_share_one_body():
+    segments = ["Bonjour", "\n", "Bonjour  \r\n", "Au revoir", "\n\nBonjour\n"]
+    segment_keys, bodies = _segment_keys(segments, "fr", "en", "gpt-oss")
+
+    assert segment_keys[1] is None
+    assert segment_keys[0] == segment_keys[2] == segment_keys[4]
+    assert segment_keys[0] != segment_keys[3]
+    assert list(bodies.values()) == ["Bonjour", "Au revoir"]
+
+
+def test_duplicate_segments_are_translated_once(monkeypatch):
+    monkeypatch.setattr(settings, "translation_memory_enabled", False)
+    calls = []
+
+    async def fake_translate(self, body, source_language, target_language, model):
+        calls.append(body)
+        return f"[{target_language}] {body}"
+
+    monkeypatch.setattr(translate.TranslateService, "_translate_text", fake_translate)
+
+    result = asyncio.run(
+        TranslateService(model_name="gpt-oss").translate_split_document(
+            ["Bonjour\n", "Au revoir\n", "\nBonjour"], "fr", "en"
+        )
+    )
+
+    assert sorted(calls) == ["Au revoir", "Bonjour"]
+    assert result.content == "[en] Bonjour\n\n[en] Au revoir\n\n\n[en] Bonjour"
+    assert (result.cache_hits, result.cache_misses) == (0, 3)
+
+
+def test_lookup_failure_translates_every_segment(monkeypatch, failing_session):
+    monkeypatch.setattr(settings, "translation_memory_enabled", True)
+    monkeypatch.setattr(translation_memory_module, "AsyncSessionLocal", failing_session)
+    stored = []
+
+    async def fake_translate(self, body, source_language, target_language, model):
+        return f"[{target_language}] {body}"
+
+    async def fake_store(entries):
+        stored.extend(entries)
+
+    monkeypatch.setattr(translate.TranslateService, "_translate_text", fake_translate)
+    monkeypatch.setattr(translate.translation_memory, "store", fake_store)
+
+    result = asyncio.run(
+        TranslateService(model_name="gpt-oss").translate_split_document(
+            ["Bonjour\n", "Au revoir"], "fr", "en"
+        )
+    )
+
+    assert result.content == "[en] Bonjour\n\n[en] Au revoir"
+    assert (result.cache_hits, result.cache_misses) == (0, 2)
+    assert len(stored) == 2
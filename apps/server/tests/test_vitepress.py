@@ -0,0 +1,160 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+from benchmarks.corpus import generate_page
+from src.services import vitepress
+from src.services.markdown import parse_markdown
+from src.services.vitepress import format_vitepress_document, format_vitepress_markdown
+
+
+@pytest.mark.parametrize(
+    ("link", "expected"),
+    [
+        ("[a](./guide)", "[a](./guide.md)"),
+        ("[a](./guide#partie)", "[a](./guide.md#partie)"),
+        ("[a](guide/page)", "[a](guide/page.md)"),
+        ("[a](./.config)", "[a](./.config.md)"),
+        ("[a](./guide.md)", "[a](./guide.md)"),
+        ("[a](./image.png)", "[a](./image.png)"),
+        ("[a](./guide/)", "[a](./guide/)"),
+        ("[a](#partie)", "[a](#partie)"),
+        ("[a](https://exemple.fr/page)", "[a](https://exemple.fr/page)"),
+        ("[a](mailto:moi)", "[a](mailto:moi)"),
+        ("[a](dossier/a:b)", "[a](dossier/a:b.md)"),
+        ("![a](./image)", "![a](./image)"),
+        ("[a](./x.md[b](c)", "[a](./x.md[b](c)"),
+    ],
+)
+def test_internal_links_get_md_extension(link: str, expected: str):
+    assert format_vitepress_markdown(f"Voir {link} ici") == f"Voir {expected} ici"
+
+
+def test_links_in_code_blocks_are_kept():
+    content = "```\n[a](./guide)\n```\n[a](./guide)"
+    assert (
+        format_vitepress_markdown(content) == "```\n[a](./guide)\n```\n[a](./guide.md)"
+    )
+
+
+def test_format_in_place_matches_copy():
+    content = generate_page(16384, 3)
+    document = parse_markdown(content)
+    assert format_vitepress_document(document).text == format_vitepress_markdown(
+        content
+    )
+    assert document.lines == content.split("\n")
+
+
+class PlaceholderDroppingService:
+    """Service AI qui perd les marqueurs en streaming, mais pas sans masquage"""
+
+    fallback_targets = []
+
+    def __init__(self):
+        self.unmasked_prompts = []
+
+    async def health_check(self) -> dict:
+        return {"status": "healthy"}
+
+    async def chat_completion_stream(self, messages: list, **kwargs):
+        yield "Texte amélioré "
+        yield "sans marqueur"
+
+    async def chat_completion(self, messages: list, **kwargs) -> dict:
+        self.unmasked_prompts.append(messages[-1]["content"])
+        return {"choices": [{"message": {"content": " Texte `code` amélioré\n"}}]}
+
+
+def collect_events(events) -> list[dict]:
+    async def collect() -> list[dict]:
+        return [json.loads(event) async for event in events]
+
+    return asyncio.run(collect())
+
+
+def test_streaming_enhancement_retries_without_masking(monkeypatch):
+    service = PlaceholderDroppingService()
+    monkeypatch.setattr(vitepress, "openai_service", service)
+
+    events = collect_events(
+        vitepress.enhance_content_with_ai_streaming("Texte `code` ici")
+    )
+
+    statuses = [event["status"] for event in events]
+    assert "ai_chunk_retried" in statuses
+    assert "ai_chunk_failed" not in statuses
+    assert events[-1]["enhanced_content"] == "Texte `code` amélioré"
+    assert "Texte `code` ici" in service.unmasked_prompts[0]
+
+
+@pytest.mark.parametrize("content", ["", "\n\n", "  \n\t"])
+def test_streaming_enhancement_keeps_blank_content(monkeypatch, content: str):
+    monkeypatch.setattr(vitepress, "openai_service", PlaceholderDroppingService())
+
+    events = collect_events(vitepress.enhance_content_with_ai_streaming(content))
+
+    assert events[-1]["status"] == "ai_done"
+    assert events[-1]["enhanced_content"] == content
+
+
+CLEAN_PIECES = [
+    "---",
+    "  ---",
+    "```",
+    "::: tip",
+    "::: warning Titre",
+    ":::",
+    "# T",
+    "## x",
+    "",
+    "[[toc]]",
+    "[[TOC]]",
+    "texte [a](./b)",
+    "a: b",
+    "lastUpdated: x",
+    "toc: [[toc]]",
+    "- [l](x#y)",
+    "![i](y)",
+]
+
+
+def clean_both_ways(content: str) -> tuple[str, str]:
+    lines = list(
+        vitepress.iter_clean_vitepress_markdown(lambda: iter(content.split("\n")))
+    )
+    document = vitepress.clean_vitepress_document(parse_markdown(content))
+    return "\n".join(lines), document.text
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "---\ntitle: [[toc]]\n---\n# Titre",
+        "---\ntitle: a\n# Titre",
+        "```\n[[toc]]\n```\n# Titre",
+        "# Titre\n::: tip\n[a](./b)\n:::",
+        "",
+    ]
+    + [generate_page(4096, seed) for seed in range(4)],
+)
+def test_line_by_line_clean_matches_document_clean(content: str):
+    streamed, cleaned = clean_both_ways(content)
+    assert streamed == cleaned
+
+
+def test_line_by_line_clean_matches_document_clean_on_fuzzed_documents():
+    generator = random.Random(3)
+    for _ in range(2000):
+        lines = [
+            generator.choice(CLEAN_PIECES) for _ in range(generator.randint(0, 12))
+        ]
+        streamed, cleaned = clean_both_ways("\n".join(lines))
+        assert streamed == cleaned
+
+
+def test_extract_sections_skips_code_blocks():
+    content = "# Titre\n```bash\n# commentaire\n```\n## Partie"
+    assert vitepress.extract_sections(content) == ["Titre", "Partie"]